@@ -5,8 +5,6 @@
 
 
 import boto3
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import Chroma
@@ -14,6 +12,12 @@ from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain.chains import RetrievalQAWithSourcesChain
 from langchain.prompts import PromptTemplate
 import os
+import sys
+
+# StreamlitApp과 동일한 지원사업 XML 파서 사용
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "StreamlitApp", "server", "handlers"))
+
+from policy_xml import iter_policy_records
 
 class LocalRAGHandler:
     def __init__(self, bucket: str, key: str):
@@ -22,31 +26,12 @@ class LocalRAGHandler:
     def _load_documents(self, bucket, key):
         s3 = boto3.client('s3')
         obj = s3.get_object(Bucket=bucket, Key=key)
-        xml_bytes = obj['Body'].read()
-        root = ET.fromstring(xml_bytes)
-
-        results = []
-        for category in root.findall("Category"):
-            for sub in category.findall(".//Item"):
-                title = sub.findtext("Title")
-                url = sub.findtext("URL")
-                content = sub.findtext("Content") or ""
-                soup = BeautifulSoup(content, "lxml")
-                for dl in soup.find_all("dl"):
-                    dt, dd = dl.find("dt"), dl.find("dd")
-                    if dt and dd:
-                        results.append({
-                            "title": title,
-                            "url": url,
-                            "구분": dt.get_text(strip=True),
-                            "내용": dd.get_text(separator="\n", strip=True)
-                        })
 
+        # S3 응답 스트림을 그대로 Item 단위로 파싱 (문의처·설문·만족도는 제외됨)
         texts, metadatas = [], []
-        for r in results:
-            if r["구분"] not in ["문의처", "설문", "만족도"]:
-                texts.append(f"{r['구분']}: {r['내용']}")
-                metadatas.append({"title": r["title"], "source": r["url"]})
+        for r in iter_policy_records(obj['Body']):
+            texts.append(f"{r.section}: {r.content}")
+            metadatas.append({"title": r.title, "source": r.url})
 
         return texts, metadatas
 
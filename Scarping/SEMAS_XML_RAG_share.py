@@ -29,8 +29,12 @@
 
 # COMMAND ----------
 
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+import os
+import sys
+
+# StreamlitApp과 동일한 지원사업 XML 파서 사용 (Repos에서 노트북 폴더 기준 경로)
+sys.path.insert(0, os.path.abspath("../StreamlitApp/server/handlers"))
+from policy_xml import iter_policy_records
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
@@ -38,7 +42,6 @@ from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQAWithSourcesChain
 from langchain.prompts import PromptTemplate
-import os
 import logging
 
 logging.basicConfig()
@@ -47,65 +50,16 @@ logging.getLogger("langchain.retrievers.multi_query").setLevel(logging.INFO)
 # OpenAI API Key 설정
 os.environ["OPENAI_API_KEY"] = "OPENAI_KEY_HERE"  # OPENAI_KEY_HERE 대신 본인 키 입력
 
-# 1. XML 파싱 및 구조적 정보 추출 변환 함수
+# 1. XML 파싱 및 구조적 정보 추출 변환 함수 (문의처·설문·만족도는 파서에서 제외)
 def load_documents_from_xml(file_path):
-    results = []
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    for category in root.findall("Category"):
-        category_name = category.get("name", "")
-        subcategories = category.findall("Subcategory")
-
-        if subcategories:
-            for subcat in subcategories:
-                subcategory_name = subcat.get("name", "")
-                for item in subcat.findall("Item"):
-                    title = item.findtext("Title")
-                    url = item.findtext("URL")
-                    content_html = item.findtext("Content")
-                    soup = BeautifulSoup(content_html or "", "html.parser")
-                    for dl in soup.find_all("dl"):
-                        dt = dl.find("dt")
-                        dd = dl.find("dd")
-                        if dt and dd:
-                            results.append({
-                                "Category": category_name,
-                                "Subcategory": subcategory_name,
-                                "Title": title,
-                                "URL": url,
-                                "구분": dt.get_text(strip=True),
-                                "내용": dd.get_text(separator="\n", strip=True)
-                            })
-        else:
-            for item in category.findall("Item"):
-                title = item.findtext("Title")
-                url = item.findtext("URL")
-                content_html = item.findtext("Content")
-                soup = BeautifulSoup(content_html or "", "html.parser")
-                for dl in soup.find_all("dl"):
-                    dt = dl.find("dt")
-                    dd = dl.find("dd")
-                    if dt and dd:
-                        results.append({
-                            "Category": category_name,
-                            "Subcategory": None,
-                            "Title": title,
-                            "URL": url,
-                            "구분": dt.get_text(strip=True),
-                            "내용": dd.get_text(separator="\n", strip=True)
-                        })
-
-    # 청킹 시 metadata 포함
     texts = []
     metadatas = []
 
-    for r in results:
-        if r["구분"] not in ["문의처", "설문", "만족도"]:
-            texts.append(
-                f"카테고리: {r['Category']}\n소분류: {r['Subcategory']}\n제목: {r['Title']}\n구분: {r['구분']}\n내용: {r['내용']}"
-            )
-            metadatas.append({"title": r["Title"], "source": r["URL"]})
+    for r in iter_policy_records(file_path):
+        texts.append(
+            f"카테고리: {r.category}\n소분류: {r.subcategory}\n제목: {r.title}\n구분: {r.section}\n내용: {r.content}"
+        )
+        metadatas.append({"title": r.title, "source": r.url})
 
     return texts, metadatas
 
@@ -0,0 +1,187 @@
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Genie 대화 API(start-conversation / messages / query-result)를 흉내 내는 로컬 HTTP 서버
+# - completion_sec: 메시지가 COMPLETED가 되기까지 걸리는 시간 (평균, 표준편차)
+# - status_sequence: 완료 전까지 순서대로 보여줄 중간 상태
+# - failure_rate: FAILED로 끝나는 비율
+# - http_latency_sec: 모든 요청에 더하는 네트워크 지연
+# - chunk_rows: 결과를 이 행 수 단위 chunk로 나눔 (0이면 한 번에 반환)
+# - start_extra_sec: 새 대화의 첫 메시지에만 더하는 처리 시간 (start-conversation이 후속 질문보다 느린 것 재현)
+
+_SPACE = r"/api/2\.0/genie/spaces/(?P<space>[^/]+)"
+ROUTES = [
+    ("GET", re.compile(_SPACE + r"$"), "get_space"),
+    ("POST", re.compile(_SPACE + r"/start-conversation$"), "start_conversation"),
+    ("POST", re.compile(_SPACE + r"/conversations/(?P<conv>[^/]+)/messages$"), "create_message"),
+    ("GET", re.compile(_SPACE + r"/conversations/(?P<conv>[^/]+)/messages/(?P<msg>[^/]+)$"), "get_message"),
+    ("GET", re.compile(_SPACE + r"/conversations/(?P<conv>[^/]+)/messages/(?P<msg>[^/]+)/query-result/(?P<att>[^/]+)$"), "query_result"),
+    ("GET", re.compile(r"/api/2\.0/sql/statements/(?P<stmt>[^/]+)/result/chunks/(?P<chunk>\d+)$"), "result_chunk"),
+]
+
+
+class FakeGenieState:
+    def __init__(self, completion_sec=(2.0, 0.5), status_sequence=("SUBMITTED", "EXECUTING_QUERY"),
+                 failure_rate=0.0, http_latency_sec=0.02, rows=20, chunk_rows=0, start_extra_sec=0.0, seed=0):
+        self.completion_sec = completion_sec
+        self.status_sequence = list(status_sequence)
+        self.failure_rate = failure_rate
+        self.http_latency_sec = http_latency_sec
+        self.rows = rows
+        self.chunk_rows = chunk_rows
+        self.start_extra_sec = start_extra_sec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.messages = {}
+        self.request_counts = {}
+
+    def count(self, name):
+        with self._lock:
+            self.request_counts[name] = self.request_counts.get(name, 0) + 1
+
+    def new_message(self, space_id, conversation_id, question, first=False):
+        with self._lock:
+            mean, std = self.completion_sec
+            duration = max(0.05, self._rng.gauss(mean, std)) + (self.start_extra_sec if first else 0.0)
+            failed = self._rng.random() < self.failure_rate
+        message_id = uuid.uuid4().hex
+        self.messages[message_id] = {
+            "space_id": space_id,
+            "conversation_id": conversation_id,
+            "question": question,
+            "created": time.monotonic(),
+            "duration": duration,
+            "failed": failed,
+        }
+        return {"conversation_id": conversation_id, "message_id": message_id, "status": "SUBMITTED"}
+
+    def message_status(self, message_id):
+        message = self.messages[message_id]
+        elapsed = time.monotonic() - message["created"]
+        if elapsed >= message["duration"]:
+            return "FAILED" if message["failed"] else "COMPLETED"
+        if not self.status_sequence:
+            return "SUBMITTED"
+        step = int(elapsed / message["duration"] * len(self.status_sequence))
+        return self.status_sequence[min(step, len(self.status_sequence) - 1)]
+
+    def get_message(self, message_id):
+        message = self.messages[message_id]
+        status = self.message_status(message_id)
+        body = {
+            "conversation_id": message["conversation_id"],
+            "message_id": message_id,
+            "status": status,
+            "attachments": [],
+        }
+        if status == "COMPLETED":
+            body["attachments"] = [{
+                "attachment_id": f"att-{message_id}",
+                "query": {"description": f"[fake] {message['question']}", "query": "SELECT 1"},
+            }]
+        return body
+
+    COLUMNS = [
+        {"name": "업종명", "type_name": "STRING", "position": 0},
+        {"name": "매출액", "type_name": "LONG", "position": 1},
+        {"name": "객단가", "type_name": "DOUBLE", "position": 2},
+    ]
+
+    def _chunk(self, statement_id, index):
+        size = self.chunk_rows or self.rows
+        start = index * size
+        end = min(self.rows, start + size)
+        chunk = {
+            "chunk_index": index,
+            "row_offset": start,
+            "row_count": end - start,
+            "data_array": [[f"업종{i}", str(1000000 * (i + 1)), f"{12345.6 + i:.1f}"] for i in range(start, end)],
+        }
+        if end < self.rows:
+            chunk["next_chunk_index"] = index + 1
+            chunk["next_chunk_internal_link"] = f"/api/2.0/sql/statements/{statement_id}/result/chunks/{index + 1}"
+        return chunk
+
+    def query_result(self):
+        statement_id = uuid.uuid4().hex
+        size = self.chunk_rows or self.rows or 1
+        return {
+            "statement_response": {
+                "statement_id": statement_id,
+                "status": {"state": "SUCCEEDED"},
+                "manifest": {"format": "JSON_ARRAY",
+                             "schema": {"column_count": len(self.COLUMNS), "columns": self.COLUMNS},
+                             "total_row_count": self.rows, "total_chunk_count": max(1, -(-self.rows // size))},
+                "result": self._chunk(statement_id, 0),
+            }
+        }
+
+    def result_chunk(self, statement_id, index):
+        return self._chunk(statement_id, index)
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body):
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _dispatch(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            if state.http_latency_sec:
+                time.sleep(state.http_latency_sec)
+
+            for route_method, pattern, name in ROUTES:
+                match = pattern.match(self.path.split("?")[0])
+                if route_method != method or not match:
+                    continue
+                state.count(name)
+                params = match.groupdict()
+                if name == "start_conversation":
+                    return self._send(200, state.new_message(params["space"], uuid.uuid4().hex, body.get("content", ""),
+                                                                first=True))
+                if name == "create_message":
+                    return self._send(200, state.new_message(params["space"], params["conv"], body.get("content", "")))
+                if name == "get_space":
+                    return self._send(200, {"space_id": params["space"], "title": "fake space"})
+                if name == "result_chunk":
+                    return self._send(200, state.result_chunk(params["stmt"], int(params["chunk"])))
+                if params.get("msg") not in state.messages:
+                    return self._send(404, {"error_code": "NOT_FOUND"})
+                if name == "get_message":
+                    return self._send(200, state.get_message(params["msg"]))
+                return self._send(200, state.query_result())
+
+            self._send(404, {"error_code": "ENDPOINT_NOT_FOUND", "path": self.path})
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+# 백그라운드 스레드에서 서버 실행, (server, state, base_url) 반환
+def start_fake_genie_server(host="127.0.0.1", port=0, **state_kwargs):
+    state = FakeGenieState(**state_kwargs)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-genie", daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
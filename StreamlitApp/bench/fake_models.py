@@ -0,0 +1,88 @@
+import re
+import time
+import hashlib
+import numpy as np
+from typing import Any, Iterator, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from handlers.entity_extractor import RuleBasedRouter
+
+_rules = RuleBasedRouter(min_score=0, min_confidence=0)
+
+
+# OpenAI 채팅 모델 대체: 프롬프트 종류(라우터 / MultiQuery / RAG 답변)에 맞는 응답을 지연 시간과 함께 반환
+class FakeChatModel(BaseChatModel):
+    first_token_sec: float = 0.4
+    token_sec: float = 0.01
+    answer_tokens: int = 200
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, prompt: str) -> str:
+        if "분류기" in prompt:
+            question = prompt.rsplit("질문:", 1)[-1]
+            decision = _rules.classify(question)
+            return decision.route or "X"
+        if "different versions" in prompt:
+            question = prompt.rsplit("Original question:", 1)[-1].strip()
+            return "\n".join(f"{question} ({i})" for i in range(1, 4))
+        return " ".join(f"답변{i}" for i in range(self.answer_tokens))
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    @staticmethod
+    def _usage(prompt: str, reply: str) -> dict:
+        prompt_tokens, completion_tokens = len(prompt) // 2, len(reply.split())
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        reply = self._reply(prompt)
+        time.sleep(self.first_token_sec + self.token_sec * len(reply.split()))
+        message = AIMessage(content=reply, usage_metadata=self._usage(prompt, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"token_usage": {"prompt_tokens": message.usage_metadata["input_tokens"],
+                                                      "completion_tokens": message.usage_metadata["output_tokens"],
+                                                      "total_tokens": message.usage_metadata["total_tokens"]}})
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        reply = self._reply(prompt)
+        time.sleep(self.first_token_sec)
+        for token in re.findall(r"\S+\s*", reply):
+            time.sleep(self.token_sec)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, reply)))
+
+
+# OpenAI 임베딩 대체: 텍스트 해시로 만든 결정적 단위 벡터
+class FakeEmbeddings(Embeddings):
+    def __init__(self, size=256, latency_sec=0.05):
+        self.size = size
+        self.latency_sec = latency_sec
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency_sec)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency_sec)
+        return self._vector(text)
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# StreamlitApp / StreamlitApp/server 를 import 경로에 추가 (페이지와 같은 import 방식 사용)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "server"))
+
+from bench.fake_genie_server import start_fake_genie_server
+
+# 사용법 (StreamlitApp 폴더에서):
+#   python -m bench.run_benchmark --requests 90 --concurrency 8 --json bench_result.json
+# OpenAI / Databricks 호출 없이 로컬 가짜 Genie 서버와 가짜 LLM·임베딩으로 run_chatbot 전체 경로를 측정
+
+# 예시 질문 (route A/B/C/D/X 와 복합 질문(M) 고루 포함)
+DEFAULT_QUESTIONS = [
+    "전통시장에서 2024년 3분기에 가장 높은 객단가를 기록한 업종을 3개정도 보여주세요",
+    "골목상권에서 남성에게 매출기준 가장 인기가 높은 업종 TOP10을 보여주세요",
+    "오후 8시에 가장 유동인구가 많은 지역 10개를 보여줘",
+    "마포구에서 지금 운영중인 식당 리스트 보여줘",
+    "올해 강남구에서 한식 음식점 차리는건 위험할까요?",
+    "보통 영등포구에서 카페를 차리면 얼마나 영업하나요?",
+    "청년이 창업하기 위해 지원받을 수 있는게 있을까요?",
+    "요즘 장사가 너무 안되는데 도움을 받을 수 있는 지원이 있을까요?",
+    "안녕하세요",
+    "올해 강남구 한식 창업 위험도와 매출 추이",
+]
+
+# 가짜 RAG 인덱스에 넣을 문서
+FAKE_CORPUS = [
+    f"카테고리: 창업\n소분류: 청년\n사업명: 가짜지원사업{i}\n구분: 지원내용\n내용:\n청년 소상공인 창업 자금 {i}백만원 지원"
+    for i in range(50)
+]
+
+
+# SemanticAnswerCache와 같은 메서드 (항상 미적중)
+class _DisabledCache:
+    def get_exact(self, question):
+        return None
+
+    def get(self, question, route, slots=None):
+        return None
+
+    def put(self, question, route, slots, result):
+        pass
+
+    def stats(self):
+        return {}
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+# 로컬 대체 모델/서버로 graph_runner 구성
+def setup(args):
+    server, genie_state, base_url = start_fake_genie_server(
+        completion_sec=(args.genie_mean, args.genie_std),
+        failure_rate=args.genie_failure_rate,
+        http_latency_sec=args.http_latency,
+        rows=args.rows,
+        chunk_rows=args.chunk_rows,
+        start_extra_sec=args.genie_start_extra,
+    )
+    os.environ.update({
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "bench",
+        "DATABRICKS_WORKSPACE": base_url,
+        "DATABRICKS_TOKEN_SALE": "bench", "DATABRICKS_SPACE_ID_SALE": "space-sales",
+        "DATABRICKS_TOKEN_LICENSE": "bench", "DATABRICKS_SPACE_ID_LICENSE": "space-license",
+        "DATABRICKS_TOKEN_100": "bench", "DATABRICKS_SPACE_ID_100": "space-100",
+    })
+    # Genie/LLM/임베딩 호출 기록·재생 (handlers.cassette는 import 시점에 환경 변수를 읽음)
+    if args.cassette_mode != "off":
+        os.environ.update({
+            "CHATBOT_CASSETTE_MODE": args.cassette_mode,
+            "CHATBOT_CASSETTE_PATH": args.cassette,
+            "CHATBOT_CASSETTE_SPEED": str(args.cassette_speed),
+        })
+
+    from langchain_community.vectorstores import FAISS
+    from bench.fake_models import FakeChatModel, FakeEmbeddings
+    from handlers.answer_cache import SemanticAnswerCache
+    from handlers.local_rag_handler import LocalRAGHandler
+    from handlers.router import LLMRouter
+    from server import graph_runner
+
+    embedding = FakeEmbeddings(latency_sec=args.embed_latency)
+    llm = FakeChatModel(first_token_sec=args.llm_first_token, token_sec=args.llm_token)
+
+    faiss_dir = tempfile.mkdtemp(prefix="bench_faiss_")
+    FAISS.from_texts(FAKE_CORPUS, embedding,
+                     metadatas=[{"title": f"가짜지원사업{i}", "source": f"https://example.com/{i}"}
+                                for i in range(len(FAKE_CORPUS))]).save_local(faiss_dir)
+
+    graph_runner.override_instances(
+        router=LLMRouter(llm=llm),
+        rag_api=LocalRAGHandler(bucket="bench", key="bench", faiss_dir=faiss_dir, llm=llm, embedding=embedding),
+    )
+    graph_runner.answer_cache = (SemanticAnswerCache(embed_fn=embedding.embed_query)
+                                 if args.with_cache else _DisabledCache())
+    graph_runner.get_graph()
+
+    # 미리 시작한 Genie 대화 풀: 측정 전에 모두 준비될 때까지 대기
+    pool = graph_runner.conversation_pool
+    pool.size = args.warm_conversations
+    if pool.enabled:
+        pool.prefill()
+        ends_at = time.monotonic() + 60
+        while time.monotonic() < ends_at and any(s["pending"] for s in pool.stats().values()):
+            time.sleep(0.05)
+    return server, genie_state, graph_runner
+
+
+def run(args):
+    server, genie_state, graph_runner = setup(args)
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    from handlers.conversation_state import ConversationState
+
+    # 가상 사용자별 Genie 대화 상태 (요청 i는 사용자 i % users의 질문)
+    conversations = [ConversationState() for _ in range(args.users)]
+    results = []
+    lock = threading.Lock()
+
+    def one(i):
+        question = questions[i % len(questions)]
+        started = time.perf_counter()
+        try:
+            result = graph_runner.run_chatbot(question, history=[],
+                                             conversation=conversations[i % args.users])
+            route, error = result.get("route"), (result.get("response") or "").startswith("❗")
+        except Exception as e:
+            route, error = "ERROR", True
+            print(f"[BENCH] 요청 실패: {e}")
+        with lock:
+            results.append({"route": route or "?", "latency": time.perf_counter() - started, "error": error})
+
+    # 출력 잡음 줄이기: graph_runner의 [DEBUG] 출력 숨김
+    devnull = open(os.devnull, "w")
+    real_stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = devnull
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in as_completed([pool.submit(one, i) for i in range(args.requests)]):
+                future.result()
+    finally:
+        sys.stdout = real_stdout
+        devnull.close()
+    wall = time.perf_counter() - started
+
+    report = summarize(results, wall, args, graph_runner, genie_state)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    server.shutdown()
+    return report
+
+
+def summarize(results, wall, args, graph_runner, genie_state):
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for r in results:
+        by_route[r["route"]].append(r["latency"])
+        by_route["ALL"].append(r["latency"])
+        if r["error"]:
+            errors[r["route"]] += 1
+            errors["ALL"] += 1
+
+    routes = {}
+    for route, values in sorted(by_route.items()):
+        routes[route] = {
+            "count": len(values),
+            "errors": errors[route],
+            "throughput_rps": round(len(values) / wall, 3),
+            "mean_ms": round(sum(values) / len(values) * 1000, 1),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+    return {
+        "config": vars(args),
+        "wall_sec": round(wall, 3),
+        "routes": routes,
+        "nodes": graph_runner.get_latency_summary("node"),
+        "genie_poll": graph_runner.get_genie_poll_stats(),
+        "genie_requests": genie_state.request_counts,
+        "conversation_pool": graph_runner.get_conversation_pool_stats(),
+        "token_usage": graph_runner.get_token_usage_stats(),
+    }
+
+
+def print_report(report):
+    print(f"\n[BENCH] wall={report['wall_sec']}s  concurrency={report['config']['concurrency']}")
+    print(f"{'route':<6}{'count':>7}{'err':>5}{'rps':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for route, r in report["routes"].items():
+        print(f"{route:<6}{r['count']:>7}{r['errors']:>5}{r['throughput_rps']:>8}{r['mean_ms']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}")
+    print("\n[BENCH] 노드별 지연 (ms)")
+    for n in report["nodes"]:
+        if n["route"] is None:
+            print(f"  {n['name']:<20} count={n['count']:<5} p50={n['p50_ms']:<8} p95={n['p95_ms']:<8} p99={n['p99_ms']}")
+    print("\n[BENCH] Genie 폴링:", json.dumps(report["genie_poll"], ensure_ascii=False))
+    print("[BENCH] Genie 요청 수:", json.dumps(report["genie_requests"], ensure_ascii=False))
+    print("\n[BENCH] LLM 토큰 사용량")
+    for s in report["token_usage"]["stages"]:
+        print(f"  {s['stage']:<16} node={s['node'] or '-':<14} route={s['route'] or '-':<3} calls={s['calls']:<4}"
+              f" prompt={s['prompt_tokens']:<7} completion={s['completion_tokens']:<7} ${s['cost_usd']:.5f}")
+    if report["config"]["warm_conversations"]:
+        print("[BENCH] 대화 풀:", json.dumps(report["conversation_pool"], ensure_ascii=False))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="run_chatbot 오프라인 벤치마크 (로컬 Genie/OpenAI 대체)")
+    parser.add_argument("--requests", type=int, default=45)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=4, help="가상 사용자 수 (사용자별 Genie 대화 유지)")
+    parser.add_argument("--questions", help="질문 목록 파일 (한 줄에 하나)")
+    parser.add_argument("--genie-mean", type=float, default=2.0, help="Genie 완료까지 평균 시간(초)")
+    parser.add_argument("--genie-std", type=float, default=0.5)
+    parser.add_argument("--genie-failure-rate", type=float, default=0.0)
+    parser.add_argument("--http-latency", type=float, default=0.02)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--genie-start-extra", type=float, default=0.0,
+                        help="새 대화 첫 메시지에 더할 처리 시간(초)")
+    parser.add_argument("--warm-conversations", type=int, default=0,
+                        help="space별로 미리 시작해 둘 Genie 대화 수 (0이면 사용 안 함)")
+    parser.add_argument("--chunk-rows", type=int, default=0, help="Genie 결과 chunk 크기 (0이면 한 번에)")
+    parser.add_argument("--llm-first-token", type=float, default=0.4)
+    parser.add_argument("--llm-token", type=float, default=0.005)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--cassette-mode", choices=["off", "record", "replay"], default="off",
+                        help="외부 호출 기록/재생 (replay면 기록된 응답과 소요 시간을 그대로 사용)")
+    parser.add_argument("--cassette", default="bench_cassette.jsonl.gz", help="기록 파일 경로")
+    parser.add_argument("--cassette-speed", type=float, default=1.0, help="재생 시 소요 시간 배율 (0이면 대기 없음)")
+    parser.add_argument("--with-cache", action="store_true", help="답변 캐시 사용")
+    parser.add_argument("--json", help="결과를 저장할 JSON 경로")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "server"))
+
+from handlers.policy_xml import iter_policy_records, EXCLUDED_SECTIONS
+
+# 사용법 (StreamlitApp 폴더에서):
+#   python -m bench.xml_parse_benchmark --items 3000
+#   python -m bench.xml_parse_benchmark --xml support_contents.xml   (실제 파일로 측정)
+# 기존 방식(ET.fromstring + Item마다 BeautifulSoup)과 policy_xml(iterparse + lxml XPath)을
+# 각각 별도 프로세스에서 실행해 소요 시간과 최대 메모리(RSS)를 비교하고, 결과 레코드가 같은지 확인
+
+SECTIONS = ["지원대상", "지원내용", "신청방법", "신청기간", "문의처", "만족도"]
+
+
+# 실제 지원사업 XML과 같은 구조의 가짜 파일 생성
+def make_xml(path, items, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<Root>\n')
+        n = 0
+        for c in range(max(1, items // 200)):
+            f.write(f'<Category name="분야{c}">\n')
+            for s in range(4):
+                # 일부 분야는 하위 분류 없이 Item이 바로 들어 있음
+                wrap = c % 3 != 0
+                if wrap:
+                    f.write(f'<Subcategory name="소분류{c}-{s}">\n')
+                for _ in range(50):
+                    body = "".join(
+                        f"<dl><dt> {sec} </dt><dd><p>{sec} 안내 {n}-{k}</p>"
+                        + "".join(f"<li>세부 항목 {j} {'가나다라마바사' * rng.randint(1, 6)}</li>" for j in range(rng.randint(2, 8)))
+                        + "</dd></dl>"
+                        for k, sec in enumerate(SECTIONS))
+                    f.write(f"<Item><Title>지원사업 {n}</Title><URL>https://example.com/{n}</URL>"
+                            f"<Content><![CDATA[<div class=\"cont\">{body}</div>]]></Content></Item>\n")
+                    n += 1
+                if wrap:
+                    f.write("</Subcategory>\n")
+            f.write("</Category>\n")
+        f.write("</Root>\n")
+
+
+# 변경 전 로더와 같은 방식 (비교 기준)
+def legacy_records(path):
+    from bs4 import BeautifulSoup
+
+    with open(path, "rb") as f:
+        root = ET.fromstring(f.read())
+    records = []
+    for category in root.findall("Category"):
+        category_name = category.get("name", "")
+        subcategories = category.findall("Subcategory")
+        groups = [(sub.get("name", ""), sub.findall("Item")) for sub in subcategories] if subcategories \
+            else [(None, category.findall("Item"))]
+        for subcategory_name, items in groups:
+            for item in items:
+                soup = BeautifulSoup(item.findtext("Content") or "", "lxml")
+                for dl in soup.find_all("dl"):
+                    dt, dd = dl.find("dt"), dl.find("dd")
+                    if dt and dd and dt.get_text(strip=True) not in EXCLUDED_SECTIONS:
+                        records.append((category_name, subcategory_name, item.findtext("Title"),
+                                        item.findtext("URL"), dt.get_text(strip=True),
+                                        dd.get_text(separator="\n", strip=True)))
+    return records
+
+
+def stream_records(path):
+    with open(path, "rb") as f:
+        yield from iter_policy_records(f)
+
+
+# 자식 프로세스: 한 가지 방식만 실행하고 결과를 JSON 한 줄로 출력
+# (레코드는 하나씩 체크섬에 반영해, 스트리밍 방식은 목록을 만들지 않은 상태의 메모리를 측정)
+def run_one(impl, path):
+    started = time.perf_counter()
+    checksum, count = hashlib.sha1(), 0
+    for record in (legacy_records(path) if impl == "legacy" else stream_records(path)):
+        checksum.update(json.dumps(list(record), ensure_ascii=False).encode("utf-8"))
+        count += 1
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "impl": impl,
+        "records": count,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "checksum": checksum.hexdigest(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="지원사업 XML 파싱 벤치마크 (기존 방식 vs policy_xml)")
+    parser.add_argument("--items", type=int, default=3000, help="가짜 XML의 Item 수")
+    parser.add_argument("--xml", help="측정할 XML 파일 (없으면 가짜 파일 생성)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--run", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 가짜 XML은 저장소가 아닌 임시 폴더에 생성
+    path = args.xml or os.path.join(tempfile.gettempdir(), f"_policy_{args.items}.xml")
+    if args.run:
+        run_one(args.run, path)
+        return
+    if not args.xml:
+        make_xml(path, args.items)
+    print(f"[BENCH] XML: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    results = {}
+    for impl in ("legacy", "stream"):
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, "-m", "bench.xml_parse_benchmark", "--run", impl, "--xml", path],
+                                 cwd=APP_DIR, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r["elapsed_ms"])
+        results[impl] = best
+        print(f"  {impl:<7} records={best['records']:<7} best={best['elapsed_ms']:>9.1f}ms  "
+              f"max_rss={best['max_rss_mb']:.1f}MB")
+
+    same = results["legacy"]["checksum"] == results["stream"]["checksum"]
+    print(f"[BENCH] 속도 {results['legacy']['elapsed_ms'] / max(results['stream']['elapsed_ms'], 0.1):.1f}배, "
+          f"결과 일치: {same}")
+    if not args.xml:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
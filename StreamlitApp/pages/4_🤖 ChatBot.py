@@ -2,8 +2,12 @@ import streamlit as st
 import os
 import io
 import pandas as pd
-import matplotlib.pyplot as plt
-from server.chatbot_run import ChatbotRun
+from matplotlib.figure import Figure
+from server.chatbot_run import ChatbotRun, start_background_warm_up
+from handlers.job_runner import JobQueueFull
+
+# 핸들러/그래프/RAG 인덱스를 백그라운드에서 미리 로딩 (프로세스당 한 번, CHATBOT_API_URL 설정 시 생략)
+start_background_warm_up()
 
 # 세션 상태에 챗봇 인스턴스 저장
 if "chatbot" not in st.session_state:
@@ -35,8 +39,70 @@ st.markdown("""
 - 질문 시에는 **구체적인 질문**을 해주시면 더 정확한 답변을 받을 수 있습니다.
 """)
 
-# 이전 대화 출력
-for chat in chatbot.get_chat_history():
+# 메시지별 렌더링 결과 캐시 (message id[:하위 질문 번호] → 숫자 컬럼 설정, 차트 PNG)
+# rerun 때마다 이전 메시지의 차트를 다시 그리지 않도록 한 번 만든 결과를 재사용
+if "render_cache" not in st.session_state:
+    st.session_state.render_cache = {}
+
+
+# 앞 컬럼을 x축, 숫자 컬럼 2개를 양쪽 y축으로 하는 차트 PNG (숫자 컬럼이 2개 미만이면 None)
+def build_chart_png(df):
+    numeric_cols = df.select_dtypes(include="number").columns
+    if len(numeric_cols) < 2:
+        return None
+    x_col = df.columns[0]
+    y1_col = numeric_cols[0]
+    y2_col = numeric_cols[1]
+
+    # pyplot 전역 상태를 쓰지 않는 Figure 객체로 그려서 바로 PNG로 저장
+    fig = Figure(figsize=(10, 5))
+    ax1 = fig.subplots()
+    ax2 = ax1.twinx()
+
+    ax1.plot(df[x_col], df[y1_col], color='tab:blue', marker='o')
+    ax2.plot(df[x_col], df[y2_col], color='tab:orange', marker='x')
+
+    ax1.set_xlabel(x_col)
+    ax1.set_ylabel(y1_col, color='tab:blue')
+    ax2.set_ylabel(y2_col, color='tab:orange')
+    ax1.set_title(f"{y1_col} & {y2_col} by {x_col}")
+    ax1.tick_params(axis="x", rotation=45)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def get_render_artifacts(cache_key, df):
+    cache = st.session_state.render_cache
+    if cache_key not in cache:
+        numeric_cols = df.select_dtypes(include="number").columns
+        try:
+            chart_png, chart_error = build_chart_png(df), None
+        except Exception as e:
+            chart_png, chart_error = None, str(e)
+        cache[cache_key] = {
+            # 숫자 컬럼은 값은 그대로 두고 화면에서만 천 단위 구분 표시
+            "column_config": {col: st.column_config.NumberColumn(format="localized") for col in numeric_cols},
+            "chart_png": chart_png,
+            "chart_error": chart_error,
+        }
+    return cache[cache_key]
+
+
+def render_table(cache_key, df):
+    if not isinstance(df, pd.DataFrame):
+        return
+    artifacts = get_render_artifacts(cache_key, df)
+    st.dataframe(df, column_config=artifacts["column_config"])
+    if artifacts["chart_png"]:
+        st.image(artifacts["chart_png"])
+    if artifacts["chart_error"]:
+        st.markdown(f"⚠️ 시각화 오류: {artifacts['chart_error']}")
+
+
+def render_message(chat):
     with st.chat_message("user"):
         st.markdown(chat["question"])
 
@@ -51,38 +117,16 @@ for chat in chatbot.get_chat_history():
             if description:
                 st.markdown(f"**📝 답변:** {description}")
 
-            df = answer.get("response_df")
-            if isinstance(df, pd.DataFrame):
-                try:
-                    formatted_df = df.copy()
-                    for col in formatted_df.select_dtypes(include=["number"]).columns:
-                        formatted_df[col] = formatted_df[col].apply(lambda x: f"{x:,.0f}")
-
-                    st.dataframe(formatted_df)
-
-                    numeric_cols = df.select_dtypes(include="number").columns
-                    if len(numeric_cols) >= 2:
-                        x_col = df.columns[0]
-                        y1_col = numeric_cols[0]
-                        y2_col = numeric_cols[1]
-
-                        fig, ax1 = plt.subplots(figsize=(10, 5))
-                        ax2 = ax1.twinx()
-
-                        ax1.plot(df[x_col], df[y1_col], color='tab:blue', marker='o')
-                        ax2.plot(df[x_col], df[y2_col], color='tab:orange', marker='x')
+            render_table(chat["id"], answer.get("response_df"))
 
-                        ax1.set_xlabel(x_col)
-                        ax1.set_ylabel(y1_col, color='tab:blue')
-                        ax2.set_ylabel(y2_col, color='tab:orange')
-                        plt.title(f"{y1_col} & {y2_col} by {x_col}")
-                        plt.xticks(rotation=45)
-                        plt.tight_layout()
-
-                        st.pyplot(fig)
-
-                except Exception as e:
-                    st.markdown(f"⚠️ 시각화 오류: {e}")
+            # 복합 질문: 하위 질문별 결과
+            for i, sub in enumerate(answer.get("sub_results") or []):
+                st.markdown(f"##### {sub['label']} · {sub['question']}")
+                if sub.get("response"):
+                    st.markdown(sub["response"].replace("\n", "  \n"))
+                if sub.get("description"):
+                    st.markdown(f"**📝 답변:** {sub['description']}")
+                render_table(f"{chat['id']}:{i}", sub.get("response_df"))
 
         elif isinstance(answer, pd.DataFrame):
             st.dataframe(answer)
@@ -90,13 +134,21 @@ for chat in chatbot.get_chat_history():
         else:
             st.markdown(str(answer).replace("\n", "  \n"))
 
+
+# 이전 대화 출력 (fragment로 분리, 메시지별 렌더링 결과는 캐시에서 재사용)
+@st.fragment
+def render_history():
+    for chat in chatbot.get_chat_history():
+        render_message(chat)
+
+render_history()
+
 # 🔁 대화 초기화 버튼
 if st.button("대화 초기화"):
-    st.session_state.pop("genie_sales_conversation_id", None)
-    st.session_state.pop("genie_license_conversation_id", None)
-    st.session_state.pop("genie_100_conversation_id", None)
     st.session_state.pop("chat_history", None)
-    st.session_state.chatbot = ChatbotRun()
+    st.session_state.pop("pending_job", None)
+    st.session_state.render_cache = {}
+    chatbot.reset()
     st.rerun()
     
 
@@ -104,17 +156,50 @@ if st.button("대화 초기화"):
 example_prompt = st.session_state.pop("example_prompt") if "example_prompt" in st.session_state else ""
 input_container = st.container()
 with input_container:
-    prompt = st.chat_input("질문을 입력하세요")
+    prompt = st.chat_input("질문을 입력하세요", disabled="pending_job" in st.session_state)
     if example_prompt:
         st.session_state["_input_chat"] = example_prompt
         st.rerun()
 
 prompt = st.session_state.pop("_input_chat") if "_input_chat" in st.session_state else prompt
 
-if prompt:
-    with st.spinner("생성 중..."):
-        result = chatbot.ask_question(prompt)
-    st.rerun()
+# 질문은 작업 풀에서 처리하고, 스크립트는 바로 끝나서 Streamlit 서버 스레드를 붙잡지 않음
+if prompt and "pending_job" not in st.session_state:
+    try:
+        st.session_state.pending_job = chatbot.submit_question(prompt)
+        st.rerun()
+    except JobQueueFull:
+        st.warning("지금 질문이 많아 바로 처리할 수 없습니다. 잠시 후 다시 시도해주세요.")
+
+if "job_error" in st.session_state:
+    st.error(f"답변 생성 중 오류가 발생했습니다: {st.session_state.pop('job_error')}")
+
+# 진행 중인 질문: 이 영역만 주기적으로 다시 그려 진행 단계와 생성 중인 답변을 표시
+# 완료되면 전체 페이지를 rerun 해서 대화 기록(표/차트 포함)으로 보여줌
+@st.fragment(run_every=0.5)
+def show_pending_job():
+    job = st.session_state.get("pending_job")
+    if job is None:
+        return
+    snapshot = job.snapshot()
+    if snapshot["done"]:
+        st.session_state.pop("pending_job", None)
+        chatbot.complete_job(job)
+        if snapshot["error"]:
+            st.session_state["job_error"] = snapshot["error"]
+        st.rerun()
+
+    with st.chat_message("user"):
+        st.markdown(snapshot["question"])
+    with st.chat_message("assistant"):
+        st.caption(f"⏳ {snapshot['stage_label']}... ({snapshot['elapsed_sec']:.1f}초)")
+        if snapshot["text"]:
+            st.markdown(snapshot["text"].replace("\n", "  \n"))
+        if snapshot["preview_df"] is not None:
+            st.dataframe(snapshot["preview_df"])
+
+if "pending_job" in st.session_state:
+    show_pending_job()
 
 # 예시 질문 버튼
 st.markdown("""
@@ -0,0 +1,233 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from server.graph_runner import stream_chatbot, warm_up, get_metrics_text
+from handlers.conversation_state import ConversationManager
+from handlers.history_store import HistoryStore
+from handlers.job_runner import chat_job_runner, JobQueueFull, STAGE_LABELS
+from handlers.result_codec import encode_df, encode_result, dumps
+
+# 채팅 API 서버 (Streamlit 밖에서 graph 실행)
+# 실행: python -m server.chat_service  또는  uvicorn server.chat_service:app --host 0.0.0.0 --port 8600
+# - POST /chat           {"question", "session_id"?} → 최종 결과 JSON
+# - POST /chat/stream    같은 요청 → SSE (stage / token / preview / final / error 이벤트)
+# - POST /sessions/{id}/reset, GET /healthz, GET /readyz, GET /metrics
+# 작업 실행은 job_runner의 제한된 스레드 풀을 사용하고, 대기열이 가득 차면 503 + Retry-After 응답
+
+CHAT_SERVICE_HOST = os.getenv("CHAT_SERVICE_HOST", "0.0.0.0")
+CHAT_SERVICE_PORT = int(os.getenv("CHAT_SERVICE_PORT", "8600"))
+# 기동 시 RAG 인덱스까지 미리 로딩할지 여부
+CHAT_SERVICE_WARM_RAG = os.getenv("CHAT_SERVICE_WARM_RAG", "1") == "1"
+# 대기열이 가득 찼을 때 클라이언트에게 알려 줄 재시도 대기 시간(초)
+CHAT_SERVICE_RETRY_AFTER_SEC = int(os.getenv("CHAT_SERVICE_RETRY_AFTER_SEC", "2"))
+
+_started_at = time.time()
+_ready = threading.Event()
+
+
+# session_id별 Genie 대화 상태 + 대화 맥락 (오래 사용하지 않은 세션은 ConversationManager가 정리)
+class ChatSessions:
+    def __init__(self, sweep_sec=60):
+        self.conversations = ConversationManager()
+        self.sweep_sec = sweep_sec
+        self._lock = threading.Lock()
+        self._histories = {}
+        self._last_sweep = time.monotonic()
+
+    def get(self, session_id=None):
+        conversation = self.conversations.get(session_id)
+        with self._lock:
+            self._sweep_locked()
+            history = self._histories.setdefault(conversation.session_id, HistoryStore())
+        return conversation, history
+
+    def reset(self, session_id):
+        self.conversations.drop(session_id)
+        with self._lock:
+            self._histories.pop(session_id, None)
+
+    def _sweep_locked(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_sec:
+            return
+        self._last_sweep = now
+        for session_id in [sid for sid in self._histories if sid not in self.conversations]:
+            del self._histories[session_id]
+
+    def __len__(self):
+        return len(self.conversations)
+
+
+sessions = ChatSessions()
+
+
+# 작업 스레드에서 한 턴을 실행하며 이벤트를 emit(kind, payload)로 전달
+def _run_turn(job, question, conversation, history, emit):
+    try:
+        for kind, payload in stream_chatbot(question, history=history.context(), conversation=conversation):
+            if kind == "stage":
+                job.set_stage(payload)
+            elif kind == "token":
+                job.set_stage("answering")
+            elif kind == "final":
+                history.add(question, payload)
+            emit(kind, payload)
+            if kind == "final":
+                return payload
+    except Exception as e:
+        emit("error", str(e))
+        raise
+
+
+# 작업 풀에 턴을 제출하고 이벤트를 비동기로 하나씩 반환 (final 또는 error에서 끝남)
+async def _turn_events(question, session_id):
+    conversation, history = sessions.get(session_id)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def emit(kind, payload):
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, payload))
+
+    # 대기열이 가득 차면 JobQueueFull (호출 측에서 503 처리)
+    chat_job_runner.submit(question, lambda job: _run_turn(job, question, conversation, history, emit))
+    yield "session", conversation.session_id
+    while True:
+        kind, payload = await queue.get()
+        yield kind, payload
+        if kind in ("final", "error"):
+            return
+
+
+def _busy_response(e):
+    return JSONResponse({"error": str(e)}, status_code=503,
+                        headers={"Retry-After": str(CHAT_SERVICE_RETRY_AFTER_SEC)})
+
+
+async def _read_question(request):
+    body = await request.json()
+    question = (body.get("question") or "").strip()
+    return question, body.get("session_id")
+
+
+async def chat(request: Request):
+    question, session_id = await _read_question(request)
+    if not question:
+        return JSONResponse({"error": "question이 비어 있습니다."}, status_code=400)
+    events = _turn_events(question, session_id)
+    try:
+        _, session_id = await events.__anext__()
+    except JobQueueFull as e:
+        return _busy_response(e)
+    async for kind, payload in events:
+        if kind == "final":
+            # 결과에 numpy 값 등이 섞일 수 있어 default=str로 직렬화
+            return Response(dumps({"session_id": session_id, "result": encode_result(payload)}),
+                            media_type="application/json")
+        if kind == "error":
+            return JSONResponse({"session_id": session_id, "error": payload}, status_code=500)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+async def chat_stream(request: Request):
+    question, session_id = await _read_question(request)
+    if not question:
+        return JSONResponse({"error": "question이 비어 있습니다."}, status_code=400)
+    events = _turn_events(question, session_id)
+    try:
+        _, session_id = await events.__anext__()
+    except JobQueueFull as e:
+        return _busy_response(e)
+
+    # 클라이언트가 연결을 끊어도 작업은 끝까지 실행되어 세션 대화 기록에 남음
+    async def body():
+        yield _sse("session", {"session_id": session_id})
+        async for kind, payload in events:
+            if kind == "stage":
+                yield _sse("stage", {"stage": payload, "label": STAGE_LABELS.get(payload, payload)})
+            elif kind == "token":
+                yield _sse("token", {"text": payload})
+            elif kind == "preview":
+                yield _sse("preview", encode_df(payload))
+            elif kind == "final":
+                yield _sse("final", encode_result(payload))
+            elif kind == "error":
+                yield _sse("error", {"error": payload})
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def reset_session(request: Request):
+    sessions.reset(request.path_params["session_id"])
+    return JSONResponse({"ok": True})
+
+
+# 프로세스가 살아 있는지 (로드밸런서 liveness)
+async def healthz(request: Request):
+    return JSONResponse({"status": "ok", "uptime_sec": round(time.time() - _started_at, 1),
+                         "sessions": len(sessions), "jobs": chat_job_runner.stats()})
+
+
+# 요청을 받을 수 있는지 (사전 로딩 완료 + 대기열 여유), 아니면 503
+async def readyz(request: Request):
+    stats = chat_job_runner.stats()
+    if not _ready.is_set():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    if stats["queued"] >= chat_job_runner.max_queue:
+        return JSONResponse({"status": "busy", "jobs": stats}, status_code=503,
+                            headers={"Retry-After": str(CHAT_SERVICE_RETRY_AFTER_SEC)})
+    return JSONResponse({"status": "ready", "jobs": stats})
+
+
+async def metrics(request: Request):
+    return PlainTextResponse(get_metrics_text(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async def _warm_up():
+        try:
+            await asyncio.to_thread(warm_up, CHAT_SERVICE_WARM_RAG)
+        except Exception as e:
+            print("[ERROR] [SERVICE] 사전 로딩 실패:", str(e))
+        _ready.set()
+        print("[DEBUG] [SERVICE] 요청 처리 준비 완료")
+
+    task = asyncio.create_task(_warm_up())
+    yield
+    task.cancel()
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/chat/stream", chat_stream, methods=["POST"]),
+        Route("/sessions/{session_id}/reset", reset_session, methods=["POST"]),
+        Route("/healthz", healthz),
+        Route("/readyz", readyz),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main():
+    import uvicorn
+    uvicorn.run(app, host=CHAT_SERVICE_HOST, port=CHAT_SERVICE_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,117 @@
 import sys
 import os
+import uuid
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from server.graph_runner import run_chatbot  # LangGraph 연결 함수
+from handlers.conversation_state import ConversationState
+from handlers.history_store import HistoryStore
+from handlers.job_runner import chat_job_runner
+
+# 채팅 API 서버 주소 (설정하면 graph를 이 프로세스에서 실행하지 않고 서버에 요청만 보냄)
+CHATBOT_API_URL = os.getenv("CHATBOT_API_URL", "")
+
+if CHATBOT_API_URL:
+    from handlers.chat_service_client import ChatServiceClient
+else:
+    from server.graph_runner import run_chatbot, stream_chatbot  # LangGraph 연결 함수
 
 class ChatbotRun:
-    def __init__(self):
+    def __init__(self, api_url=CHATBOT_API_URL):
         self.chat_history = []
+        # graph에 넘길 대화 맥락 (요약 + 최근 N개, 토큰 예산 내에서 증분 갱신)
+        self.history = HistoryStore()
+        # 이 사용자 세션의 Genie 대화 id (graph 실행 시 함께 전달)
+        self.conversation = ConversationState()
+        # 서버 모드: 대화 맥락과 Genie 대화는 서버가 session_id 기준으로 보관
+        self.client = ChatServiceClient(api_url, session_id=self.conversation.session_id) if api_url else None
+        # 초기화할 때마다 증가 (초기화 전에 시작된 작업의 결과는 기록하지 않음)
+        self.generation = 0
 
-    def ask_question(self, question: str):
-        print("[DEBUG] 보내는 history:", self.chat_history)
-        result = run_chatbot(
-            question,
-            history=[f"Q: {item['question']}\nA: {item['answer'].get('response', '')}" for item in self.chat_history]
-        )
-        print("[DEBUG] 받은 history:", result.get("history"))
-        print("[DEBUG] 받은 result:", result.get("response"))
+    def _history_for_graph(self):
+        return self.history.context()
+
+    # ("stage" | "token" | "preview" | "final", payload) 이벤트 (로컬 실행 또는 채팅 API 서버)
+    def _events(self, question: str):
+        if self.client:
+            return self.client.stream(question)
+        return stream_chatbot(question, history=self._history_for_graph(), conversation=self.conversation)
+
+    # 화면 렌더링 캐시는 메시지 id 기준으로 저장됨
+    def _record(self, question: str, result: dict):
         self.chat_history.append({
+            "id": uuid.uuid4().hex,
             "question": question,
             "answer": result
         })
+        self.history.add(question, result)
+
+    def ask_question(self, question: str):
+        print("[DEBUG] 보내는 history:", self.history.stats())
+        if self.client:
+            result = self.client.ask(question)
+        else:
+            result = run_chatbot(
+                question,
+                history=self._history_for_graph(),
+                conversation=self.conversation
+            )
+        print("[DEBUG] 받은 result:", (result.get("response") or "")[:100])
+        self._record(question, result)
+
+    # 작업 풀에 질문을 제출하고 바로 ChatJob 반환 (화면은 job.snapshot()으로 진행 상황을 확인)
+    # 작업 스레드는 결과만 반환하고, 대화 기록 반영은 스크립트 스레드에서 complete_job으로 처리
+    # 대기열이 가득 차면 JobQueueFull 예외 발생
+    def submit_question(self, question: str):
+        generation = self.generation
 
+        def run(job):
+            for kind, payload in self._events(question):
+                if kind == "stage":
+                    job.set_stage(payload)
+                elif kind == "token":
+                    job.set_stage("answering")
+                    job.append_text(payload)
+                elif kind == "preview":
+                    job.set_preview(payload)
+                elif kind == "final":
+                    return payload
+            # 최종 결과 없이 끝나면 작업 실패로 처리 (화면에 ❗ 오류 메시지 표시)
+            raise RuntimeError("graph produced no final result")
+
+        job = chat_job_runner.submit(question, run)
+        job.generation = generation
+        return job
+
+    # 끝난 작업의 결과를 대화 기록에 저장 (스크립트 스레드에서 호출)
+    # 실패했거나 작업 시작 후 대화를 초기화했으면 저장하지 않고 False 반환
+    def complete_job(self, job) -> bool:
+        snapshot = job.snapshot()
+        if not snapshot["done"] or snapshot["error"] or snapshot["result"] is None:
+            return False
+        if getattr(job, "generation", None) != self.generation:
+            print("[DEBUG] 초기화 전에 시작된 질문 결과는 버림:", snapshot["question"][:50])
+            return False
+        self._record(snapshot["question"], snapshot["result"])
+        return True
+
+
+    # 대화 기록과 Genie 대화를 모두 초기화
+    def reset(self):
+        self.generation += 1
+        self.chat_history = []
+        self.history.clear()
+        # 아직 실행 중인 작업이 이전 대화 상태에 Genie 대화를 기록해도 새 대화에 섞이지 않도록 객체를 교체
+        self.conversation = ConversationState(session_id=self.conversation.session_id)
+        if self.client:
+            self.client.reset()
 
     def get_chat_history(self):
-        print("[DEBUG] 전체 히스토리:", self.chat_history)
+        print("[DEBUG] 전체 히스토리:", len(self.chat_history))
         return self.chat_history
+
+
+# 로컬 실행일 때만 핸들러/그래프/RAG 인덱스를 백그라운드에서 미리 로딩 (서버 모드는 서버가 담당)
+def start_background_warm_up():
+    if not CHATBOT_API_URL:
+        from server.graph_runner import start_background_warm_up as _start
+        _start()
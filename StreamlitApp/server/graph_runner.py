@@ -1,15 +1,25 @@
-from langgraph.graph import StateGraph, END
+from handlers.startup_profiler import startup_profiler
+import time
+_module_started = time.perf_counter()
+
 from typing import TypedDict, Literal
-from handlers.genie_sales_handler import GenieSALESHandler
-from handlers.genie_license_handler import GenieLICENSEHandler
-from handlers.genie_100_handler import Genie100Handler
-from handlers.local_rag_handler import LocalRAGHandler
-from handlers.router import LLMRouter
+from handlers.genie_client import GenieClient
 from handlers.fallback_handler import fallback_example_node
+from handlers.genie_result_decoder import decode_chunks
+from handlers.genie_poller import GeniePoller, GeniePollTimeout, GeniePollFailed
+from handlers.answer_cache import SemanticAnswerCache
+from handlers.tracing import tracer, traced_node
+from handlers.conversation_state import ConversationState
+from handlers.history_store import context_text
+from handlers.question_decomposer import QuestionDecomposer
+from handlers.resilience import resilience
+from handlers.genie_conversation_pool import GenieConversationPool
+from handlers.token_accounting import token_accountant
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
-import time
+import threading
+import contextvars
 import pandas as pd
-import streamlit as st
 import os, sys
 sys.path.insert(0, "../handlers")
 load_dotenv()
@@ -17,302 +27,454 @@ load_dotenv()
 # OpenAI API Key 설정
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
-# 시스템 클래스 인스턴스 정의
-genie_sales_api = GenieSALESHandler(
-    workspace=os.environ["DATABRICKS_WORKSPACE"],
-    token=os.environ["DATABRICKS_TOKEN_SALE"],
-    space_id=os.environ["DATABRICKS_SPACE_ID_SALE"]
-)
-
-genie_license_api = GenieLICENSEHandler(
-    workspace=os.environ["DATABRICKS_WORKSPACE"],
-    token=os.environ["DATABRICKS_TOKEN_LICENSE"],
-    space_id=os.environ["DATABRICKS_SPACE_ID_LICENSE"]
-)
-
-genie_100_api = Genie100Handler(
-    workspace=os.environ["DATABRICKS_WORKSPACE"],
-    token=os.environ["DATABRICKS_TOKEN_100"],
-    space_id=os.environ["DATABRICKS_SPACE_ID_100"]
-)
-
-rag_api = LocalRAGHandler(
-    bucket=os.environ["BUCKET_NAME"],
-    key=os.environ["BUCKET_KEY_XML"],
-    pdf_prefix=os.environ.get("BUCKET_PREFIX_PDF")
-)
-
-router = LLMRouter()
+# ─────────────────────────────────────────────────────────────
+# 시스템 클래스 인스턴스 (프로세스 공용 싱글톤, 처음 사용할 때 생성)
+# langchain / boto3 / fitz 등 무거운 모듈은 생성 시점에 import 됨
+
+_instances = {}
+_instance_locks = {}
+_registry_lock = threading.Lock()
+
+def _singleton(name, factory):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _registry_lock:
+        lock = _instance_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _instances:
+            with startup_profiler.section(name, kind="init"):
+                _instances[name] = factory()
+    return _instances[name]
+
+# 싱글톤을 미리 만든 객체로 교체 (벤치마크/테스트에서 로컬 대체 핸들러 주입용)
+def override_instances(**instances):
+    with _registry_lock:
+        _instances.update(instances)
+
+# Genie space별 클라이언트 (같은 workspace는 HTTP 세션 공유)
+def _genie_client(token_env, space_env):
+    return GenieClient(
+        workspace=os.environ["DATABRICKS_WORKSPACE"],
+        token=os.environ[token_env],
+        space_id=os.environ[space_env]
+    )
+
+def get_genie_sales_api():
+    return _singleton("genie_sales_api", lambda: _genie_client("DATABRICKS_TOKEN_SALE", "DATABRICKS_SPACE_ID_SALE"))
+
+def get_genie_license_api():
+    return _singleton("genie_license_api", lambda: _genie_client("DATABRICKS_TOKEN_LICENSE", "DATABRICKS_SPACE_ID_LICENSE"))
+
+def get_genie_100_api():
+    return _singleton("genie_100_api", lambda: _genie_client("DATABRICKS_TOKEN_100", "DATABRICKS_SPACE_ID_100"))
+
+def _build_rag_api():
+    LocalRAGHandler = startup_profiler.timed_import("handlers.local_rag_handler").LocalRAGHandler
+    return LocalRAGHandler(
+        bucket=os.environ["BUCKET_NAME"],
+        key=os.environ["BUCKET_KEY_XML"],
+        pdf_prefix=os.environ.get("BUCKET_PREFIX_PDF")
+    )
+
+def get_rag_api():
+    return _singleton("rag_api", _build_rag_api)
+
+def _build_router():
+    LLMRouter = startup_profiler.timed_import("handlers.router").LLMRouter
+    return LLMRouter()
+
+def get_router():
+    return _singleton("router", _build_router)
+
+# Genie 폴링 엔진 (space별 완료 시간 학습, 프로세스 공용)
+genie_poller = GeniePoller()
+
+# space별로 미리 시작해 둔 Genie 대화 (새 세션의 start_conversation 지연 제거)
+conversation_pool = GenieConversationPool()
+conversation_pool.register("genie_sales", get_genie_sales_api)
+conversation_pool.register("genie_license", get_genie_license_api)
+conversation_pool.register("genie_100", get_genie_100_api)
+tracer.add_metric_provider(conversation_pool.metrics, metrics={
+    "chatbot_genie_pool_ready": ("gauge", "Pre-opened Genie conversations ready"),
+    "chatbot_genie_pool_pending": ("gauge", "Genie conversations being opened"),
+    "chatbot_genie_pool_takes_total": ("counter", "Genie pool takes by outcome"),
+    "chatbot_genie_pool_retired_total": ("counter", "Genie conversations retired"),
+    "chatbot_genie_pool_open_failures_total": ("counter", "Genie conversations that failed to open"),
+    "chatbot_genie_pool_connections_warmed_total": ("counter", "Genie connection warm-ups by outcome"),
+    "chatbot_genie_pool_refill_seconds": ("gauge", "Genie conversation open time quantiles in seconds"),
+})
+
+# 같은/비슷한 질문의 답변 캐시 (graph 실행 앞단)
+answer_cache = SemanticAnswerCache()
+
+# 한 번의 질문에 허용하는 최대 처리 시간(초)
+CHATBOT_DEADLINE_SEC = float(os.getenv("CHATBOT_DEADLINE_SEC", "60"))
+
+# Genie 결과 최대 행 수 (넘으면 남은 chunk는 가져오지 않음) / 나머지를 받는 동안 먼저 보여줄 행 수
+GENIE_RESULT_MAX_ROWS = int(os.getenv("GENIE_RESULT_MAX_ROWS", "10000"))
+GENIE_RESULT_PREVIEW_ROWS = int(os.getenv("GENIE_RESULT_PREVIEW_ROWS", "50"))
+
+# 복합 질문 분해 사용 여부 / 하위 질문 하나에 허용하는 최대 시간(초) / 하위 질문 실행 스레드 수
+CHATBOT_DECOMPOSE = os.getenv("CHATBOT_DECOMPOSE", "1") == "1"
+DECOMPOSE_BRANCH_TIMEOUT_SEC = float(os.getenv("DECOMPOSE_BRANCH_TIMEOUT_SEC", "45"))
+DECOMPOSE_WORKERS = int(os.getenv("DECOMPOSE_WORKERS", "16"))
+
+question_decomposer = QuestionDecomposer()
+_branch_pool = ThreadPoolExecutor(max_workers=DECOMPOSE_WORKERS, thread_name_prefix="chat-branch")
+
+# 하위 질문 결과 제목
+ROUTE_LABELS = {"A": "상권 매출", "B": "인허가·유동인구", "C": "창업 위험도·영업 기간", "D": "지원 정책", "X": "안내"}
 
 class GraphState(TypedDict, total=False):
     question: str
     history: list[str]
-    route: Literal["A", "B", "C", "D", "X"]
+    route: Literal["A", "B", "C", "D", "X", "M"]
     response: str
     response_df: pd.DataFrame
     description: str
-
+    sources: str
+    slots: dict
+    route_source: str
+    sub_questions: list
+    sub_results: list
+    deadline: float
+    conversation: ConversationState
+
+# 진행 단계 이벤트 (stream 실행 시 ("stage", 이름)으로 전달, invoke에서는 무시됨)
+def _emit_stage(stage: str):
+    from langgraph.config import get_stream_writer
+    get_stream_writer()({"stage": stage})
+
+# Genie 메시지 상태 → 화면 진행 단계
+_GENIE_RUNNING_STATUSES = {"PENDING_WAREHOUSE", "EXECUTING_QUERY"}
+
+@traced_node("question_node")
 def question_node(state: GraphState) -> GraphState:
     return {
         "question": state.get("question", ""),
         "history": state.get("history", [])
     }
 
+# 질문 분류: 복합 질문이면 하위 질문으로 나눠 fanout_node에서 동시에 처리 (route "M"), 아니면 router로 분류
+def _classify(question: str, history: list) -> dict:
+    context = context_text(history, recent_turns=3)
+
+    if CHATBOT_DECOMPOSE:
+        sub_questions = question_decomposer.decompose(question)
+        if sub_questions:
+            print(f"[DEBUG] 복합 질문 분해: {[(sub.route, sub.question) for sub in sub_questions]}")
+            return {"route": "M", "sub_questions": sub_questions, "route_source": "decomposer"}
+
+    decision = get_router().route_with_slots(question, context=context)
+    normalized_route = decision["route"].strip().upper()
+    print(f"[DEBUG] 정규화된 경로: {normalized_route} ({decision['source']})")
+    return {"route": normalized_route, "slots": decision["slots"], "route_source": decision["source"]}
+
+@traced_node("classify_node")
 def classify_node(state: GraphState) -> GraphState:
+    # 답변 캐시 조회를 위해 실행 전에 이미 분류한 경우 그대로 사용
+    if state.get("route"):
+        return state
+
+    _emit_stage("routing")
+    return {**state, **_classify(state["question"], state.get("history", []))}
+
+# Genie 공통 처리: 대화 시작/이어가기 → 적응형 폴링 → 결과 DataFrame 변환
+# 대화 상태(conversation)가 없으면 이번 질문만을 위한 새 대화로 처리
+def _ask_genie(state: GraphState, api, conversation_key: str, tag: str) -> GraphState:
     question = state["question"]
-    history = state.get("history", [])
+    conversation = state.get("conversation") or ConversationState()
+    previous_id = conversation.get(conversation_key)
+    result = None
+    if previous_id is None:
+        pooled_id = conversation_pool.take(conversation_key)
+        if pooled_id is not None:
+            print(f"[DEBUG] [{tag}] 미리 시작한 대화 사용")
+            try:
+                result = api.ask_followup(pooled_id, question)
+            except Exception as e:
+                print(f"[ERROR] [{tag}] 미리 시작한 대화 사용 실패 → 새로 시작:", str(e))
+        if result is None:
+            print(f"[DEBUG] [{tag}] 대화 새로 시작")
+            result = api.start_conversation(question)
+    else:
+        print(f"[DEBUG] [{tag}] 이전 대화 계속 사용")
+        result = api.ask_followup(previous_id, question)
 
-    context = "\n.".join(history[-3:]) 
+    _emit_stage("sql_generating")
+    conversation_id = result["conversation_id"]
+    conversation.record(conversation_key, conversation_id)
+    message_id = result["message_id"]
+    print(f"[DEBUG] [{tag}] conversation_id: {conversation_id}, message_id: {message_id}")
 
-    route = router.route(question, context=context)
-    normalized_route = route.strip().upper()
-    print(f"[DEBUG] 정규화된 경로: {normalized_route}")
-    return {**state, "route": normalized_route}
+    def fetch():
+        with tracer.span("genie.poll", kind="poll", space_id=api.space_id) as poll_span:
+            message = api.get_query_info(conversation_id, message_id)
+            poll_span.set(status=message.get("status"))
+            return message
 
-def response_node(state: GraphState) -> GraphState:
-    question = state.get("question")
-    history = state.get("history", []) + [question]
-    print("✅ [DEBUG] response_node 실행됨")
-    print("🧾 [DEBUG] 기존 history:", state.get("history"))
-    print("🆕 [DEBUG] 추가된 history:", history)
-    return {
-        "response_df": state.get("response_df"),
-        "response": state.get("response"),
-        "description": state.get("description"),
-        "history": history
-    }
+    try:
+        with tracer.span("genie.poll_wait", kind="poll_wait", space_id=api.space_id) as wait_span:
+            def on_poll(i, status):
+                wait_span.set(polls=i, status=status)
+                _emit_stage("running" if status in _GENIE_RUNNING_STATUSES else "sql_generating")
+
+            message = genie_poller.wait(
+                api.space_id,
+                fetch,
+                deadline=state.get("deadline"),
+                on_poll=on_poll
+            )
+    except (GeniePollTimeout, GeniePollFailed) as e:
+        print(f"[DEBUG] [{tag}] 폴링 종료:", str(e))
+        return {**state, "response": "❗쿼리 결과를 가져오는 데 실패했습니다."}
+    print(f"[DEBUG] [{tag}] 쿼리 성공!")
+
+    attachment = message.get("attachments", [])[0]
+    query_block = attachment.get("query")
+    text_block = attachment.get("text", {}).get("content")
+
+    if not query_block:
+        return {**state, "response": text_block or "답변은 생성됐지만 실행 가능한 쿼리는 없었습니다."}
+
+    attachment_id = attachment["attachment_id"]
+    description = query_block.get("description", None)
+
+    from langgraph.config import get_stream_writer
+    writer = get_stream_writer()
+    _emit_stage("fetching")
+
+    # chunk 단위로 받아 manifest 컬럼 타입에 맞춰 변환 (표시 형식은 화면에서 처리)
+    # 첫 chunk 이후 남은 chunk가 있으면 앞부분을 먼저 스트림으로 전달
+    with tracer.span("genie.result", kind="result", space_id=api.space_id) as result_span:
+        df, total_rows, truncated = decode_chunks(
+            api.iter_query_result_chunks(conversation_id, message_id, attachment_id),
+            max_rows=GENIE_RESULT_MAX_ROWS,
+            preview_rows=GENIE_RESULT_PREVIEW_ROWS,
+            on_preview=lambda preview, total: writer({"preview_df": preview, "total_rows": total})
+        )
+        result_span.set(rows=None if df is None else len(df), total_rows=total_rows, truncated=truncated)
+
+    if df is not None and not df.empty:
+        if truncated:
+            print(f"[DEBUG] [{tag}] 결과 {total_rows}행 중 {len(df)}행만 사용")
+            description = f"{description or ''}\n(전체 {total_rows or '?'}행 중 상위 {len(df):,}행만 표시합니다.)".strip()
+        return {**state, "response_df": df, "description": description}
+    else:
+        return {**state, "response": "데이터가 비어있습니다.", "description": description}
 
+@traced_node("genie_sales_node")
 def genie_sales_node(state: GraphState) -> GraphState:
     try:
-        question = state["question"]
-        if "genie_sales_conversation_id" not in st.session_state:
-            print("[DEBUG] [SALES] 대화 새로 시작")
-            result = genie_sales_api.start_conversation(question)
-            st.session_state["genie_sales_conversation_id"] = result["conversation_id"]
-        else:
-            print("[DEBUG] [SALES] 이전 대화 계속 사용")
-            result = genie_sales_api.ask_followup(st.session_state["genie_sales_conversation_id"], question)
-
-        conversation_id = result["conversation_id"]
-        message_id = result["message_id"]
-        print(f"[DEBUG] [SALES] conversation_id: {conversation_id}, message_id: {message_id}")
-
-        for i in range(30):
-            print(f"[DEBUG] [SALES] polling {i+1}/30 ...")
-            time.sleep(2)
-            message = genie_sales_api.get_query_info(conversation_id, message_id)
-            attachments = message.get("attachments", [])
-            status_val = message.get("status", "")
-            print("[DEBUG] [SALES] 현재 상태:", status_val)
-            if status_val in ("SUCCEEDED", "COMPLETED") and attachments:
-                print("[DEBUG] [SALES] 쿼리 성공!")
-                break
-        else:
-            return {**state, "response": "❗쿼리 결과를 가져오는 데 실패했습니다."}
-
-        attachment = attachments[0]
-        query_block = attachment.get("query")
-        text_block = attachment.get("text", {}).get("content")
-
-        if not query_block:
-            return {**state, "response": text_block or "답변은 생성됐지만 실행 가능한 쿼리는 없었습니다."}
-
-        attachment_id = attachment["attachment_id"]
-        description = query_block.get("description", None)
-
-        result_data = genie_sales_api.get_query_result(conversation_id, message_id, attachment_id)
-        data_array = result_data.get("statement_response", {}).get("result", {}).get("data_array", [])
-        columns_schema = result_data.get("statement_response", {}).get("manifest", {}).get("schema", {}).get("columns", [])
-        column_names = [col.get("name", f"col{i}") for i, col in enumerate(columns_schema)]
-
-        if data_array and column_names:
-            df = pd.DataFrame(data_array, columns=column_names)
-            return {**state, "response_df": df, "description": description}
-        else:
-            return {**state, "response": "데이터가 비어있습니다.", "description": description}
-
+        return _ask_genie(state, get_genie_sales_api(), "genie_sales", "SALES")
     except Exception as e:
         print("[ERROR] [SALES] 예외 발생:", str(e))
-        return {**state, "response": f"❗데이터 처리 중 오류가 발생했습니다.\\n({str(e)})"}
+        return {**state, "response": f"❗데이터 처리 중 오류가 발생했습니다.\n({str(e)})"}
 
+@traced_node("genie_license_node")
 def genie_license_node(state: GraphState) -> GraphState:
     try:
-        question = state["question"]
-        if "genie_license_conversation_id" not in st.session_state:
-            print("[DEBUG] [LICENSE] 대화 새로 시작")
-            result = genie_license_api.start_conversation(question)
-            st.session_state["genie_license_conversation_id"] = result["conversation_id"]
-        else:
-            print("[DEBUG] [LICENSE] 이전 대화 계속 사용")
-            result = genie_license_api.ask_followup(st.session_state["genie_license_conversation_id"], question)
-
-        conversation_id = result["conversation_id"]
-        message_id = result["message_id"]
-        print(f"[DEBUG] [LICENSE] conversation_id: {conversation_id}, message_id: {message_id}")
-
-        for i in range(30):
-            print(f"[DEBUG] [LICENSE] polling {i+1}/30 ...")
-            time.sleep(2)
-            message = genie_license_api.get_query_info(conversation_id, message_id)
-            attachments = message.get("attachments", [])
-            status_val = message.get("status", "")
-            print("[DEBUG] [LICENSE] 현재 상태:", status_val)
-            if status_val in ("SUCCEEDED", "COMPLETED") and attachments:
-                print("[DEBUG] [LICENSE] 쿼리 성공!")
-                break
-        else:
-            return {**state, "response": "❗쿼리 결과를 가져오는 데 실패했습니다."}
-
-        attachment = attachments[0]
-        query_block = attachment.get("query")
-        text_block = attachment.get("text", {}).get("content")
-
-        if not query_block:
-            return {**state, "response": text_block or "답변은 생성됐지만 실행 가능한 쿼리는 없었습니다."}
-
-        attachment_id = attachment["attachment_id"]
-        description = query_block.get("description", None)
-
-        result_data = genie_license_api.get_query_result(conversation_id, message_id, attachment_id)
-        data_array = result_data.get("statement_response", {}).get("result", {}).get("data_array", [])
-        columns_schema = result_data.get("statement_response", {}).get("manifest", {}).get("schema", {}).get("columns", [])
-        column_names = [col.get("name", f"col{i}") for i, col in enumerate(columns_schema)]
-
-        if data_array and column_names:
-            df = pd.DataFrame(data_array, columns=column_names)
-            return {**state, "response_df": df, "description": description}
-        else:
-            return {**state, "response": "데이터가 비어있습니다.", "description": description}
-
+        return _ask_genie(state, get_genie_license_api(), "genie_license", "LICENSE")
     except Exception as e:
         print("[ERROR] [LICENSE] 예외 발생:", str(e))
         return {**state, "response": f"❗LICENSE 처리 중 오류 발생: {str(e)}"}
 
+@traced_node("genie_100_node")
 def genie_100_node(state: GraphState) -> GraphState:
     try:
-        question = state["question"]
-        if "genie_100_conversation_id" not in st.session_state:
-            print("[DEBUG] [100] 대화 새로 시작")
-            result = genie_100_api.start_conversation(question)
-            st.session_state["genie_100_conversation_id"] = result["conversation_id"]
-        else:
-            print("[DEBUG] [100] 이전 대화 계속 사용")
-            result = genie_100_api.ask_followup(st.session_state["genie_100_conversation_id"], question)
-
-        conversation_id = result["conversation_id"]
-        message_id = result["message_id"]
-        print(f"[DEBUG] [100] conversation_id: {conversation_id}, message_id: {message_id}")
-
-        for i in range(30):
-            print(f"[DEBUG] [100] polling {i+1}/30 ...")
-            time.sleep(2)
-            message = genie_100_api.get_query_info(conversation_id, message_id)
-            attachments = message.get("attachments", [])
-            status_val = message.get("status", "")
-            print("[DEBUG] [100] 현재 상태:", status_val)
-            if status_val in ("SUCCEEDED", "COMPLETED") and attachments:
-                print("[DEBUG] [100] 쿼리 성공!")
-                break
-        else:
-            return {**state, "response": "❗쿼리 결과를 가져오는 데 실패했습니다."}
-
-        attachment = attachments[0]
-        query_block = attachment.get("query")
-        text_block = attachment.get("text", {}).get("content")
-
-        if not query_block:
-            return {**state, "response": text_block or "답변은 생성됐지만 실행 가능한 쿼리는 없었습니다."}
-
-        attachment_id = attachment["attachment_id"]
-        description = query_block.get("description", None)
-
-        result_data = genie_100_api.get_query_result(conversation_id, message_id, attachment_id)
-        data_array = result_data.get("statement_response", {}).get("result", {}).get("data_array", [])
-        columns_schema = result_data.get("statement_response", {}).get("manifest", {}).get("schema", {}).get("columns", [])
-        column_names = [col.get("name", f"col{i}") for i, col in enumerate(columns_schema)]
-
-        if data_array and column_names:
-            df = pd.DataFrame(data_array, columns=column_names)
-            return {**state, "response_df": df, "description": description}
-        else:
-            return {**state, "response": "데이터가 비어있습니다.", "description": description}
-
+        return _ask_genie(state, get_genie_100_api(), "genie_100", "100")
     except Exception as e:
         print("[ERROR] [100] 예외 발생:", str(e))
         return {**state, "response": f"❗데이터 처리 중 오류가 발생했습니다.\n({str(e)})"}
 
 # D 시스템 처리
+@traced_node("rag_node")
 def rag_node(state: GraphState) -> GraphState:
-    answer, meta = rag_api.ask(state["question"])
+    from langgraph.config import get_stream_writer
+    # stream_mode="custom"으로 실행 중이면 토큰이 바로 전달되고, invoke에서는 무시됨
+    writer = get_stream_writer()
+    _emit_stage("retrieving")
+    # 세션 토큰 예산을 넘었으면 MultiQuery 확장 없이 검색
+    conversation = state.get("conversation")
+    expand_query = not (conversation and token_accountant.over_budget(conversation.session_id))
+    if not expand_query:
+        print("[DEBUG][RAG] 세션 토큰 예산 초과 → 질문 확장 생략")
+        token_accountant.record_downgrade("multi_query")
+    answer, meta = get_rag_api().ask_stream(state["question"], on_token=lambda token: writer({"token": token}),
+                                            expand_query=expand_query)
     print("[DEBUG][RAG] answer:", answer)
     print("[DEBUG][RAG] meta:", meta)
-    return {**state, "response": answer}
+    return {**state, "response": answer, "sources": meta}
 
 # fallback 처리 노드 (분류 실패 시 예시 안내)
+@traced_node("fallback_node")
 def fallback_node(state: GraphState) -> GraphState:
+    from langgraph.config import get_stream_writer
+    response = fallback_example_node(state["question"])["response"]
+    get_stream_writer()({"token": response})
     return {
         **state,
-        "response": fallback_example_node(state["question"])["response"]
+        "response": response
     }
 
-# 최종 응답 노드
-def response_node(state: GraphState) -> GraphState:
-    question = state.get("question")
-    history = state.get("history", []) + [question]
+# 하위 질문별 처리 노드 (route 고정)
+_ROUTE_NODES = {
+    "A": genie_sales_node,
+    "B": genie_license_node,
+    "C": genie_100_node,
+    "D": rag_node,
+    "X": fallback_node,
+}
+
+def _run_branch(state: GraphState, sub, deadline: float) -> GraphState:
+    branch_state = {**state, "question": sub.question, "route": sub.route, "deadline": deadline, "sub_questions": None}
+    return _ROUTE_NODES[sub.route](branch_state)
+
+# 복합 질문 처리: 하위 질문을 스레드 풀에서 동시에 실행하고 결과를 모음
+# 전체 지연은 가장 느린 하위 질문 기준, 하위 질문마다 DECOMPOSE_BRANCH_TIMEOUT_SEC 제한
+@traced_node("fanout_node")
+def fanout_node(state: GraphState) -> GraphState:
+    sub_questions = state.get("sub_questions") or []
+    deadline = time.monotonic() + DECOMPOSE_BRANCH_TIMEOUT_SEC
+    if state.get("deadline"):
+        deadline = min(deadline, state["deadline"])
+
+    # 현재 context(추적 span, stream writer)를 복사해 하위 질문 스레드에서도 그대로 사용
+    futures = [
+        (sub, _branch_pool.submit(contextvars.copy_context().run, _run_branch, state, sub, deadline))
+        for sub in sub_questions
+    ]
+
+    sub_results = []
+    for sub, future in futures:
+        try:
+            output = future.result(timeout=max(0.0, deadline - time.monotonic()) + 1.0)
+        except FutureTimeoutError:
+            print(f"[DEBUG] [FANOUT] {sub.route} 하위 질문 시간 초과")
+            output = {"response": "❗시간 안에 답변을 받지 못했습니다."}
+        except Exception as e:
+            print(f"[ERROR] [FANOUT] {sub.route} 하위 질문 실패:", str(e))
+            output = {"response": f"❗처리 중 오류가 발생했습니다. ({str(e)})"}
+        sub_results.append({
+            "route": sub.route,
+            "label": ROUTE_LABELS.get(sub.route, sub.route),
+            "question": sub.question,
+            "response": output.get("response"),
+            "response_df": output.get("response_df"),
+            "description": output.get("description"),
+            "sources": output.get("sources"),
+        })
+
+    failed = all((r["response"] or "").startswith("❗") for r in sub_results)
+    lines = [f"{'❗' if failed else ''}질문을 {len(sub_results)}개로 나눠 답변했습니다."]
+    lines += [f"- **{r['label']}**: {r['question']}" for r in sub_results]
+    sources = ", ".join(r["sources"] for r in sub_results if r.get("sources"))
+    return {
+        **state,
+        "sub_results": sub_results,
+        "response": "\n".join(lines),
+        "response_df": None,
+        "description": None,
+        "sources": sources or None
+    }
 
+# 최종 응답 노드 (대화 기록은 호출 측 HistoryStore가 관리하므로 여기서 늘리지 않음)
+@traced_node("respond_node")
+def response_node(state: GraphState) -> GraphState:
     print("✅ [DEBUG] response_node 실행됨")
-    print("🧾 [DEBUG] 기존 history:", state.get("history"))
-    print("🆕 [DEBUG] 추가된 history:", history)
-
     return {
         "response_df": state.get("response_df"),
         "response": state.get("response"),
-        "description": state.get("description"),
-        "history": history  # 반드시 반환
+        "description": state.get("description")
     }
 # ─────────────────────────────────────────────────────────────
 # 4. LangGraph 구성
 
-builder = StateGraph(GraphState)
-builder.set_entry_point("question_node")
-
-builder.add_node("question_node", question_node)
-builder.add_node("classify_node", classify_node)
-builder.add_node("genie_sales_node", genie_sales_node)
-builder.add_node("genie_license_node", genie_license_node)
-builder.add_node("genie_100_node", genie_100_node)
-builder.add_node("rag_node", rag_node)
-builder.add_node("respond_node", response_node)
-builder.add_node("fallback_node", fallback_node)
-builder.add_edge("question_node", "classify_node")
-
-builder.add_conditional_edges(
-    "classify_node",
-    lambda state: state["route"].strip().upper(),
-    {
-        "A": "genie_sales_node",
-        "B": "genie_license_node",
-        "C": "genie_100_node",
-        "D": "rag_node",
-        "X": "fallback_node",
-    }
-)
-
-builder.add_edge("genie_sales_node", "respond_node")
-builder.add_edge("genie_license_node", "respond_node")
-builder.add_edge("genie_100_node", "respond_node")
-builder.add_edge("rag_node", "respond_node")
-builder.add_edge("fallback_node", "respond_node")
-builder.set_finish_point("respond_node")
-
-graph = builder.compile()
+def _build_graph():
+    StateGraph = startup_profiler.timed_import("langgraph.graph").StateGraph
+
+    builder = StateGraph(GraphState)
+    builder.set_entry_point("question_node")
+
+    builder.add_node("question_node", question_node)
+    builder.add_node("classify_node", classify_node)
+    builder.add_node("genie_sales_node", genie_sales_node)
+    builder.add_node("genie_license_node", genie_license_node)
+    builder.add_node("genie_100_node", genie_100_node)
+    builder.add_node("rag_node", rag_node)
+    builder.add_node("respond_node", response_node)
+    builder.add_node("fallback_node", fallback_node)
+    builder.add_node("fanout_node", fanout_node)
+    builder.add_edge("question_node", "classify_node")
+
+    builder.add_conditional_edges(
+        "classify_node",
+        lambda state: state["route"].strip().upper(),
+        {
+            "A": "genie_sales_node",
+            "B": "genie_license_node",
+            "C": "genie_100_node",
+            "D": "rag_node",
+            "X": "fallback_node",
+            "M": "fanout_node",
+        }
+    )
+
+    builder.add_edge("genie_sales_node", "respond_node")
+    builder.add_edge("genie_license_node", "respond_node")
+    builder.add_edge("genie_100_node", "respond_node")
+    builder.add_edge("rag_node", "respond_node")
+    builder.add_edge("fallback_node", "respond_node")
+    builder.add_edge("fanout_node", "respond_node")
+    builder.set_finish_point("respond_node")
+
+    return builder.compile()
+
+def get_graph():
+    return _singleton("graph", _build_graph)
+
+# 핸들러/그래프/RAG 인덱스를 미리 생성 (첫 질문 지연 제거용)
+def warm_up(include_rag: bool = True) -> list:
+    get_graph()
+    get_router()
+    get_genie_sales_api()
+    get_genie_license_api()
+    get_genie_100_api()
+    conversation_pool.prefill()
+    if include_rag:
+        get_rag_api()
+    print(startup_profiler.format_report())
+    return startup_profiler.report()
+
+_warm_up_started = False
+
+# 백그라운드 스레드에서 warm_up 실행 (프로세스당 한 번)
+def start_background_warm_up(include_rag: bool = True):
+    global _warm_up_started
+    with _registry_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def _run():
+        try:
+            warm_up(include_rag)
+        except Exception as e:
+            print("[ERROR] [WARMUP] 사전 로딩 실패:", str(e))
+
+    threading.Thread(target=_run, name="chatbot-warm-up", daemon=True).start()
+
+# 기동 시간 리포트 (import / 객체 생성별 소요 시간)
+def get_startup_report() -> list:
+    return startup_profiler.report()
 
 # ─────────────────────────────────────────────────────────────
 # 5. 실행 예시
 
 if __name__ == "__main__":
     user_input = input("질문을 입력하세요: ")
-    output = graph.invoke({"question": user_input})
+    output = get_graph().invoke({"question": user_input})
 
     if "response_df" in output:
         print("\n[📊 데이터프레임 결과]")
@@ -323,30 +485,185 @@ if __name__ == "__main__":
     else:
         print("\n❗답변이 없습니다.")
 
-def run_chatbot(question: str, history: list[str] = None) -> dict:
+# conversation: 사용자 세션별 ConversationState (Genie 대화 이어가기용, 없으면 매번 새 대화)
+def run_chatbot(question: str, history: list[str] = None, conversation: ConversationState = None) -> dict:
     if history is None:
         history = []
 
-    print("🧪[DEBUG] 전달된 히스토리:", history)
-
-    output = graph.invoke({
-        "question": question,
-        "history": history
-    })
+    print(f"🧪[DEBUG] 전달된 히스토리: {len(history)}개")
+
+    with tracer.span("chatbot.turn", kind="turn", session_id=conversation and conversation.session_id) as span:
+        cached = routed = None
+        if _cacheable(history, conversation):
+            cached = _lookup_cache_exact(question)
+            if cached is None:
+                routed = _classify(question, history)
+                cached = _lookup_cache(question, routed)
+        if cached is not None:
+            span.set(route=cached.get("route"), cached=True)
+            return {**cached, "history": history, "cached": True}
+
+        output = get_graph().invoke({
+            **(routed or {}),
+            "question": question,
+            "history": history,
+            "deadline": time.monotonic() + CHATBOT_DEADLINE_SEC,
+            "conversation": conversation
+        })
+
+        print("🧪[DEBUG] LangGraph 응답 결과:", _describe_output(output))
+
+        result = _to_result(output, history)
+        span.set(route=result.get("route"), cached=False)
+        _store_in_cache(question, routed, result)
+        return result
+
+# run_chatbot의 스트리밍 버전: ("token", str) / ("preview", DataFrame) / ("stage", str) 이벤트를 생성하다가 마지막에 ("final", dict) 반환
+def stream_chatbot(question: str, history: list[str] = None, conversation: ConversationState = None):
+    if history is None:
+        history = []
 
-    print("🧪[DEBUG] LangGraph 응답 결과:", output)
+    with tracer.span("chatbot.turn", kind="turn", streaming=True,
+                     session_id=conversation and conversation.session_id) as span:
+        cached = routed = None
+        if _cacheable(history, conversation):
+            cached = _lookup_cache_exact(question)
+            if cached is None:
+                yield "stage", "routing"
+                routed = _classify(question, history)
+                cached = _lookup_cache(question, routed)
+        if cached is not None:
+            span.set(route=cached.get("route"), cached=True)
+            if cached.get("response"):
+                yield "token", cached["response"]
+            yield "final", {**cached, "history": history, "cached": True}
+            return
+
+        output = {}
+        first_token_at = None
+        for mode, chunk in get_graph().stream({
+            **(routed or {}),
+            "question": question,
+            "history": history,
+            "deadline": time.monotonic() + CHATBOT_DEADLINE_SEC,
+            "conversation": conversation
+        }, stream_mode=["custom", "values"]):
+            if mode == "custom" and chunk.get("token"):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    span.set(ttft_ms=round((first_token_at - span.started) * 1000, 1))
+                yield "token", chunk["token"]
+            elif mode == "custom" and chunk.get("preview_df") is not None:
+                yield "preview", chunk["preview_df"]
+            elif mode == "custom" and chunk.get("stage"):
+                yield "stage", chunk["stage"]
+            elif mode == "values":
+                output = chunk
+
+        result = _to_result(output, history)
+        span.set(route=result.get("route"), cached=False)
+        _store_in_cache(question, routed, result)
+        yield "final", result
+
+# 디버그 출력용 요약 (DataFrame/히스토리 전체를 출력하지 않음)
+def _describe_output(output: dict) -> dict:
+    df = output.get("response_df")
+    return {
+        "route": output.get("route"),
+        "response": (output.get("response") or "")[:100],
+        "response_df": None if df is None else df.shape,
+        "description": output.get("description"),
+    }
 
+def _to_result(output: dict, history: list[str]) -> dict:
     return {
         "response": output.get("response"),
         "response_df": output.get("response_df"),
         "description": output.get("description"),
+        "sources": output.get("sources"),
         "route": output.get("route"),
-        "history": output.get("history", history)
+        "sub_results": output.get("sub_results"),
+        "history": history
     }
 
 
-# In[ ]:
+# 답변 캐시를 쓸 수 있는 턴인지
+# 대화 기록이나 이어가는 Genie 대화가 있으면 같은 문장이라도 이전 맥락에 따라 답이 달라지므로 캐시를 쓰지 않음
+# 조회 순서: 같은 질문(분류·임베딩 없음) → 미적중이면 분류 후 route·슬롯이 같은 유사 질문
+#           (분류 결과는 graph에 그대로 넘겨 classify_node에서 다시 분류하지 않음)
+def _cacheable(history: list, conversation: ConversationState = None) -> bool:
+    return not history and not (conversation is not None and conversation.has_active())
+
+def _lookup_cache_exact(question: str):
+    try:
+        return answer_cache.get_exact(question)
+    except Exception as e:
+        print("[ERROR] [CACHE] 조회 실패:", str(e))
+        return None
+
+# 캐시 조회 실패(임베딩 API 오류 등)는 미적중으로 처리
+def _lookup_cache(question: str, routed: dict):
+    try:
+        return answer_cache.get(question, routed["route"], routed.get("slots"))
+    except Exception as e:
+        print("[ERROR] [CACHE] 조회 실패:", str(e))
+        return None
+
+# 오류 응답은 캐시하지 않음
+def _store_in_cache(question: str, routed: dict, result: dict):
+    if routed is None or result.get("route") != routed["route"]:
+        return
+    response = result.get("response") or ""
+    if response.startswith("❗"):
+        return
+    if not response and result.get("response_df") is None:
+        return
+    try:
+        answer_cache.put(question, routed["route"], routed.get("slots"),
+                         {k: v for k, v in result.items() if k != "history"})
+    except Exception as e:
+        print("[ERROR] [CACHE] 저장 실패:", str(e))
+
+# 라우터 통계 조회 (규칙 분류 비율, 규칙/LLM 불일치 횟수)
+def get_router_stats() -> dict:
+    router = _instances.get("router")
+    return router.get_stats() if router else {}
+
+# 답변 캐시 통계 조회 (적중/미적중, 제거 횟수 등)
+def get_answer_cache_stats() -> dict:
+    return answer_cache.stats()
 
+# route/노드별 지연 시간 p50·p95·p99 (kind: "turn", "node", "http", "llm", "poll" ...)
+def get_latency_summary(kind: str = None) -> list:
+    return tracer.aggregator.summary(kind)
 
+# Prometheus 텍스트 포맷 메트릭
+def get_metrics_text() -> str:
+    return tracer.prometheus_text()
 
+# Genie 폴링 통계 조회 (space별 답변당 폴링 횟수, 완료 후 낭비 시간 등)
+def get_genie_poll_stats() -> dict:
+    return genie_poller.get_stats()
+
+# LLM 토큰 사용량/비용 (단계·노드·route별) 및 세션 예산 초과로 생략한 단계 수
+def get_token_usage_stats() -> dict:
+    return token_accountant.stats()
+
+# space별 미리 시작한 대화 풀 통계 (준비된 대화 수, 적중률, 보충 시간)
+def get_conversation_pool_stats() -> dict:
+    return conversation_pool.stats()
+
+# 회로 차단기 상태 / 재시도·헤지 횟수 / 남은 재시도 예산
+def get_resilience_stats() -> dict:
+    return resilience.stats()
+
+# 디스크 임베딩 캐시 통계 (모델별 적중률, 저장 개수, 제거 수)
+def get_embedding_cache_stats() -> dict:
+    # embedding_cache는 langchain_core를 import하므로 필요할 때 불러옴 (RAG/답변 캐시가 먼저 사용)
+    from handlers.embedding_cache import embedding_cache_stats
+    return embedding_cache_stats()
+
+
+# In[ ]:
 
+startup_profiler.record("server.graph_runner", time.perf_counter() - _module_started, kind="import")
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# route별 캐시 유지 시간(초)
+# A: 상권 매출, B: 개업/폐업·실시간 인구, C: 개업률/위험도, D: 지원정책 RAG, X: 안내
+ROUTE_TTL_SEC = {
+    "A": 6 * 3600,
+    "B": 5 * 60,
+    "C": 6 * 3600,
+    "D": 24 * 3600,
+    "X": 7 * 24 * 3600,
+}
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+_PUNCT_RE = re.compile(r"[\s\?\!\.\,~…]+")
+
+
+def normalize_question(question: str) -> str:
+    return _PUNCT_RE.sub(" ", question.lower()).strip()
+
+
+# 슬롯 dict → 비교용 문자열 (순서와 관계없이 같은 슬롯이면 같은 값)
+def slots_key(slots) -> str:
+    return json.dumps(slots or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+# 질문 → 답변 캐시
+# - 정규화한 질문 + 분류된 route + 추출한 슬롯(지역/업종/연도/분기 등)을 키로 사용
+# - get_exact: 정규화한 질문이 같은 항목을 분류·임베딩 없이 바로 찾음 (graph 실행 전 가장 먼저 조회)
+# - get: 정확히 일치하지 않으면 route와 슬롯이 모두 같은 항목 중 임베딩 코사인 유사도가 threshold 이상인 것을 사용
+#   ("강남구 한식 매출"과 "마포구 한식 매출"처럼 유사도는 높아도 슬롯이 다르면 다른 질문)
+# - route별 TTL, 최대 개수 초과 시 가장 오래 사용되지 않은 항목부터 제거(LRU)
+class SemanticAnswerCache:
+    def __init__(self, embed_fn=None, threshold=ANSWER_CACHE_THRESHOLD, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 route_ttl=None, min_question_len=8, clock=time.time):
+        self._embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.route_ttl = {**ROUTE_TTL_SEC, **(route_ttl or {})}
+        self.min_question_len = min_question_len
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (normalized, route, slots_key) -> entry
+        self._exact = {}   # normalized -> 가장 최근에 저장한 key
+        self._pending_vectors = OrderedDict()   # 조회 시 계산한 임베딩을 저장 시 재사용
+        self._counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _embed(self, text):
+        if self._embed_fn is None:
+            from langchain_openai import OpenAIEmbeddings
+            from handlers.cassette import cassette
+            from handlers.embedding_cache import cached_embeddings
+            self._embed_fn = cached_embeddings(cassette.embeddings(
+                factory=lambda: OpenAIEmbeddings(model="text-embedding-ada-002"), name="answer_cache"),
+                "text-embedding-ada-002").embed_query
+        vector = np.asarray(self._embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge_expired_locked(self):
+        now = self._clock()
+        expired = [key for key, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            self._remove_locked(key)
+        self._counters["expirations"] += len(expired)
+
+    def _remove_locked(self, key):
+        del self._entries[key]
+        if self._exact.get(key[0]) == key:
+            del self._exact[key[0]]
+
+    # 정규화한 질문이 같은 캐시 결과 또는 None (route 분류·임베딩 없이 조회, 미적중은 get에서 집계)
+    def get_exact(self, question: str):
+        normalized = normalize_question(question)
+        if len(normalized) < self.min_question_len:
+            return None
+        with self._lock:
+            key = self._exact.get(normalized)
+            entry = self._entries.get(key) if key else None
+            if entry is None or entry["expires_at"] <= self._clock():
+                return None
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return entry["result"]
+
+    # route·슬롯이 같은 항목 중 유사한 질문의 캐시 결과(dict) 또는 None 반환
+    def get(self, question: str, route: str, slots: dict = None):
+        normalized = normalize_question(question)
+        if len(normalized) < self.min_question_len or route not in self.route_ttl:
+            return None
+        slot_key = slots_key(slots)
+
+        with self._lock:
+            self._purge_expired_locked()
+            key = (normalized, route, slot_key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["exact_hits"] += 1
+                return self._entries[key]["result"]
+            keys = [k for k in self._entries if k[1] == route and k[2] == slot_key]
+            if not keys:
+                self._counters["misses"] += 1
+                return None
+            matrix = np.stack([self._entries[key]["vector"] for key in keys])
+
+        # 임베딩 호출은 잠금 밖에서 수행
+        vector = self._embed(normalized)
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+
+        with self._lock:
+            self._pending_vectors[normalized] = vector
+            while len(self._pending_vectors) > 64:
+                self._pending_vectors.popitem(last=False)
+
+            key = keys[best]
+            if scores[best] >= self.threshold and key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["semantic_hits"] += 1
+                print(f"[DEBUG] [CACHE] 유사 질문 적중 ({scores[best]:.3f}): {key[0]}")
+                return self._entries[key]["result"]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, question: str, route: str, slots: dict, result: dict):
+        normalized = normalize_question(question)
+        if len(normalized) < self.min_question_len or route not in self.route_ttl:
+            return
+
+        with self._lock:
+            vector = self._pending_vectors.pop(normalized, None)
+        if vector is None:
+            vector = self._embed(normalized)
+
+        key = (normalized, route, slots_key(slots))
+        with self._lock:
+            self._entries[key] = {
+                "vector": vector,
+                "result": result,
+                "expires_at": self._clock() + self.route_ttl[route],
+            }
+            self._entries.move_to_end(key)
+            self._exact[normalized] = key
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._pending_vectors.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            total = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "hit_rate": hits / total if total else 0.0,
+            }
@@ -0,0 +1,217 @@
+import io
+import os
+import gzip
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import defaultdict, deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 외부 호출 기록/재생 모드: off(기본) / record / replay
+CHATBOT_CASSETTE_MODE = os.getenv("CHATBOT_CASSETTE_MODE", "off").lower()
+# 기록 파일 (JSONL, 확장자가 .gz면 gzip 압축)
+CHATBOT_CASSETTE_PATH = os.getenv("CHATBOT_CASSETTE_PATH", "cassettes/chatbot.jsonl.gz")
+# 재생 시 원래 소요 시간에 곱할 배율 (1이면 원래 속도, 0.1이면 10배 빠르게, 0이면 대기 없음)
+CHATBOT_CASSETTE_SPEED = float(os.getenv("CHATBOT_CASSETTE_SPEED", "1.0"))
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _langchain_wrappers():
+    try:
+        from handlers.cassette_langchain import CassetteChatModel, CassetteEmbeddings
+    except ImportError:
+        from cassette_langchain import CassetteChatModel, CassetteEmbeddings
+    return CassetteChatModel, CassetteEmbeddings
+
+
+# Genie HTTP / LLM / 임베딩 / S3 호출을 파일에 기록하고 같은 요청에 기록된 응답을 돌려줌
+# - 요청은 kind + 요청 내용(JSON) 해시로 식별, 같은 요청이 여러 번이면(폴링 등) 기록 순서대로 재생
+#   기록이 모자라면 마지막 응답을 반복함
+# - 재생 시 Genie space_id 등 요청에 들어가는 값은 기록할 때와 같아야 함 (토큰/API 키는 아무 값이나 가능)
+class Cassette:
+    def __init__(self, mode=CHATBOT_CASSETTE_MODE, path=CHATBOT_CASSETTE_PATH, speed=CHATBOT_CASSETTE_SPEED,
+                 sleep=time.sleep):
+        self.mode = mode
+        self.path = path
+        self.speed = speed
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries = defaultdict(deque)
+        self._last = {}
+        self._stats = defaultdict(lambda: {"recorded": 0, "replayed": 0, "misses": 0})
+        if mode == "replay":
+            self._load()
+        elif mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = _open(path, "a")
+            print(f"[DEBUG] [CASSETTE] 기록 시작: {path}")
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _load(self):
+        count = 0
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[(entry["kind"], entry["key"])].append(entry)
+                    count += 1
+        print(f"[DEBUG] [CASSETTE] 재생 모드: {self.path} ({count}건)")
+
+    @staticmethod
+    def request_key(request):
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+    def _write(self, kind, key, elapsed, response, label=None):
+        entry = {"kind": kind, "key": key, "elapsed": round(elapsed, 4), "response": response}
+        if label:
+            entry["label"] = label
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._stats[kind]["recorded"] += 1
+
+    def _next(self, kind, key):
+        with self._lock:
+            queue = self._entries.get((kind, key))
+            if queue:
+                entry = queue.popleft()
+                self._last[(kind, key)] = entry
+            else:
+                entry = self._last.get((kind, key))
+            if entry is None:
+                self._stats[kind]["misses"] += 1
+                raise CassetteMiss(f"기록에 없는 {kind} 요청 (key={key})")
+            self._stats[kind]["replayed"] += 1
+            return entry
+
+    def _wait(self, seconds):
+        if self.speed and seconds > 0:
+            self._sleep(seconds * self.speed)
+
+    # fn()의 결과(JSON 직렬화 가능)를 기록하거나, 재생 모드면 fn을 호출하지 않고 기록된 결과 반환
+    def call(self, kind, request, fn, label=None):
+        if self.mode not in ("record", "replay"):
+            return fn()
+        key = self.request_key(request)
+        if self.replaying:
+            entry = self._next(kind, key)
+            self._wait(entry["elapsed"])
+            return entry["response"]
+        started = time.perf_counter()
+        response = fn()
+        self._write(kind, key, time.perf_counter() - started, response, label)
+        return response
+
+    # 스트리밍 호출: fn()이 내보내는 항목을 (시작 후 경과 시간, 항목)으로 기록/재생
+    def stream(self, kind, request, fn, label=None):
+        if self.mode not in ("record", "replay"):
+            yield from fn()
+            return
+        key = self.request_key(request)
+        if self.replaying:
+            entry = self._next(kind, key)
+            previous = 0.0
+            for offset, item in entry["response"]:
+                self._wait(offset - previous)
+                previous = offset
+                yield item
+            return
+        started = time.perf_counter()
+        items = []
+        for item in fn():
+            items.append([round(time.perf_counter() - started, 4), item])
+            yield item
+        self._write(kind, key, time.perf_counter() - started, items, label)
+
+    # LangChain chat model 감싸기 (replay면 factory를 호출하지 않으므로 API 키 없이 동작)
+    # LangChain 래퍼는 기록/재생할 때만 import (Genie·S3 경로는 LangChain 없이 사용)
+    def chat_model(self, model=None, factory=None, name="llm"):
+        if self.mode not in ("record", "replay"):
+            return model or factory()
+        CassetteChatModel, _ = _langchain_wrappers()
+        if self.replaying:
+            return CassetteChatModel(cassette=self, name=name)
+        return CassetteChatModel(cassette=self, name=name, inner=model or factory())
+
+    def embeddings(self, embedding=None, factory=None, name="embedding"):
+        if self.mode not in ("record", "replay"):
+            return embedding or factory()
+        _, CassetteEmbeddings = _langchain_wrappers()
+        if self.replaying:
+            return CassetteEmbeddings(self, name)
+        return CassetteEmbeddings(self, name, embedding or factory())
+
+    def s3_client(self):
+        if self.replaying:
+            return CassetteS3(self)
+        import boto3
+        client = boto3.client("s3")
+        return CassetteS3(self, client) if self.recording else client
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **{k: dict(v) for k, v in self._stats.items()}}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# --- S3 (LocalRAGHandler가 쓰는 get_object / list_objects_v2 페이지네이터만) ---------------------------
+
+class _CassettePaginator:
+    def __init__(self, s3, operation):
+        self.s3 = s3
+        self.operation = operation
+
+    def paginate(self, **params):
+        def pages():
+            for page in self.s3.client.get_paginator(self.operation).paginate(**params):
+                yield {"Contents": [{"Key": obj["Key"], "Size": obj.get("Size"), "ETag": obj.get("ETag")} for obj in page.get("Contents", [])]}
+
+        return self.s3.cassette.stream("s3", {"op": self.operation, **params}, pages, label=self.operation)
+
+
+class CassetteS3:
+    def __init__(self, cassette, client=None):
+        self.cassette = cassette
+        self.client = client
+
+    def get_object(self, Bucket, Key):
+        def fetch():
+            return base64.b64encode(self.client.get_object(Bucket=Bucket, Key=Key)["Body"].read()).decode("ascii")
+
+        body = self.cassette.call("s3", {"op": "get_object", "Bucket": Bucket, "Key": Key}, fetch, label=Key)
+        return {"Body": io.BytesIO(base64.b64decode(body))}
+
+    def get_paginator(self, operation):
+        return _CassettePaginator(self, operation)
+
+
+# 프로세스 공용 (CHATBOT_CASSETTE_MODE가 off면 모든 호출을 그대로 통과시킴)
+cassette = Cassette()
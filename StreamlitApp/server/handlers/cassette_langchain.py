@@ -0,0 +1,65 @@
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# cassette의 LangChain 래퍼 (Cassette.chat_model / embeddings가 기록·재생 모드일 때만 import)
+
+
+# --- LLM ---------------------------------------------------------------------------------------------
+
+
+def _messages_request(name, messages, stop, kwargs):
+    return {"name": name, "messages": [[m.type, m.content] for m in messages], "stop": stop,
+            "kwargs": {k: v for k, v in kwargs.items() if isinstance(v, (str, int, float, bool))}}
+
+
+class CassetteChatModel(BaseChatModel):
+    cassette: Any
+    name: str = "llm"
+    inner: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        def invoke():
+            message = self.inner.invoke(messages, stop=stop, **kwargs)
+            return {"content": message.content, "usage": message.usage_metadata}
+
+        response = self.cassette.call("llm", _messages_request(self.name, messages, stop, kwargs), invoke,
+                                      label=self.name)
+        message = AIMessage(content=response["content"], usage_metadata=response.get("usage"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        def stream():
+            for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+                yield {"content": chunk.content, "usage": chunk.usage_metadata}
+
+        request = _messages_request(self.name, messages, stop, {**kwargs, "stream": True})
+        for item in self.cassette.stream("llm", request, stream, label=self.name):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=item["content"],
+                                                               usage_metadata=item.get("usage")))
+            if run_manager and item["content"]:
+                run_manager.on_llm_new_token(item["content"], chunk=chunk)
+            yield chunk
+
+
+# --- 임베딩 --------------------------------------------------------------------------------------------
+
+class CassetteEmbeddings(Embeddings):
+    def __init__(self, cassette, name, inner=None):
+        self.cassette = cassette
+        self.name = name
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        return self.cassette.call("embedding", {"name": self.name, "documents": texts},
+                                  lambda: self.inner.embed_documents(texts), label=f"{self.name}:{len(texts)}")
+
+    def embed_query(self, text):
+        return self.cassette.call("embedding", {"name": self.name, "query": text},
+                                  lambda: self.inner.embed_query(text), label=self.name)
@@ -0,0 +1,82 @@
+import json
+import requests
+
+try:
+    from handlers.result_codec import decode_df, decode_result
+    from handlers.job_runner import JobQueueFull
+except ImportError:
+    from result_codec import decode_df, decode_result
+    from job_runner import JobQueueFull
+
+# (connect, read) 타임아웃(초), 스트리밍은 토큰 사이 간격 기준
+CHAT_SERVICE_HTTP_TIMEOUT = (5, 180)
+
+
+class ChatServiceError(Exception):
+    pass
+
+
+# 채팅 API 서버(server/chat_service.py) 클라이언트
+# stream_chatbot과 같은 (kind, payload) 이벤트를 반환하므로 ChatbotRun이 로컬 실행과 같은 방식으로 사용
+class ChatServiceClient:
+    def __init__(self, base_url, session_id=None, timeout=CHAT_SERVICE_HTTP_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _check(self, response):
+        if response.status_code == 503:
+            raise JobQueueFull(response.json().get("error") or "채팅 서버가 바쁩니다.")
+        if response.status_code != 200:
+            raise ChatServiceError(f"Request failed: {response.status_code}, {response.text[:300]}")
+
+    def ask(self, question):
+        response = self.session.post(f"{self.base_url}/chat", timeout=self.timeout,
+                                     json={"question": question, "session_id": self.session_id})
+        self._check(response)
+        body = response.json()
+        self.session_id = body.get("session_id") or self.session_id
+        return decode_result(body["result"])
+
+    # SSE를 읽어 ("stage", str) / ("token", str) / ("preview", DataFrame) / ("final", dict) 반환
+    def stream(self, question):
+        with self.session.post(f"{self.base_url}/chat/stream", stream=True, timeout=self.timeout,
+                               json={"question": question, "session_id": self.session_id}) as response:
+            self._check(response)
+            response.encoding = "utf-8"
+            for event, data in self._sse_events(response):
+                if event == "session":
+                    self.session_id = data["session_id"]
+                elif event == "stage":
+                    yield "stage", data["stage"]
+                elif event == "token":
+                    yield "token", data["text"]
+                elif event == "preview":
+                    yield "preview", decode_df(data)
+                elif event == "final":
+                    yield "final", decode_result(data)
+                    return
+                elif event == "error":
+                    raise ChatServiceError(data.get("error"))
+        raise ChatServiceError("채팅 서버 응답이 중간에 끊겼습니다.")
+
+    @staticmethod
+    def _sse_events(response):
+        event, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if not line:
+                if event and data:
+                    yield event, json.loads("\n".join(data))
+                event, data = None, []
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+
+    def reset(self):
+        if self.session_id:
+            response = self.session.post(f"{self.base_url}/sessions/{self.session_id}/reset", timeout=self.timeout)
+            self._check(response)
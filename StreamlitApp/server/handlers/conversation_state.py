@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 마지막 사용 후 이 시간(초)이 지나면 Genie 대화를 새로 시작
+GENIE_CONVERSATION_TTL_SEC = float(os.getenv("GENIE_CONVERSATION_TTL_SEC", "1800"))
+# 후속 질문이 이 횟수를 넘으면 Genie 대화를 새로 시작 (대화가 길수록 Genie 응답이 느려짐)
+GENIE_MAX_FOLLOWUPS = int(os.getenv("GENIE_MAX_FOLLOWUPS", "5"))
+# 사용되지 않은 세션 상태를 관리자에서 제거하는 시간(초)
+CHATBOT_SESSION_TTL_SEC = float(os.getenv("CHATBOT_SESSION_TTL_SEC", "3600"))
+
+
+# 사용자 세션 하나의 Genie 대화 상태 (space별 conversation_id, 후속 질문 수)
+# graph 실행 시 GraphState["conversation"]으로 전달되며 여러 스레드에서 동시에 접근해도 안전함
+class ConversationState:
+    def __init__(self, session_id=None, ttl_sec=GENIE_CONVERSATION_TTL_SEC,
+                 max_followups=GENIE_MAX_FOLLOWUPS, clock=time.monotonic):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.ttl_sec = ttl_sec
+        self.max_followups = max_followups
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conversations = {}
+        self._stats = {"started": 0, "followups": 0, "expired": 0, "rotated": 0}
+        self.last_used = clock()
+
+    # 이어서 사용할 conversation_id 반환, 없거나 만료/너무 길어졌으면 None (새 대화 시작 필요)
+    def get(self, key):
+        with self._lock:
+            now = self._clock()
+            self.last_used = now
+            entry = self._conversations.get(key)
+            if entry is None:
+                return None
+            if now - entry["last_used"] > self.ttl_sec:
+                print(f"[DEBUG] [CONVERSATION] {key} 대화 만료 → 새로 시작")
+                self._stats["expired"] += 1
+                del self._conversations[key]
+                return None
+            if entry["followups"] >= self.max_followups:
+                print(f"[DEBUG] [CONVERSATION] {key} 후속 질문 {entry['followups']}회 → 새 대화로 교체")
+                self._stats["rotated"] += 1
+                del self._conversations[key]
+                return None
+            return entry["conversation_id"]
+
+    # 새 대화 시작 / 후속 질문 후 호출
+    def record(self, key, conversation_id):
+        with self._lock:
+            now = self._clock()
+            self.last_used = now
+            entry = self._conversations.get(key)
+            if entry is not None and entry["conversation_id"] == conversation_id:
+                entry["followups"] += 1
+                entry["last_used"] = now
+                self._stats["followups"] += 1
+            else:
+                self._conversations[key] = {"conversation_id": conversation_id, "followups": 0, "last_used": now}
+                self._stats["started"] += 1
+
+    # 만료되지 않은 Genie 대화가 하나라도 있으면 True (후속 질문이 이전 대화 맥락에 따라 답이 달라짐)
+    def has_active(self):
+        with self._lock:
+            now = self._clock()
+            return any(now - entry["last_used"] <= self.ttl_sec for entry in self._conversations.values())
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._conversations.clear()
+            else:
+                self._conversations.pop(key, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "conversations": {k: dict(v) for k, v in self._conversations.items()},
+                **self._stats,
+            }
+
+
+# session_id별 ConversationState 보관 (API 서버/워커처럼 Streamlit 세션 밖에서 graph를 돌릴 때 사용)
+class ConversationManager:
+    def __init__(self, session_ttl_sec=CHATBOT_SESSION_TTL_SEC, clock=time.monotonic, **state_kwargs):
+        self.session_ttl_sec = session_ttl_sec
+        self._clock = clock
+        self._state_kwargs = state_kwargs
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def get(self, session_id=None):
+        with self._lock:
+            self._sweep_locked()
+            if session_id and session_id in self._sessions:
+                return self._sessions[session_id]
+            state = ConversationState(session_id=session_id, clock=self._clock, **self._state_kwargs)
+            self._sessions[state.session_id] = state
+            return state
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _sweep_locked(self):
+        now = self._clock()
+        expired = [sid for sid, state in self._sessions.items() if now - state.last_used > self.session_ttl_sec]
+        for sid in expired:
+            del self._sessions[sid]
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
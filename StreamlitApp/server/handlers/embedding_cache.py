@@ -0,0 +1,311 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from handlers.tracing import tracer
+    from handlers.cassette import cassette
+except ImportError:
+    from tracing import tracer
+    from cassette import cassette
+
+load_dotenv()
+
+# 임베딩 캐시 폴더 (비어 있으면 사용 안 함) / 모델별 최대 보관 개수 (넘으면 오래 안 쓴 것부터 제거)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+# 벡터 파일을 늘릴 때 한 번에 추가하는 행 수
+_GROW_ROWS = 1024
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# 모델 하나의 임베딩 저장소: SQLite(텍스트 해시 → 행 번호, 마지막 사용 시각) + float32 memmap 벡터 파일
+# 프로세스를 다시 띄워도 유지되며, max_entries를 넘으면 가장 오래 사용하지 않은 항목의 행을 재사용
+# 같은 폴더를 여러 프로세스가 함께 써도 되도록
+# - 행 번호 배정(빈 행 free_slots, 사용한 행 수 meta.rows)은 SQLite 쓰기 트랜잭션(BEGIN IMMEDIATE) 안에서 처리
+# - 벡터 파일 쓰기·늘리기는 파일 잠금(flock) 배타, 읽기는 공유 잠금으로 보호
+#   (fcntl이 없는 OS에서는 프로세스별 하위 폴더를 사용)
+class EmbeddingStore:
+    def __init__(self, root, model, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9._-]", "_", model))
+        if fcntl is None:
+            self.dir = os.path.join(self.dir, f"pid-{os.getpid()}")
+        os.makedirs(self.dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._lock = threading.Lock()
+        self._file_lock = open(os.path.join(self.dir, "vectors.lock"), "a+")
+        # 트랜잭션은 직접 시작 (isolation_level=None), 다른 프로세스가 쓰는 중이면 timeout까지 대기
+        self._db = sqlite3.connect(os.path.join(self.dir, "index.sqlite"), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings "
+                             "(key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+            if self._meta("rows") is None:
+                # 빈 행 목록을 메모리에만 두던 예전 저장소: 사용 중이 아닌 행을 free_slots로 옮김
+                used = {slot for (slot,) in self._db.execute("SELECT slot FROM embeddings")}
+                rows = max(used) + 1 if used else 0
+                self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)",
+                                     [(slot,) for slot in range(rows) if slot not in used])
+                self._set_meta("rows", rows)
+        self.dim = self._meta("dim")
+        self._matrix = None
+        self._capacity = 0
+        if self.dim:
+            self._open_matrix()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    @contextmanager
+    def _vectors_locked(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._file_lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file_lock, fcntl.LOCK_UN)
+
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _open_matrix(self):
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        self._capacity = size // (4 * self.dim)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(self._capacity, self.dim)) if self._capacity else None
+
+    # 다른 프로세스가 파일을 늘렸으면 다시 열어서 slot까지 접근 가능하게 함
+    def _ensure_slot_locked(self, slot):
+        if slot >= self._capacity:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._open_matrix()
+        return slot < self._capacity
+
+    # 행 rows개가 들어가도록 파일을 _GROW_ROWS 단위로 늘림 (배타 잠금 안에서만 호출)
+    def _grow_locked(self, rows):
+        if self._ensure_slot_locked(rows - 1):
+            return
+        self._matrix = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate((rows + _GROW_ROWS - 1) // _GROW_ROWS * _GROW_ROWS * 4 * self.dim)
+        self._open_matrix()
+
+    # keys 중 저장된 key 집합 (사용 시각은 바꾸지 않음)
+    def contains_many(self, keys):
+        if not keys:
+            return set()
+        with self._lock:
+            found = set()
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                found.update(key for (key,) in self._db.execute(
+                    f"SELECT key FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part))
+            return found
+
+    # keys 중 저장된 것만 {key: vector} 로 반환
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        with self._lock:
+            if self.dim is None:
+                self.dim = self._meta("dim")
+                if self.dim is None:
+                    return {}
+            found = {}
+            unique = list(dict.fromkeys(keys))
+            # 읽는 동안 다른 프로세스가 같은 행을 재사용하지 못하도록 공유 잠금
+            with self._vectors_locked(exclusive=False):
+                for i in range(0, len(unique), 500):
+                    part = unique[i:i + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, slot FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part).fetchall()
+                    for key, slot in rows:
+                        if self._ensure_slot_locked(slot):
+                            found[key] = np.array(self._matrix[slot])
+            if found:
+                now = time.time()
+                with self._transaction():
+                    self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                         [(now, key) for key in found])
+            return found
+
+    def put_many(self, items):
+        if not items:
+            return
+        with self._lock, self._vectors_locked(exclusive=True), self._transaction():
+            dim = self._meta("dim")
+            if dim is None:
+                dim = len(items[0][1])
+                self._set_meta("dim", dim)
+            self.dim = dim
+            now = time.time()
+            count = self._entries()
+            rows = self._meta("rows")
+            written = []
+            for key, vector in items:
+                existing = self._db.execute("SELECT slot FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if existing:
+                    slot = existing[0]
+                else:
+                    if count >= self.max_entries:
+                        count -= self._evict_locked(max(1, self.max_entries // 20))
+                    free = self._db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+                    if free:
+                        slot = free[0]
+                        self._db.execute("DELETE FROM free_slots WHERE slot = ?", (slot,))
+                    else:
+                        slot, rows = rows, rows + 1
+                    count += 1
+                self._db.execute("INSERT OR REPLACE INTO embeddings (key, slot, last_used) VALUES (?, ?, ?)",
+                                 (key, slot, now))
+                written.append((slot, vector))
+            self._set_meta("rows", rows)
+            self._grow_locked(rows)
+            for slot, vector in written:
+                self._matrix[slot] = np.asarray(vector, dtype=np.float32)
+            # 벡터를 먼저 파일에 반영한 뒤 커밋 (다른 프로세스는 커밋 후에야 key를 봄)
+            self._matrix.flush()
+
+    # 가장 오래 사용하지 않은 n개 제거 (행은 free_slots로 옮겨 다음 저장 때 재사용)
+    def _evict_locked(self, n):
+        rows = self._db.execute("SELECT key, slot FROM embeddings ORDER BY last_used LIMIT ?", (n,)).fetchall()
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", [(key,) for key, _ in rows])
+        self._db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(slot,) for _, slot in rows])
+        self.stats["evicted"] += len(rows)
+        return len(rows)
+
+    def _entries(self):
+        return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.stats["hits"] += hits
+            self.stats["misses"] += misses
+
+    def stats_snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": self._entries(), "capacity": self._capacity, "dim": self.dim,
+                    "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None}
+
+    def metrics(self):
+        labels = {"model": self.model}
+        with self._lock:
+            entries = self._entries()
+        return [
+            ("chatbot_embedding_cache_total", {**labels, "outcome": "hit"}, self.stats["hits"]),
+            ("chatbot_embedding_cache_total", {**labels, "outcome": "miss"}, self.stats["misses"]),
+            ("chatbot_embedding_cache_evicted_total", labels, self.stats["evicted"]),
+            ("chatbot_embedding_cache_entries", labels, entries),
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._entries()
+
+
+# 임베딩 모델 감싸기: 캐시에 있는 텍스트는 API를 호출하지 않고, 없는 것만 한 번에 계산해 저장
+class CachedEmbeddings(Embeddings):
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+
+    # 캐시에 없어 실제로 임베딩해야 하는 텍스트 (요청 한도 계산용)
+    def uncached(self, texts):
+        stored = self.store.contains_many([text_key(t) for t in texts])
+        return [t for t in texts if text_key(t) not in stored]
+
+    def embed_documents(self, texts):
+        keys = [text_key(t) for t in texts]
+        found = self.store.get_many(keys)
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in found))
+        self.store.record(len(texts) - sum(1 for k in keys if k not in found), len(missing))
+        if missing:
+            with tracer.span("embedding.compute", kind="llm", model=self.store.model, texts=len(missing)):
+                vectors = self.inner.embed_documents(missing)
+            computed = [(text_key(t), v) for t, v in zip(missing, vectors)]
+            self.store.put_many(computed)
+            found.update((k, np.asarray(v, dtype=np.float32)) for k, v in computed)
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text):
+        key = text_key(text)
+        found = self.store.get_many([key])
+        if key in found:
+            self.store.record(1, 0)
+            return found[key].tolist()
+        self.store.record(0, 1)
+        with tracer.span("embedding.compute", kind="llm", model=self.store.model, texts=1):
+            vector = self.inner.embed_query(text)
+        self.store.put_many([(key, vector)])
+        return list(vector)
+
+
+_stores = {}
+_cached = {}
+_cached_lock = threading.Lock()
+
+
+# 모델 이름별 저장소 하나를 프로세스 전체가 공유 (RAG 인덱스·질의, 답변 캐시 등)
+# EMBEDDING_CACHE_DIR가 비어 있거나 cassette 기록·재생 중이면(캐시 적중 시 호출이 기록되지 않음) 그대로 반환
+def cached_embeddings(embedding, model):
+    if not EMBEDDING_CACHE_DIR or cassette.mode != "off":
+        return embedding
+    with _cached_lock:
+        store = _stores.get(model)
+        if store is None:
+            store = _stores[model] = EmbeddingStore(EMBEDDING_CACHE_DIR, model)
+            tracer.add_metric_provider(store.metrics, metrics={
+                "chatbot_embedding_cache_total": ("counter", "Embedding cache lookups by outcome"),
+                "chatbot_embedding_cache_evicted_total": ("counter", "Embedding cache entries evicted"),
+                "chatbot_embedding_cache_entries": ("gauge", "Embedding cache entries on disk"),
+            })
+        cached = _cached.get(id(embedding))
+        if cached is None or cached.inner is not embedding:
+            cached = _cached[id(embedding)] = CachedEmbeddings(embedding, store)
+        return cached
+
+
+# 모델별 캐시 통계 (적중/미적중, 제거 수, 저장 개수)
+def embedding_cache_stats():
+    with _cached_lock:
+        return {model: store.stats_snapshot() for model, store in _stores.items()}
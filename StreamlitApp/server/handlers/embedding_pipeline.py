@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+except ImportError:
+    from tracing import tracer
+
+load_dotenv()
+
+# 인덱스 생성 시 동시에 보낼 임베딩 요청 수
+RAG_EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", "4"))
+# 임베딩 API 한도: 분당 요청 수 / 분당 토큰 수 (계정 tier에 맞게 설정)
+RAG_EMBED_RPM = int(os.getenv("RAG_EMBED_RPM", "3000"))
+RAG_EMBED_TPM = int(os.getenv("RAG_EMBED_TPM", "1000000"))
+# 429/일시 오류 재시도: 최대 시도 횟수 / 백오프 기본·최대 지연(초)
+RAG_EMBED_MAX_ATTEMPTS = int(os.getenv("RAG_EMBED_MAX_ATTEMPTS", "6"))
+RAG_EMBED_BACKOFF_SEC = float(os.getenv("RAG_EMBED_BACKOFF_SEC", "1.0"))
+RAG_EMBED_MAX_BACKOFF_SEC = float(os.getenv("RAG_EMBED_MAX_BACKOFF_SEC", "30"))
+
+
+# 429 응답의 Retry-After(초) — 없으면 None
+def _retry_after(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def _is_rate_limited(e):
+    return getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+# 분당 요청 수 + 분당 토큰 수 토큰 버킷 (둘 다 여유가 생길 때까지 대기)
+# 429를 받으면 pause()로 모든 작업자를 함께 쉬게 함
+class RateLimiter:
+    def __init__(self, rpm=RAG_EMBED_RPM, tpm=RAG_EMBED_TPM, clock=time.monotonic, sleep=time.sleep):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self.waited_sec = 0.0
+
+    def _refill_locked(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens):
+        # 한도보다 큰 요청은 버킷을 가득 채운 뒤 보냄 (영원히 기다리지 않도록)
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill_locked(now)
+                wait = max(self._paused_until - now,
+                           (1 - self._requests) * 60 / self.rpm if self._requests < 1 else 0,
+                           (tokens - self._tokens) * 60 / self.tpm if self._tokens < tokens else 0)
+                if wait <= 0:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                self.waited_sec += wait
+            self._sleep(wait)
+
+    def pause(self, sec):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + sec)
+
+
+# 토큰 수로 나눈 배치들을 동시에 임베딩하고, 결과는 배치 순서대로 반환
+# - RateLimiter로 RPM/TPM 한도를 지키고, 429/일시 오류는 Retry-After 또는 지터 백오프 후 재시도
+# - 임베딩 캐시(CachedEmbeddings)를 쓰면 캐시에 없는 텍스트의 토큰만 한도에서 차감
+class EmbeddingPipeline:
+    def __init__(self, embedding, workers=RAG_EMBED_WORKERS, limiter=None, retryable=None,
+                 max_attempts=RAG_EMBED_MAX_ATTEMPTS, backoff=RAG_EMBED_BACKOFF_SEC,
+                 max_backoff=RAG_EMBED_MAX_BACKOFF_SEC, sleep=time.sleep):
+        self.embedding = embedding
+        self.workers = max(1, workers)
+        self.limiter = limiter or RateLimiter()
+        self.retryable = retryable or (lambda e: False)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "texts": 0, "tokens": 0, "requests": 0, "retries": 0, "rate_limited": 0}
+
+    def _count(self, **kwargs):
+        with self._lock:
+            for key, n in kwargs.items():
+                self.stats[key] += n
+
+    def _embed(self, texts, tokens):
+        uncached = getattr(self.embedding, "uncached", None)
+        if uncached is not None:
+            pending = uncached(texts)
+            tokens = tokens * len(pending) // len(texts) if texts else 0
+            if not pending:
+                return self.embedding.embed_documents(texts)
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            self._count(requests=1)
+            try:
+                with tracer.span("rag.embed_batch", kind="llm", texts=len(texts), tokens=tokens, attempt=attempt):
+                    vectors = self.embedding.embed_documents(texts)
+                self._count(tokens=tokens)
+                return vectors
+            except Exception as e:
+                limited = _is_rate_limited(e)
+                attempt += 1
+                if not (limited or self.retryable(e)) or attempt >= self.max_attempts:
+                    raise
+                delay = _retry_after(e) if limited else None
+                if delay is None:
+                    delay = random.uniform(0.5, 1.0) * min(self.max_backoff, self.backoff * (2 ** attempt))
+                if limited:
+                    self._count(rate_limited=1)
+                    self.limiter.pause(delay)
+                self._count(retries=1)
+                print(f"[DEBUG] [RAG_EMBED] {attempt}회 실패 → {delay:.2f}초 후 재시도: {e}")
+                self._sleep(delay)
+
+    # batches: (texts, tokens)를 내는 iterable(생성기 가능) → 같은 순서로 vectors를 하나씩 반환 (앞 배치가 끝나는 대로)
+    # 동시에 처리 중인 배치는 workers * 2개까지만 유지하고, 입력은 그만큼만 미리 읽음 (전체 배치를 목록으로 만들지 않음)
+    def map(self, batches):
+        batches = iter(batches)
+        if self.workers == 1:
+            for texts, tokens in batches:
+                self._count(batches=1, texts=len(texts))
+                yield self._embed(texts, tokens)
+            return
+        window = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-embed") as pool:
+            pending = deque()
+            try:
+                for texts, tokens in batches:
+                    self._count(batches=1, texts=len(texts))
+                    # 추적 span이 index_refresh 아래에 기록되도록 현재 context를 복사해 실행
+                    pending.append(pool.submit(contextvars.copy_context().run, self._embed, texts, tokens))
+                    if len(pending) >= window:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,214 @@
+import re
+import datetime
+from dataclasses import dataclass, field
+
+# ─────────────────────────────────────────────────────────────
+# 1. 사전 (지역 / 업종 / 상권)
+
+SIDO = {
+    "서울특별시": "서울", "서울시": "서울", "서울": "서울",
+    "부산광역시": "부산", "부산": "부산",
+    "대구광역시": "대구", "대구": "대구",
+    "인천광역시": "인천", "인천": "인천",
+    "광주광역시": "광주",
+    "대전광역시": "대전", "대전": "대전",
+    "울산광역시": "울산", "울산": "울산",
+    "세종특별자치시": "세종", "세종": "세종",
+    "경기도": "경기", "경기": "경기",
+    "강원특별자치도": "강원", "강원도": "강원",
+    "충청북도": "충북", "충북": "충북",
+    "충청남도": "충남", "충남": "충남",
+    "전북특별자치도": "전북", "전라북도": "전북", "전북": "전북",
+    "전라남도": "전남", "전남": "전남",
+    "경상북도": "경북", "경북": "경북",
+    "경상남도": "경남", "경남": "경남",
+    "제주특별자치도": "제주", "제주도": "제주",
+}
+
+SEOUL_GU = [
+    "종로구", "중구", "용산구", "성동구", "광진구", "동대문구", "중랑구", "성북구", "강북구",
+    "도봉구", "노원구", "은평구", "서대문구", "마포구", "양천구", "강서구", "구로구", "금천구",
+    "영등포구", "동작구", "관악구", "서초구", "강남구", "송파구", "강동구",
+]
+
+SIGUNGU = SEOUL_GU + [
+    "수원시", "성남시", "고양시", "용인시", "부천시", "안산시", "안양시", "남양주시", "화성시",
+    "평택시", "의정부시", "시흥시", "파주시", "김포시", "광명시", "광주시", "군포시", "하남시",
+    "오산시", "이천시", "구리시", "의왕시", "양주시", "포천시", "여주시", "동두천시", "과천시",
+    "춘천시", "원주시", "강릉시", "청주시", "충주시", "천안시", "아산시", "전주시", "익산시",
+    "군산시", "목포시", "여수시", "순천시", "포항시", "경주시", "구미시", "안동시", "창원시",
+    "김해시", "진주시", "양산시", "거제시", "제주시", "서귀포시", "해운대구", "수성구", "연수구",
+]
+
+# 구 이름을 "강남", "마포"처럼 줄여 쓰는 경우
+SIGUNGU_SHORT = {name[:-1]: name for name in SEOUL_GU if len(name) >= 3}
+
+# '…동'으로 끝나지만 행정동이 아닌 단어
+DONG_STOPWORDS = {"운동", "활동", "자동", "이동", "노동", "행동", "변동", "공동", "행정동", "법정동", "유동", "연동", "작동", "가동"}
+
+MARKETS = ["전통시장", "발달상권", "골목상권", "관광특구"]
+
+# 상권정보 업종 대분류 (indsLclsCd)
+INDS_LCLS = {
+    "G2": "소매", "I1": "숙박", "I2": "음식", "L1": "부동산", "M1": "과학·기술",
+    "N1": "시설관리·임대", "P1": "교육", "Q1": "보건의료", "R1": "예술·스포츠", "S2": "수리·개인",
+}
+
+# 업종/메뉴명 → 업종 대분류 코드
+INDUSTRY_NAMES = {
+    "한식": "I2", "중식": "I2", "일식": "I2", "양식": "I2", "분식": "I2", "음식점": "I2", "식당": "I2",
+    "카페": "I2", "커피": "I2", "치킨": "I2", "피자": "I2", "햄버거": "I2", "떡볶이": "I2", "탕후루": "I2",
+    "제과": "I2", "베이커리": "I2", "빵집": "I2", "호프": "I2", "주점": "I2", "술집": "I2", "고깃집": "I2",
+    "국밥": "I2", "김밥": "I2", "횟집": "I2", "디저트": "I2",
+    "편의점": "G2", "슈퍼마켓": "G2", "마트": "G2", "꽃집": "G2", "옷가게": "G2", "의류": "G2",
+    "정육점": "G2", "과일가게": "G2", "안경점": "G2", "휴대폰": "G2",
+    "숙박": "I1", "모텔": "I1", "호텔": "I1", "게스트하우스": "I1",
+    "부동산": "L1", "공인중개사": "L1",
+    "학원": "P1", "교습소": "P1", "독서실": "P1",
+    "약국": "Q1", "병원": "Q1", "의원": "Q1", "치과": "Q1", "한의원": "Q1",
+    "노래방": "R1", "PC방": "R1", "피시방": "R1", "헬스장": "R1", "당구장": "R1", "볼링장": "R1",
+    "미용실": "S2", "네일": "S2", "세탁소": "S2", "빨래방": "S2", "피부관리": "S2", "이발소": "S2",
+}
+
+# 업종 코드(indsLclsCd/indsMclsCd/indsSclsCd) 패턴: 대분류 알파벳 + 숫자 1·3·5자리
+INDS_CODE_RE = re.compile(r"\b([GILMNPQRS]\d(?:\d{2}){0,2})\b")
+
+YEAR_RE = re.compile(r"(20\d{2})\s*년")
+QUARTER_RE = re.compile(r"([1-4])\s*분기")
+HOUR_RE = re.compile(r"(오전|오후|저녁|밤|새벽)?\s*(\d{1,2})\s*시")
+DONG_RE = re.compile(r"([가-힣]{1,5}\d?동)(?=\s|에서|의|에|$)")
+
+RELATIVE_YEARS = {"올해": 0, "금년": 0, "작년": -1, "지난해": -1, "재작년": -2}
+
+# ─────────────────────────────────────────────────────────────
+# 2. route 규칙 (LLMRouter 프롬프트의 분류 규칙과 동일한 키워드)
+
+ROUTE_RULES = {
+    "A": [
+        (re.compile(r"(전통시장|발달상권|골목상권|관광특구).*(매출|객단가)|(매출|객단가).*(전통시장|발달상권|골목상권|관광특구)"), 3.0),
+        (re.compile(r"객단가|구매\s*건수|결제\s*건수"), 2.0),
+        (re.compile(r"매출.*(순위|랭킹|top|TOP|평균|추이|변화|비교|가장)|(순위|랭킹|top|TOP|평균|추이|변화|가장).*매출"), 2.0),
+    ],
+    "B": [
+        (re.compile(r"개업(?!률)|폐업(?!률)"), 2.5),
+        (re.compile(r"인허가|운영\s*중|영업\s*중|업소\s*(리스트|목록)"), 2.0),
+        (re.compile(r"유동\s*인구|인구\s*밀도|실시간|시간대별\s*인구|붐비"), 2.5),
+    ],
+    "C": [
+        (re.compile(r"개업률|생존율|창업\s*위험도|위험|평균\s*영업\s*기간|영업\s*기간|얼마나\s*(영업|운영|버티)"), 3.0),
+        (re.compile(r"프랜차이즈|가맹"), 2.5),
+    ],
+    "D": [
+        (re.compile(r"지원\s*(사업|정책|금|제도|받)|지원해|지원이|정책자금|보조금|바우처"), 3.0),
+        (re.compile(r"신청\s*(방법|조건|기간|자격)|우수\s*사례|성공\s*사례|사례"), 2.5),
+        (re.compile(r"장사가\s*(너무\s*)?안\s*(되|돼)|힘들|매출이\s*없|경영\s*부진|재기"), 2.0),
+    ],
+    "X": [
+        (re.compile(r"^\s*(안녕|하이|hello|hi\b)|도움이\s*필요|어떤\s*질문"), 3.0),
+        (re.compile(r"로그인|비밀번호|계정"), 3.0),
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    route: str = None
+    confidence: float = 0.0
+    slots: dict = field(default_factory=dict)
+    scores: dict = field(default_factory=dict)
+
+    @property
+    def confident(self):
+        return self.route is not None
+
+
+# 질문에서 지역/업종/연도/분기/시간 슬롯을 뽑고, 규칙 점수로 route를 추정하는 사전 분류기
+class RuleBasedRouter:
+    def __init__(self, min_score=2.5, min_confidence=0.7, today=None):
+        self.min_score = min_score
+        self.min_confidence = min_confidence
+        self.today = today
+
+    def extract(self, question: str) -> dict:
+        slots = {}
+
+        sido = [norm for name, norm in SIDO.items() if name in question]
+        if sido:
+            slots["sido"] = sorted(set(sido))
+
+        sigungu = [name for name in SIGUNGU if name in question]
+        sigungu += [full for short, full in SIGUNGU_SHORT.items() if short in question and full not in sigungu]
+        if sigungu:
+            slots["sigungu"] = sigungu
+
+        dong = [d for d in DONG_RE.findall(question) if d not in DONG_STOPWORDS and d not in SIGUNGU]
+        if dong:
+            slots["adong"] = dong
+
+        markets = [m for m in MARKETS if m in question]
+        if markets:
+            slots["market"] = markets
+
+        industries = [name for name in INDUSTRY_NAMES if name in question]
+        if industries:
+            slots["industry"] = industries
+            slots["indsLclsCd"] = sorted({INDUSTRY_NAMES[name] for name in industries})
+        codes = [code for code in INDS_CODE_RE.findall(question) if code[:2] in INDS_LCLS]
+        if codes:
+            slots["inds_code"] = codes
+
+        this_year = (self.today or datetime.date.today()).year
+        years = [int(y) for y in YEAR_RE.findall(question)]
+        years += [this_year + offset for word, offset in RELATIVE_YEARS.items() if word in question]
+        if years:
+            slots["year"] = sorted(set(years))
+
+        quarters = [int(q) for q in QUARTER_RE.findall(question)]
+        if quarters:
+            slots["quarter"] = quarters
+
+        hours = []
+        for period, hour in HOUR_RE.findall(question):
+            hour = int(hour)
+            if period in ("오후", "저녁", "밤") and hour < 12:
+                hour += 12
+            if 0 <= hour <= 24:
+                hours.append(hour)
+        if hours:
+            slots["hour"] = hours
+
+        return slots
+
+    def classify(self, question: str) -> RouteDecision:
+        slots = self.extract(question)
+        scores = {}
+        for route, rules in ROUTE_RULES.items():
+            score = sum(weight for pattern, weight in rules if pattern.search(question))
+            if score:
+                scores[route] = score
+
+        # 규칙 1: 업종/메뉴명이 있고 다른 route 키워드가 없으면 B
+        if "industry" in slots and set(scores) <= {"B"}:
+            scores["B"] = scores.get("B", 0) + 2.5
+        # 연도/분기 + 매출 → A
+        if ("year" in slots or "quarter" in slots) and re.search(r"매출|객단가", question) and "D" not in scores:
+            scores["A"] = scores.get("A", 0) + 1.5
+        # 시간 + 인구/지역 → B
+        if "hour" in slots and re.search(r"인구|사람", question):
+            scores["B"] = scores.get("B", 0) + 1.0
+
+        decision = RouteDecision(slots=slots, scores=scores)
+        if not scores:
+            return decision
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        top_route, top_score = ranked[0]
+        confidence = top_score / sum(scores.values())
+        # 프롬프트는 업종/메뉴명이 있으면 무조건 B → 다른 route 키워드도 함께 나오면("한식 창업 위험도")
+        # 규칙으로 정하지 않고 LLM이 프롬프트 우선순위대로 분류하도록 확신도를 기준 아래로 낮춤
+        if "industry" in slots and set(scores) - {"B"}:
+            confidence = min(confidence, self.min_confidence - 0.01)
+        decision.confidence = round(confidence, 3)
+        if top_score >= self.min_score and confidence >= self.min_confidence:
+            decision.route = top_route
+        return decision
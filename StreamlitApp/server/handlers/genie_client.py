@@ -0,0 +1,154 @@
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+    from handlers.resilience import resilience
+    from handlers.cassette import cassette
+except ImportError:  # Modeling 노트북처럼 handlers 폴더를 sys.path에 직접 추가해 import 한 경우
+    from tracing import tracer
+    from resilience import resilience
+    from cassette import cassette
+
+load_dotenv()
+
+# workspace 단위 커넥션 풀 크기 / 동시 요청 수 제한
+GENIE_POOL_SIZE = int(os.getenv("GENIE_POOL_SIZE", "16"))
+GENIE_MAX_CONCURRENCY = int(os.getenv("GENIE_MAX_CONCURRENCY", "8"))
+
+# (connect, read) 타임아웃(초)
+GENIE_HTTP_TIMEOUT = (5, 30)
+
+
+# 재시도 대상 응답 코드 (GET은 모두, POST는 요청이 처리되지 않았음이 확실한 429/503만)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_POST_STATUS_CODES = {429, 503}
+
+
+class GenieHTTPError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Request failed: {status_code}, {text}")
+        self.status_code = status_code
+
+
+def _is_retryable_get(e):
+    if isinstance(e, GenieHTTPError):
+        return e.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def _is_retryable_post(e):
+    if isinstance(e, GenieHTTPError):
+        return e.status_code in RETRYABLE_POST_STATUS_CODES
+    return isinstance(e, requests.exceptions.ConnectTimeout)
+
+
+# workspace별 keep-alive 세션과 동시성 세마포어 (프로세스 공용)
+class _WorkspacePool:
+    _lock = threading.Lock()
+    _sessions = {}
+    _semaphores = {}
+
+    @classmethod
+    def get(cls, workspace, pool_size, max_concurrency):
+        with cls._lock:
+            if workspace not in cls._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._sessions[workspace] = session
+                cls._semaphores[workspace] = threading.BoundedSemaphore(max_concurrency)
+            return cls._sessions[workspace], cls._semaphores[workspace]
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+            cls._semaphores.clear()
+
+
+# Databricks Genie API 클라이언트 (space별 설정, workspace별 세션 공유)
+class GenieClient:
+    def __init__(self, workspace, token, space_id,
+                 pool_size=GENIE_POOL_SIZE, max_concurrency=GENIE_MAX_CONCURRENCY,
+                 timeout=GENIE_HTTP_TIMEOUT):
+        self.workspace = workspace
+        self.token = token
+        self.space_id = space_id
+        self.timeout = timeout
+        self.headers = {'Authorization': f'Bearer {self.token}'}
+        # 테스트/벤치마크용으로 "http://host:port" 형태의 workspace도 허용
+        self.base_url = workspace if workspace.startswith(("http://", "https://")) else f"https://{workspace}"
+        self.session, self._semaphore = _WorkspacePool.get(self.base_url, pool_size, max_concurrency)
+
+    def _space_url(self, path=""):
+        return f"{self.base_url}/api/2.0/genie/spaces/{self.space_id}{path}"
+
+    def _send(self, url, method, data_json):
+        with self._semaphore:
+            response = self.session.request(method=method, url=url, headers=self.headers,
+                                            json=data_json, timeout=self.timeout)
+        return [response.status_code, response.text]
+
+    def _request(self, url, method, data_json, endpoint):
+        with tracer.span("genie.http", kind="http", method=method, space_id=self.space_id,
+                         endpoint=endpoint) as span:
+            # 기록/재생 시 workspace 주소는 요청 식별에서 제외 (경로와 본문만 사용)
+            status_code, text = cassette.call(
+                "genie", {"method": method, "path": url[len(self.base_url):], "json": data_json},
+                lambda: self._send(url, method, data_json), label=endpoint
+            )
+            span.set(status_code=status_code, bytes=len(text))
+            if status_code != 200:
+                raise GenieHTTPError(status_code, text)
+            return json.loads(text)
+
+    # endpoint별 회로 차단기 / 재시도 / 헤지(GET만) 적용
+    def _run_api(self, url, method='GET', data_json=None, endpoint=None):
+        idempotent = method == 'GET'
+        return resilience.call(
+            f"genie.{endpoint or method.lower()}",
+            lambda: self._request(url, method, data_json, endpoint),
+            retryable=_is_retryable_get if idempotent else _is_retryable_post,
+            hedge=idempotent
+        )
+
+    # space 정보 조회 (가벼운 GET, 기동 시 keep-alive 연결·인증을 미리 준비하는 데 사용)
+    def get_space(self):
+        return self._run_api(self._space_url(), endpoint="get_space")
+
+    def start_conversation(self, question):
+        url = self._space_url("/start-conversation")
+        return self._run_api(url, method='POST', data_json={"content": question}, endpoint="start_conversation")
+
+    def ask_followup(self, conversation_id, question):
+        url = self._space_url(f"/conversations/{conversation_id}/messages")
+        return self._run_api(url, method='POST', data_json={"content": question}, endpoint="ask_followup")
+
+    def get_query_info(self, conversation_id, message_id):
+        url = self._space_url(f"/conversations/{conversation_id}/messages/{message_id}")
+        return self._run_api(url, endpoint="get_message")
+
+    def get_query_result(self, conversation_id, message_id, attachment_id):
+        url = self._space_url(f"/conversations/{conversation_id}/messages/{message_id}/query-result/{attachment_id}")
+        return self._run_api(url, endpoint="get_query_result")
+
+    # 큰 결과는 여러 chunk로 나뉨: 첫 응답의 manifest와 함께 chunk(result 블록)를 순서대로 반환
+    # next_chunk_internal_link를 따라가며 필요한 만큼만 요청하므로, 호출 측에서 중간에 멈출 수 있음
+    def iter_query_result_chunks(self, conversation_id, message_id, attachment_id):
+        statement = self.get_query_result(conversation_id, message_id, attachment_id).get("statement_response", {})
+        manifest = statement.get("manifest", {})
+        chunk = statement.get("result", {})
+        while True:
+            yield manifest, chunk
+            next_link = chunk.get("next_chunk_internal_link")
+            if not next_link:
+                return
+            chunk = self._run_api(f"{self.base_url}{next_link}", endpoint="get_result_chunk")
@@ -0,0 +1,182 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+    from handlers.genie_poller import GeniePoller
+except ImportError:
+    from tracing import tracer
+    from genie_poller import GeniePoller
+
+load_dotenv()
+
+# space별로 미리 열어 둘 Genie 대화 수 (0이면 사용 안 함, 기본 0)
+# 주의: 미리 연 대화는 GENIE_WARM_PROMPT를 실제 첫 메시지로 보내고, 사용자의 첫 질문은 그 대화의 후속 질문이 됨
+#   → 인사말과 Genie의 응답이 사용자 질문의 SQL 생성 맥락에 포함되고, 대화의 첫 질문이 사용자 질문이 아니게 됨
+#   첫 질문 지연(start-conversation)을 줄이는 대신 답변 품질이 달라질 수 있으므로 측정 후에만 사용
+#   (0이어도 prefill은 space 조회 GET으로 연결·인증만 미리 준비하고, 대화는 사용자 질문으로 시작)
+GENIE_WARM_CONVERSATIONS = int(os.getenv("GENIE_WARM_CONVERSATIONS", "0"))
+# 대화를 꺼낸 뒤 남은(준비 중 포함) 대화 수가 이 값 이하일 때만 목표 개수까지 다시 채움
+GENIE_WARM_LOW_WATER = int(os.getenv("GENIE_WARM_LOW_WATER", "0"))
+# 미리 연 대화를 이 시간(초) 안에 못 쓰면 꺼낼 때 폐기 (타이머로 새로 열지는 않음)
+GENIE_WARM_MAX_AGE_SEC = float(os.getenv("GENIE_WARM_MAX_AGE_SEC", "600"))
+# 대화를 열 때 보내는 첫 메시지 / 첫 메시지 완료 대기 시간(초)
+GENIE_WARM_PROMPT = os.getenv("GENIE_WARM_PROMPT", "안녕하세요")
+GENIE_WARM_TIMEOUT_SEC = float(os.getenv("GENIE_WARM_TIMEOUT_SEC", "60"))
+# 대화를 여는 백그라운드 스레드 수
+GENIE_WARM_WORKERS = int(os.getenv("GENIE_WARM_WORKERS", "2"))
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+# space별로 미리 시작해 둔 Genie 대화 풀 + 연결 준비
+# - prefill()은 등록된 space마다 get_space(GET)를 한 번 보내 keep-alive 연결과 인증을 미리 준비
+# - size > 0이면 새 세션의 첫 질문은 start_conversation 대신 풀에서 꺼낸 대화에 ask_followup으로 보냄
+# - prefill()로 처음 한 번 채우고, 이후에는 대화를 꺼내 남은 수가 low_water 이하일 때만 백그라운드에서 보충
+# - max_age_sec가 지난 대화는 꺼낼 때 폐기만 함 (쓰지 않는 대화를 주기적으로 새로 열지 않음)
+# - 꺼낸 뒤의 후속 질문 수 제한은 ConversationState(GENIE_MAX_FOLLOWUPS)가 담당
+class GenieConversationPool:
+    def __init__(self, size=GENIE_WARM_CONVERSATIONS, low_water=GENIE_WARM_LOW_WATER, max_age_sec=GENIE_WARM_MAX_AGE_SEC,
+                 prompt=GENIE_WARM_PROMPT, timeout=GENIE_WARM_TIMEOUT_SEC, workers=GENIE_WARM_WORKERS,
+                 poller=None, clock=time.monotonic):
+        self.size = size
+        self.low_water = low_water
+        self.max_age_sec = max_age_sec
+        self.prompt = prompt
+        self.timeout = timeout
+        # 준비용 메시지 완료 시간은 실제 질문과 달라 별도 poller로 학습
+        self.poller = poller or GeniePoller()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._api_factories = {}
+        self._ready = defaultdict(deque)    # key → deque[(conversation_id, created_at)]
+        self._pending = defaultdict(int)
+        self._refill_sec = defaultdict(lambda: deque(maxlen=50))
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "created": 0, "failed": 0, "retired": 0,
+                                           "warmed": 0, "warm_failed": 0})
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="genie-pool")
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    # key(예: "genie_sales")별 GenieClient 생성 함수 등록 (클라이언트는 처음 채울 때 생성)
+    def register(self, key, api_factory):
+        with self._lock:
+            self._api_factories[key] = api_factory
+
+    # 미리 연 대화 하나를 꺼냄, 없으면 None (호출 측에서 start_conversation)
+    def take(self, key):
+        if not self.enabled or key not in self._api_factories:
+            return None
+        with self._lock:
+            self._retire_locked(key)
+            ready = self._ready[key]
+            conversation_id = ready.popleft()[0] if ready else None
+            self._stats[key]["hits" if conversation_id else "misses"] += 1
+        self.refill(key, low_water=self.low_water)
+        return conversation_id
+
+    # 등록된 모든 space의 연결을 준비하고, 대화 풀을 쓰면 목표 개수까지 채움 (warm_up에서 한 번)
+    def prefill(self):
+        for key in list(self._api_factories):
+            self._executor.submit(self._warm_connection, key)
+            if self.enabled:
+                self.refill(key)
+
+    # 대화를 만들지 않고 space 조회만 보내 연결·인증을 준비
+    def _warm_connection(self, key):
+        try:
+            api = self._api_factories[key]()
+            with tracer.span("genie.pool_warm", kind="pool", space_id=api.space_id):
+                api.get_space()
+        except Exception as e:
+            print(f"[ERROR] [GENIE_POOL] {key} 연결 준비 실패:", str(e))
+            with self._lock:
+                self._stats[key]["warm_failed"] += 1
+            return
+        with self._lock:
+            self._stats[key]["warmed"] += 1
+
+    # low_water가 주어지면 남은 대화 수가 그 이하일 때만 채움
+    def refill(self, key, low_water=None):
+        with self._lock:
+            self._retire_locked(key)
+            available = len(self._ready[key]) + self._pending[key]
+            missing = 0 if low_water is not None and available > low_water else max(0, self.size - available)
+            self._pending[key] += missing
+        for _ in range(missing):
+            self._executor.submit(self._open, key)
+
+    def _retire_locked(self, key):
+        ready = self._ready[key]
+        now = self._clock()
+        while ready and now - ready[0][1] > self.max_age_sec:
+            ready.popleft()
+            self._stats[key]["retired"] += 1
+
+    # 대화를 시작하고 첫 메시지가 끝날 때까지 기다린 뒤 풀에 넣음
+    # (첫 메시지 처리 중에 후속 질문을 보내면 Genie가 거절하거나 앞 메시지를 기다림)
+    def _open(self, key):
+        started = self._clock()
+        try:
+            api = self._api_factories[key]()
+            with tracer.span("genie.pool_open", kind="pool", space_id=api.space_id):
+                result = api.start_conversation(self.prompt)
+                conversation_id, message_id = result["conversation_id"], result["message_id"]
+                self.poller.wait(api.space_id, lambda: api.get_query_info(conversation_id, message_id),
+                                 is_done=lambda m: m.get("status") in ("COMPLETED", "SUCCEEDED"),
+                                 timeout=self.timeout)
+        except Exception as e:
+            print(f"[ERROR] [GENIE_POOL] {key} 대화 준비 실패:", str(e))
+            with self._lock:
+                self._pending[key] -= 1
+                self._stats[key]["failed"] += 1
+            return
+        with self._lock:
+            self._pending[key] -= 1
+            self._ready[key].append((conversation_id, self._clock()))
+            self._refill_sec[key].append(self._clock() - started)
+            self._stats[key]["created"] += 1
+
+    def stats(self):
+        with self._lock:
+            report = {}
+            for key in self._api_factories:
+                s = self._stats[key]
+                takes = s["hits"] + s["misses"]
+                refill = list(self._refill_sec[key])
+                report[key] = {
+                    **s,
+                    "ready": len(self._ready[key]),
+                    "pending": self._pending[key],
+                    "hit_rate": round(s["hits"] / takes, 3) if takes else 0.0,
+                    "refill_p50_sec": round(_percentile(refill, 0.5), 3),
+                    "refill_p95_sec": round(_percentile(refill, 0.95), 3),
+                }
+            return report
+
+    def metrics(self):
+        rows = []
+        for key, s in self.stats().items():
+            labels = {"pool": key}
+            rows += [
+                ("chatbot_genie_pool_ready", labels, s["ready"]),
+                ("chatbot_genie_pool_pending", labels, s["pending"]),
+                ("chatbot_genie_pool_takes_total", {**labels, "outcome": "hit"}, s["hits"]),
+                ("chatbot_genie_pool_takes_total", {**labels, "outcome": "miss"}, s["misses"]),
+                ("chatbot_genie_pool_retired_total", labels, s["retired"]),
+                ("chatbot_genie_pool_open_failures_total", labels, s["failed"]),
+                ("chatbot_genie_pool_connections_warmed_total", {**labels, "outcome": "ok"}, s["warmed"]),
+                ("chatbot_genie_pool_connections_warmed_total", {**labels, "outcome": "failed"}, s["warm_failed"]),
+                ("chatbot_genie_pool_refill_seconds", {**labels, "quantile": "0.5"}, s["refill_p50_sec"]),
+                ("chatbot_genie_pool_refill_seconds", {**labels, "quantile": "0.95"}, s["refill_p95_sec"]),
+            ]
+        return rows
@@ -0,0 +1,130 @@
+import time
+import threading
+from collections import defaultdict, deque
+
+# Genie 메시지 상태값
+DONE_STATUSES = ("SUCCEEDED", "COMPLETED")
+FAILED_STATUSES = ("FAILED", "CANCELLED", "QUERY_RESULT_EXPIRED")
+
+
+class GeniePollTimeout(Exception):
+    pass
+
+
+class GeniePollFailed(Exception):
+    pass
+
+
+# Genie 메시지 완료 여부를 적응형 백오프로 폴링
+# - 첫 대기 시간은 space별로 관측된 완료 시간(하위 분위수)에서 결정
+# - 이후 대기 시간은 backoff 배수로 늘어나며 max_delay를 넘지 않음
+# - 요청별 deadline(초)을 넘기면 GeniePollTimeout 발생
+class GeniePoller:
+    def __init__(self, min_delay=0.3, max_delay=4.0, backoff=1.6,
+                 default_first_delay=1.0, first_delay_quantile=0.25,
+                 timeout=60.0, history_size=50, sleep=time.sleep, clock=time.monotonic):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.default_first_delay = default_first_delay
+        self.first_delay_quantile = first_delay_quantile
+        self.timeout = timeout
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=history_size))
+        self._stats = defaultdict(lambda: {
+            "answers": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "polls": 0,
+            "wasted_sec": 0.0,
+            "elapsed_sec": 0.0,
+        })
+
+    # space별 과거 완료 시간으로 첫 대기 시간 계산
+    def first_delay(self, space_id):
+        with self._lock:
+            return self._first_delay_locked(space_id)
+
+    def _first_delay_locked(self, space_id):
+        history = sorted(self._durations[space_id])
+        if not history:
+            return self.default_first_delay
+        idx = int(self.first_delay_quantile * (len(history) - 1))
+        return min(max(history[idx], self.min_delay), self.max_delay * 2)
+
+    # 완료될 때까지 fetch()를 반복 호출하고 마지막 메시지를 반환
+    # timeout: 이번 폴링에 허용할 시간(초), deadline: 요청 전체의 마감 시각(clock 기준)
+    def wait(self, space_id, fetch, is_done=None, timeout=None, deadline=None, on_poll=None):
+        if is_done is None:
+            is_done = self.is_message_done
+
+        started = self._clock()
+        ends_at = started + (self.timeout if timeout is None else timeout)
+        if deadline is not None:
+            ends_at = min(ends_at, deadline)
+
+        delay = self.first_delay(space_id)
+        last_poll_at = started
+        polls = 0
+
+        while True:
+            remaining = ends_at - self._clock()
+            if remaining <= 0:
+                self._record(space_id, polls, None, 0.0, outcome="timeouts")
+                raise GeniePollTimeout(f"Genie 응답 대기 시간 초과 ({ends_at - started:.0f}s, {polls}회 폴링)")
+
+            self._sleep(min(delay, remaining))
+            message = fetch()
+            polls += 1
+            now = self._clock()
+            status = message.get("status", "")
+
+            if on_poll is not None:
+                on_poll(polls, status)
+
+            if status in FAILED_STATUSES:
+                self._record(space_id, polls, None, 0.0, outcome="failures")
+                raise GeniePollFailed(f"Genie 쿼리 실패 (status={status})")
+
+            if is_done(message):
+                # 완료 시점은 직전 폴링과 이번 폴링 사이 어딘가 → 중간값을 추정치로 사용
+                completed_at = (last_poll_at + now) / 2
+                wasted = now - completed_at
+                self._record(space_id, polls, completed_at - started, wasted, outcome="answers")
+                return message
+
+            last_poll_at = now
+            delay = min(delay * self.backoff, self.max_delay)
+
+    @staticmethod
+    def is_message_done(message):
+        return message.get("status", "") in DONE_STATUSES and bool(message.get("attachments"))
+
+    def _record(self, space_id, polls, duration, wasted, outcome):
+        with self._lock:
+            stats = self._stats[space_id]
+            stats[outcome] += 1
+            stats["polls"] += polls
+            stats["wasted_sec"] += wasted
+            if duration is not None:
+                stats["elapsed_sec"] += duration
+                self._durations[space_id].append(duration)
+
+    # space별 통계 (답변당 폴링 횟수, 완료 후 낭비 시간 등)
+    def get_stats(self, space_id=None):
+        with self._lock:
+            items = {space_id: self._stats[space_id]} if space_id else dict(self._stats)
+            report = {}
+            for sid, s in items.items():
+                finished = s["answers"] + s["timeouts"] + s["failures"]
+                report[sid] = {
+                    **s,
+                    "polls_per_answer": s["polls"] / finished if finished else 0.0,
+                    "avg_wasted_sec": s["wasted_sec"] / s["answers"] if s["answers"] else 0.0,
+                    "avg_completion_sec": s["elapsed_sec"] / s["answers"] if s["answers"] else 0.0,
+                    "next_first_delay": self._first_delay_locked(sid),
+                }
+            return report
+
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# Genie(Databricks SQL) statement 결과를 manifest.schema.columns 타입에 맞는 DataFrame으로 변환
+# JSON_ARRAY 형식의 셀은 모두 문자열(또는 null)이므로 컬럼 단위로 한 번에 변환함
+
+INTEGER_TYPES = {"BYTE", "SHORT", "INT", "LONG"}
+FLOAT_TYPES = {"FLOAT", "DOUBLE", "DECIMAL"}
+BOOLEAN_TYPES = {"BOOLEAN"}
+DATE_TYPES = {"DATE", "TIMESTAMP_NTZ"}
+TIMESTAMP_TYPES = {"TIMESTAMP"}
+
+_BOOLEAN_VALUES = {"true": True, "false": False}
+
+
+def column_names(columns_schema):
+    return [col.get("name", f"col{i}") for i, col in enumerate(columns_schema)]
+
+
+# 문자열 → float64 (빠른 astype 먼저, 잘못된 값이 섞여 있으면 NaN 처리)
+def _to_float(values):
+    try:
+        return values.astype("float64")
+    except (ValueError, TypeError):
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def _convert(values, type_name):
+    if type_name in INTEGER_TYPES:
+        # null이 있으면 nullable 정수, 없으면 int64
+        if values.isna().any():
+            return _to_float(values).astype("Int64")
+        try:
+            return values.astype("int64")
+        except (ValueError, OverflowError):
+            return _to_float(values)
+    if type_name in FLOAT_TYPES:
+        return _to_float(values)
+    if type_name in BOOLEAN_TYPES:
+        return values.str.lower().map(_BOOLEAN_VALUES).astype("boolean")
+    if type_name in DATE_TYPES:
+        return pd.to_datetime(values, errors="coerce", format="ISO8601")
+    if type_name in TIMESTAMP_TYPES:
+        return pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    # STRING / CHAR / BINARY / ARRAY / MAP / STRUCT / INTERVAL 등은 문자열 그대로 유지
+    return values
+
+
+# 행 리스트 → (행, 열) object 배열 (행 길이가 스키마와 다르면 None으로 채움)
+def _to_matrix(data_array, width):
+    matrix = np.empty((len(data_array), width), dtype=object)
+    try:
+        matrix[:] = data_array
+    except ValueError:
+        for i, row in enumerate(data_array):
+            row = list(row)[:width]
+            matrix[i] = row + [None] * (width - len(row))
+    return matrix
+
+
+# columns_schema: manifest.schema.columns, data_array: result.data_array (행 리스트)
+def decode_rows(columns_schema, data_array):
+    names = column_names(columns_schema)
+    matrix = _to_matrix(data_array or [], len(names))
+
+    frame = {}  # 컬럼 이름이 중복될 수 있어 위치(i)로 모은 뒤 이름을 붙임
+    for i, (name, col) in enumerate(zip(names, columns_schema)):
+        values = pd.Series(matrix[:, i], dtype="object")
+        try:
+            frame[i] = _convert(values, (col.get("type_name") or "STRING").upper())
+        except (ValueError, TypeError) as e:
+            print(f"[DEBUG] [DECODER] {name} 컬럼 변환 실패, 문자열 유지:", str(e))
+            frame[i] = values
+    df = pd.DataFrame(frame, columns=range(len(names)))
+    df.columns = names
+    return df
+
+
+# get_query_result 응답 전체를 받아 DataFrame 반환 (스키마가 없으면 None)
+def decode_statement_result(result_json):
+    statement = result_json.get("statement_response", {})
+    columns_schema = statement.get("manifest", {}).get("schema", {}).get("columns", [])
+    if not columns_schema:
+        return None
+    data_array = statement.get("result", {}).get("data_array", [])
+    return decode_rows(columns_schema, data_array)
+
+
+# iter_query_result_chunks 결과를 chunk 단위로 변환해 하나의 DataFrame으로 합침
+# - max_rows: 이 행 수에 도달하면 남은 chunk는 요청하지 않음 (truncated=True)
+# - on_preview: 첫 chunk 변환 직후 앞부분(preview_rows행)을 먼저 전달
+# 반환: (DataFrame 또는 None, 전체 행 수(manifest 기준, 없으면 None), truncated)
+def decode_chunks(chunks, max_rows=None, preview_rows=50, on_preview=None):
+    frames = []
+    loaded = 0
+    total_rows = None
+    truncated = False
+    columns_schema = None
+    for manifest, chunk in chunks:
+        if columns_schema is None:
+            columns_schema = manifest.get("schema", {}).get("columns", [])
+            total_rows = manifest.get("total_row_count")
+            if not columns_schema:
+                return None, total_rows, False
+
+        data_array = chunk.get("data_array") or []
+        if max_rows is not None and loaded + len(data_array) > max_rows:
+            data_array = data_array[:max_rows - loaded]
+            truncated = True
+        if data_array or not frames:
+            frames.append(decode_rows(columns_schema, data_array))
+            loaded += len(data_array)
+
+        if len(frames) == 1 and on_preview and chunk.get("next_chunk_internal_link") and not truncated:
+            on_preview(frames[0].head(preview_rows), total_rows)
+        if truncated or (max_rows is not None and loaded >= max_rows and chunk.get("next_chunk_internal_link")):
+            truncated = True
+            break
+
+    if columns_schema is None:
+        return None, None, False
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return df, total_rows, truncated
@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 그대로 넘기는 최근 대화 수 / 최근 대화 + 요약에 쓰는 토큰 예산
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "4"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+# 요약(오래된 질문 목록)에 쓰는 토큰 예산 / 답변 한 개에서 남길 최대 글자 수
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+HISTORY_ANSWER_CHARS = int(os.getenv("HISTORY_ANSWER_CHARS", "300"))
+
+# context() 첫 줄(오래된 대화 요약) 머리말
+SUMMARY_PREFIX = "이전에 물어본 질문: "
+
+
+# 토큰 수 근사치 (한글 1글자 ≈ 3바이트 ≈ 1토큰, 영문 ≈ 4바이트/토큰) — tiktoken 없이 매 턴 계산 가능한 수준
+def estimate_tokens(text):
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+# 답변 dict → 대화 맥락에 남길 짧은 텍스트 (표는 행/열 수와 설명만 남김)
+def summarize_answer(result, max_chars=HISTORY_ANSWER_CHARS):
+    if not isinstance(result, dict):
+        return str(result)[:max_chars]
+    parts = []
+    if result.get("description"):
+        parts.append(str(result["description"]))
+    df = result.get("response_df")
+    if df is not None and hasattr(df, "shape"):
+        parts.append(f"[표 {df.shape[0]}행 x {df.shape[1]}열: {', '.join(map(str, list(df.columns)[:6]))}]")
+    if result.get("response"):
+        parts.append(str(result["response"]))
+    # 복합 질문: 하위 질문별 설명만 짧게 남김
+    for sub in result.get("sub_results") or []:
+        parts.append(f"[{sub.get('label')}] {sub.get('description') or sub.get('response') or '표'}")
+    text = " ".join(parts)
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+# graph history(요약 1줄 + 최근 대화) → LLM 분류용 맥락 문자열 (요약은 항상 포함하고 최근 대화는 recent_turns개까지)
+def context_text(history, recent_turns=3, separator="\n."):
+    history = list(history or [])
+    summary = history[:1] if history and history[0].startswith(SUMMARY_PREFIX) else []
+    return separator.join(summary + history[len(summary):][-recent_turns:])
+
+
+# 최근 N개 대화 + 오래된 대화의 요약을 토큰 예산 안에서 유지 (턴마다 증분 갱신)
+# context()는 graph의 history로 그대로 전달되며, 새 대화가 추가될 때만 다시 만들어짐
+class HistoryStore:
+    def __init__(self, max_turns=HISTORY_MAX_TURNS, token_budget=HISTORY_TOKEN_BUDGET,
+                 summary_tokens=HISTORY_SUMMARY_TOKENS, answer_chars=HISTORY_ANSWER_CHARS,
+                 count_tokens=estimate_tokens):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.answer_chars = answer_chars
+        self._count = count_tokens
+        self._lock = threading.Lock()
+        self._turns = deque()              # (text, tokens, question)
+        self._turn_tokens = 0
+        self._summary_questions = deque()  # (question, tokens)
+        self._summary_tokens = 0
+        self._context = []
+        self.total_turns = 0
+
+    def add(self, question, result):
+        text = f"Q: {question}\nA: {summarize_answer(result, self.answer_chars)}"
+        with self._lock:
+            tokens = self._count(text)
+            self._turns.append((text, tokens, question))
+            self._turn_tokens += tokens
+            self.total_turns += 1
+            # 개수/토큰 예산을 넘는 오래된 대화는 요약으로 이동 (가장 최근 대화는 항상 유지)
+            while len(self._turns) > 1 and (
+                    len(self._turns) > self.max_turns or self._turn_tokens + self._summary_tokens > self.token_budget):
+                _, old_tokens, old_question = self._turns.popleft()
+                self._turn_tokens -= old_tokens
+                self._push_summary(old_question)
+            self._context = self._build_context()
+
+    def _push_summary(self, question):
+        tokens = self._count(question) + 1
+        self._summary_questions.append((question, tokens))
+        self._summary_tokens += tokens
+        while self._summary_questions and self._summary_tokens > self.summary_tokens:
+            _, old_tokens = self._summary_questions.popleft()
+            self._summary_tokens -= old_tokens
+
+    def _build_context(self):
+        context = []
+        if self._summary_questions:
+            context.append(SUMMARY_PREFIX + " / ".join(q for q, _ in self._summary_questions))
+        context.extend(text for text, _, _ in self._turns)
+        return context
+
+    # graph에 넘길 history (요약 1줄 + 최근 대화), 호출마다 새로 직렬화하지 않음
+    def context(self):
+        return self._context
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._turn_tokens = 0
+            self._summary_questions.clear()
+            self._summary_tokens = 0
+            self._context = []
+            self.total_turns = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "total_turns": self.total_turns,
+                "kept_turns": len(self._turns),
+                "summary_questions": len(self._summary_questions),
+                "tokens": self._turn_tokens + self._summary_tokens,
+            }
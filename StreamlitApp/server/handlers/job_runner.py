@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+except ImportError:
+    from tracing import tracer
+
+load_dotenv()
+
+# 채팅 턴을 처리하는 작업 스레드 수 / 대기열 최대 길이 (넘으면 새 질문 거절)
+CHATBOT_WORKERS = int(os.getenv("CHATBOT_WORKERS", "8"))
+CHATBOT_MAX_QUEUE = int(os.getenv("CHATBOT_MAX_QUEUE", "32"))
+
+# 화면에 표시할 진행 단계
+STAGE_LABELS = {
+    "queued": "대기 중",
+    "routing": "질문 분류 중",
+    "sql_generating": "SQL 생성 중",
+    "running": "쿼리 실행 중",
+    "fetching": "결과 가져오는 중",
+    "retrieving": "관련 자료 검색 중",
+    "answering": "답변 작성 중",
+    "done": "완료",
+    "failed": "실패",
+}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# 채팅 턴 하나의 진행 상태 (작업 스레드가 갱신, 화면 스레드가 snapshot으로 읽음)
+class ChatJob:
+    def __init__(self, question):
+        self.id = uuid.uuid4().hex
+        self.question = question
+        self.stage = "queued"
+        self.stages = [("queued", time.time())]
+        self.text = ""
+        self.preview_df = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def set_stage(self, stage):
+        with self._lock:
+            if stage != self.stage:
+                self.stage = stage
+                self.stages.append((stage, time.time()))
+
+    def append_text(self, text):
+        with self._lock:
+            self.text += text
+
+    def set_preview(self, df):
+        with self._lock:
+            self.preview_df = df
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.finished_at = time.perf_counter()
+            stage = "failed" if error else "done"
+            self.stage = stage
+            self.stages.append((stage, time.time()))
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "question": self.question,
+                "stage": self.stage,
+                "stage_label": STAGE_LABELS.get(self.stage, self.stage),
+                "text": self.text,
+                "preview_df": self.preview_df,
+                "result": self.result,
+                "error": self.error,
+                "done": self._done.is_set(),
+                "elapsed_sec": round((self.finished_at or time.perf_counter()) - self.submitted_at, 2),
+            }
+
+
+# 제한된 스레드 풀에서 채팅 턴 실행, 제출 즉시 ChatJob 핸들 반환
+class ChatJobRunner:
+    def __init__(self, workers=CHATBOT_WORKERS, max_queue=CHATBOT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-job")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    # fn(job)이 job.set_stage/append_text로 진행 상황을 기록하고 최종 결과를 반환
+    def submit(self, question, fn):
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise JobQueueFull(f"대기 중인 질문이 너무 많습니다 ({self._queued}/{self.max_queue})")
+            self._queued += 1
+            self._stats["submitted"] += 1
+        job = ChatJob(question)
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        job.started_at = time.perf_counter()
+        try:
+            result = fn(job)
+            job.finish(result=result)
+            outcome = "completed"
+        except Exception as e:
+            print("[ERROR] [JOB] 채팅 작업 실패:", str(e))
+            job.finish(error=str(e))
+            outcome = "failed"
+        with self._lock:
+            self._running -= 1
+            self._stats[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queued,
+                "running": self._running,
+                "utilization": round(self._running / self.workers, 3) if self.workers else 0.0,
+                **self._stats,
+            }
+
+    def metrics(self):
+        stats = self.stats()
+        return [
+            ("chatbot_job_queue_depth", {}, stats["queued"]),
+            ("chatbot_job_running", {}, stats["running"]),
+            ("chatbot_job_worker_utilization", {}, stats["utilization"]),
+            ("chatbot_jobs_total", {"outcome": "completed"}, stats["completed"]),
+            ("chatbot_jobs_total", {"outcome": "failed"}, stats["failed"]),
+            ("chatbot_jobs_total", {"outcome": "rejected"}, stats["rejected"]),
+        ]
+
+
+# 프로세스 공용 작업 풀 (모든 Streamlit 세션이 공유)
+chat_job_runner = ChatJobRunner()
+tracer.add_metric_provider(chat_job_runner.metrics, metrics={
+    "chatbot_job_queue_depth": ("gauge", "Chat jobs waiting for a worker"),
+    "chatbot_job_running": ("gauge", "Chat jobs currently running"),
+    "chatbot_job_worker_utilization": ("gauge", "Fraction of job workers busy"),
+    "chatbot_jobs_total": ("counter", "Chat jobs finished by outcome"),
+})
@@ -1,167 +1,53 @@
 import os
-import boto3
-import fitz  # PyMuPDF
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-from tiktoken import get_encoding
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import time
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
 from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain.chains import RetrievalQAWithSourcesChain
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from handlers.tracing import tracer, record_token_usage
+from handlers.resilience import resilience, is_retryable_llm_error
+from handlers.cassette import cassette
+from handlers.token_accounting import token_accountant
+from handlers.rag_indexer import IncrementalIndexer
+from handlers.embedding_cache import cached_embeddings
 
 load_dotenv()
 
+# 기동 시 S3 원본과 비교해 인덱스를 증분 갱신할지 여부 (0이면 있는 인덱스를 그대로 사용)
+RAG_INDEX_REFRESH = os.getenv("RAG_INDEX_REFRESH", "0") == "1"
+
 class LocalRAGHandler:
-    def __init__(self, bucket: str, key: str, pdf_prefix: str = None, faiss_dir="faiss_index"):
+    # llm / embedding: 지정하지 않으면 OpenAI 모델 사용 (벤치마크에서는 로컬 대체 모델 주입)
+    def __init__(self, bucket: str, key: str, pdf_prefix: str = None, faiss_dir="faiss_index",
+                 llm=None, embedding=None):
         self.bucket = bucket
         self.key = key
-        self.pdf_prefix = os.getenv("BUCKET_PREFIX_PDF")
+        self.pdf_prefix = pdf_prefix or os.getenv("BUCKET_PREFIX_PDF")
         self.faiss_dir = faiss_dir
-        self.qa_chain = self._initialize_chain()
-
-    def _load_documents(self):
-        s3 = boto3.client('s3')
-        obj = s3.get_object(Bucket=self.bucket, Key=self.key)
-        xml_bytes = obj['Body'].read()
-        root = ET.fromstring(xml_bytes)
-
-        results = []
-        for category in root.findall("Category"):
-            category_name = category.get("name", "")
-            subcategories = category.findall("Subcategory")
-
-            if subcategories:
-                for subcat in subcategories:
-                    subcategory_name = subcat.get("name", "")
-                    for item in subcat.findall("Item"):
-                        title = item.findtext("Title")
-                        url = item.findtext("URL")
-                        content = item.findtext("Content") or ""
-                        soup = BeautifulSoup(content, "lxml")
-                        for dl in soup.find_all("dl"):
-                            dt, dd = dl.find("dt"), dl.find("dd")
-                            if dt and dd:
-                                results.append({
-                                    "Category": category_name,
-                                    "Subcategory": subcategory_name,
-                                    "title": title,
-                                    "url": url,
-                                    "구분": dt.get_text(strip=True),
-                                    "내용": dd.get_text(separator="\n", strip=True)
-                                })
-            else:
-                for item in category.findall("Item"):
-                    title = item.findtext("Title")
-                    url = item.findtext("URL")
-                    content = item.findtext("Content") or ""
-                    soup = BeautifulSoup(content, "lxml")
-                    for dl in soup.find_all("dl"):
-                        dt, dd = dl.find("dt"), dl.find("dd")
-                        if dt and dd:
-                            results.append({
-                                "Category": category_name,
-                                "Subcategory": None,
-                                "title": title,
-                                "url": url,
-                                "구분": dt.get_text(strip=True),
-                                "내용": dd.get_text(separator="\n", strip=True)
-                            })
-
-        texts, metadatas = [], []
-        for r in results:
-            if r["구분"] not in ["문의처", "설문", "만족도"]:
-                texts.append(
-                    f"카테고리: {r['Category'] or '없음'}\n"
-                    f"소분류: {r['Subcategory'] or '없음'}\n"
-                    f"사업명: {r['title']}\n"
-                    f"구분: {r['구분']}\n"
-                    f"내용:\n{r['내용']}"
-                )
-                metadatas.append({"title": r["title"], "source": r["url"]})
-
-        return texts, metadatas
-
-    def _load_pdfs(self):
-        if not self.pdf_prefix:
-            return [], []
-
-        s3 = boto3.client("s3")
-        paginator = s3.get_paginator("list_objects_v2")
-        operation_parameters = {"Bucket": self.bucket, "Prefix": self.pdf_prefix}
-
-        pdf_texts, metadatas = [], []
-
-        for page in paginator.paginate(**operation_parameters):
-            for obj in page.get("Contents", []):
-                key = obj["Key"]
-                if key.endswith(".pdf"):
-                    pdf_obj = s3.get_object(Bucket=self.bucket, Key=key)
-                    pdf_bytes = pdf_obj["Body"].read()
-
-                    doc = fitz.open("pdf", pdf_bytes)
-                    full_text = ""
-                    for page in doc:
-                        full_text += page.get_text()
-                    doc.close()
-
-                    pdf_texts.append(full_text)
-                    metadatas.append({
-                        "title": os.path.basename(key),
-                        "source": f"https://{self.bucket}.s3.amazonaws.com/{key}"
-                    })
-
-        return pdf_texts, metadatas
-
-
-
-    def split_documents_by_token_limit(self, documents, token_limit=250000):
-        tokenizer = get_encoding("cl100k_base")
-        batches = []
-        current_batch = []
-        current_tokens = 0
-
-        for doc in documents:
-            tokens = len(tokenizer.encode(doc.page_content))
-            if current_tokens + tokens > token_limit:
-                batches.append(current_batch)
-                current_batch = [doc]
-                current_tokens = tokens
-            else:
-                current_batch.append(doc)
-                current_tokens += tokens
-
-        if current_batch:
-            batches.append(current_batch)
-
-        return batches
+        self._llm = llm
+        self._embedding = embedding
+        self._initialize_chain()
 
     def _initialize_chain(self):
-        embedding = OpenAIEmbeddings(model="text-embedding-ada-002")
-
-        if os.path.exists(self.faiss_dir):
+        # 429 등 재시도는 인덱스 생성(embedding_pipeline)·질의(resilience)에서 처리
+        factory = lambda: OpenAIEmbeddings(model="text-embedding-ada-002", max_retries=0)
+        embedding = cassette.embeddings(self._embedding, factory, name="rag")
+        # 인덱스 생성(청크)과 질의(MultiQuery 변형 포함) 임베딩 모두 디스크 캐시를 거침
+        embedding = cached_embeddings(embedding, "text-embedding-ada-002" if self._embedding is None
+                                      else type(self._embedding).__name__)
+
+        # 인덱스가 있으면 그대로 사용, 없거나 RAG_INDEX_REFRESH=1이면 바뀐 원본만 다시 임베딩
+        if os.path.exists(self.faiss_dir) and not RAG_INDEX_REFRESH:
             vectorstore = FAISS.load_local(self.faiss_dir, embeddings=embedding, allow_dangerous_deserialization=True)
         else:
-            texts_xml, metas_xml = self._load_documents()
-            texts_pdf, metas_pdf = self._load_pdfs()
-
-            texts = texts_xml + texts_pdf
-            metadatas = metas_xml + metas_pdf
-
-            splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-            documents = splitter.create_documents(texts, metadatas=metadatas)
-            batches = self.split_documents_by_token_limit(documents, token_limit=250000)
-            vectorstore = None
-            for batch_docs in batches:
-                if vectorstore is None:
-                    vectorstore = FAISS.from_documents(batch_docs, embedding)
-                else:
-                    vectorstore.add_documents(batch_docs)
-
-            vectorstore.save_local(self.faiss_dir)
+            vectorstore = IncrementalIndexer(
+                faiss_dir=self.faiss_dir,
+                embedding=embedding,
+                bucket=self.bucket,
+                key=self.key,
+                pdf_prefix=self.pdf_prefix
+            ).refresh()
 
         prompt_template = PromptTemplate(
             input_variables=["summaries", "question"],
@@ -193,18 +79,54 @@ class LocalRAGHandler:
 """
         )
 
-        llm = ChatOpenAI(model_name="gpt-4.1-mini", temperature=0)
+        # stream_usage: 스트리밍 응답에서도 토큰 사용량을 받기 위함
+        # 재시도는 resilience에서 처리 / 기록·재생 모드면 cassette로 감쌈
+        llm = cassette.chat_model(self._llm, lambda: ChatOpenAI(model_name="gpt-4.1-mini", temperature=0,
+                                                                stream_usage=True, max_retries=0), name="rag")
         retriever = MultiQueryRetriever.from_llm(retriever=vectorstore.as_retriever(), llm=llm)
 
-        return RetrievalQAWithSourcesChain.from_chain_type(
-            retriever=retriever,
-            chain_type="stuff",
-            chain_type_kwargs={"prompt": prompt_template},
-            llm=llm
+        # 검색 → 프롬프트 → 스트리밍 답변은 ask_stream에서 직접 구성
+        self.llm = llm
+        self.retriever = retriever
+        self.base_retriever = vectorstore.as_retriever()
+        self.prompt_template = prompt_template
+
+    # 스트리밍 없이 (answer, sources) 반환 (ask_stream과 같은 경로)
+    def ask(self, question: str, expand_query: bool = True):
+        return self.ask_stream(question, on_token=lambda token: None, expand_query=expand_query)
+
+    # 검색 후 LLM 답변을 토큰 단위로 on_token에 전달하고, 끝나면 (answer, sources) 반환
+    # expand_query=False면 MultiQuery 질문 확장(LLM 호출) 없이 원래 질문으로만 검색 (토큰 예산 초과 시)
+    def ask_stream(self, question: str, on_token, expand_query: bool = True):
+        retriever = self.retriever if expand_query else self.base_retriever
+        with tracer.span("rag.retrieve", kind="retrieval", model="gpt-4.1-mini", expand_query=expand_query) as span:
+            docs = resilience.call("openai.rag_retrieve",
+                                   lambda: retriever.invoke(question, config=token_accountant.config()),
+                                   retryable=is_retryable_llm_error)
+            span.set(documents=len(docs))
+        # 문서마다 내용 + 출처 (프롬프트의 {summaries})
+        summaries = "\n\n".join(
+            f"Content: {doc.page_content}\nSource: {doc.metadata.get('source', '')}" for doc in docs
         )
-
-    def ask(self, question: str):
-        response = self.qa_chain.invoke({"question": question})
-        answer = response["answer"].strip()
-
-        return answer, response.get("sources")
+        prompt = self.prompt_template.format(summaries=summaries, question=question)
+
+        tokens = []
+
+        def stream_answer():
+            with tracer.span("llm.rag_answer", kind="llm", model="gpt-4.1-mini") as span:
+                for chunk in self.llm.stream(prompt, config=token_accountant.config()):
+                    if chunk.content:
+                        if not tokens:
+                            span.set(ttft_ms=round((time.perf_counter() - span.started) * 1000, 1))
+                        tokens.append(chunk.content)
+                        on_token(chunk.content)
+                    record_token_usage(span, chunk)
+
+        # 이미 화면에 토큰을 내보낸 뒤에는 재시도하면 답변이 중복되므로 첫 토큰 전 오류만 재시도
+        resilience.call("openai.rag_answer", stream_answer,
+                        retryable=lambda e: not tokens and is_retryable_llm_error(e))
+
+        sources = ", ".join(dict.fromkeys(
+            doc.metadata["source"] for doc in docs if doc.metadata.get("source")
+        ))
+        return "".join(tokens).strip(), sources
@@ -0,0 +1,85 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# S3에서 동시에 내려받을 PDF 수 / 텍스트 추출 프로세스 수 (0이면 프로세스 없이 스레드 하나에서 추출)
+PDF_DOWNLOAD_WORKERS = int(os.getenv("PDF_DOWNLOAD_WORKERS", "8"))
+# (CPU가 하나뿐이면 프로세스를 늘려도 빨라지지 않으므로 기본 0)
+_CPUS = os.cpu_count() or 1
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, _CPUS) if _CPUS > 1 else 0)))
+
+
+# 프로세스 풀에서 실행: PDF bytes → 페이지별 텍스트 목록
+def extract_pages(pdf_bytes):
+    import fitz  # PyMuPDF
+
+    with fitz.open("pdf", pdf_bytes) as doc:
+        return [page.get_text() for page in doc]
+
+
+# PDF 여러 개를 내려받기(스레드 풀) + 추출(프로세스 풀)로 겹쳐 처리하며 (key, page_no, text)를 하나씩 반환
+# - 동시에 처리 중인 PDF 수를 제한해 전체 파일을 메모리에 올리지 않음
+# - 끝나는 순서대로 반환하되, 한 PDF의 페이지는 1쪽부터 연속으로 나옴
+# - 추출에 실패한 PDF는 건너뛰고 failed에 기록
+class PdfLoader:
+    def __init__(self, s3, bucket, download_workers=PDF_DOWNLOAD_WORKERS, extract_workers=PDF_EXTRACT_WORKERS):
+        self.s3 = s3
+        self.bucket = bucket
+        self.download_workers = max(1, download_workers)
+        self.extract_workers = extract_workers
+        self.failed = []
+        self.stats = {"pdfs": 0, "pages": 0, "bytes": 0, "download_sec": 0.0, "elapsed_sec": 0.0}
+
+    def _download(self, key):
+        started = time.perf_counter()
+        data = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return data, time.perf_counter() - started
+
+    def _extract_pool(self):
+        if self.extract_workers <= 0:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extract")
+        # 스레드가 떠 있는 프로세스에서 fork하면 잠금이 꼬일 수 있어 spawn 사용
+        return ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def iter_pages(self, keys):
+        started = time.perf_counter()
+        keys = iter(keys)
+        max_in_flight = self.download_workers + max(1, self.extract_workers) * 2
+        with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="pdf-download") as downloads, \
+                self._extract_pool() as extracts:
+            pending = {}
+
+            def top_up():
+                while len(pending) < max_in_flight:
+                    key = next(keys, None)
+                    if key is None:
+                        return
+                    pending[downloads.submit(self._download, key)] = ("download", key)
+
+            top_up()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] [PDF] {key} {stage} 실패:", str(e))
+                        self.failed.append(key)
+                        continue
+                    if stage == "download":
+                        data, elapsed = result
+                        self.stats["bytes"] += len(data)
+                        self.stats["download_sec"] += elapsed
+                        pending[extracts.submit(extract_pages, data)] = ("extract", key)
+                        continue
+                    self.stats["pdfs"] += 1
+                    self.stats["pages"] += len(result)
+                    for page_no, text in enumerate(result, start=1):
+                        yield key, page_no, text
+                top_up()
+        self.stats["elapsed_sec"] = time.perf_counter() - started
@@ -0,0 +1,69 @@
+import io
+from collections import namedtuple
+from lxml import etree
+
+# 지원사업 XML(Category > Subcategory? > Item{Title, URL, Content(HTML)}) 공용 파서
+# StreamlitApp 인덱서, Modeling/langgraph, Scarping·Modeling 노트북이 함께 사용
+# - iterparse로 Item 하나씩 읽고 처리한 노드는 바로 비워서 파일 크기와 관계없이 메모리 일정
+# - Content HTML은 lxml HTML 파서 + 미리 컴파일한 XPath로 dl/dt/dd 추출 (Item마다 BeautifulSoup 생성 안 함)
+
+# 검색 대상에서 제외할 구분
+EXCLUDED_SECTIONS = ("문의처", "설문", "만족도")
+
+PolicyRecord = namedtuple("PolicyRecord", ["category", "subcategory", "title", "url", "section", "content"])
+
+_HTML_PARSER = etree.HTMLParser()
+_FIND_DL = etree.XPath("//dl")
+_FIRST_DT = etree.XPath("(.//dt)[1]")
+_FIRST_DD = etree.XPath("(.//dd)[1]")
+# 주석·script·style을 제외한 텍스트 노드 (BeautifulSoup get_text와 같은 기준)
+_TEXTS = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]")
+
+
+def _text(element, separator=""):
+    return separator.join(s for s in (t.strip() for t in _TEXTS(element)) if s)
+
+
+# Content HTML → (구분, 내용) 목록
+def extract_sections(content_html):
+    if not content_html or not content_html.strip():
+        return []
+    root = etree.fromstring(content_html, _HTML_PARSER)
+    if root is None:
+        return []
+    sections = []
+    for dl in _FIND_DL(root):
+        dt, dd = _FIRST_DT(dl), _FIRST_DD(dl)
+        if dt and dd:
+            sections.append((_text(dt[0]), _text(dd[0], "\n")))
+    return sections
+
+
+# source: XML bytes / 파일 경로 / read()가 있는 스트림 (S3 get_object의 Body 그대로 전달 가능)
+# 하위 분류가 없는 Item은 subcategory=None
+def iter_policy_records(source, exclude=EXCLUDED_SECTIONS):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    category, subcategory = "", None
+    for event, element in etree.iterparse(source, events=("start", "end"),
+                                          tag=("Category", "Subcategory", "Item")):
+        if event == "start":
+            if element.tag == "Category":
+                category, subcategory = element.get("name", ""), None
+            elif element.tag == "Subcategory":
+                subcategory = element.get("name", "")
+            continue
+        if element.tag != "Item":
+            if element.tag == "Subcategory":
+                subcategory = None
+            element.clear(keep_tail=True)
+        else:
+            title = element.findtext("Title")
+            url = element.findtext("URL")
+            for section, content in extract_sections(element.findtext("Content")):
+                if section not in exclude:
+                    yield PolicyRecord(category, subcategory, title, url, section, content)
+            # 처리한 Item과 앞서 읽은 형제 노드를 비워 트리가 커지지 않도록 함
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
@@ -0,0 +1,97 @@
+import os
+import re
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+try:
+    from handlers.entity_extractor import RuleBasedRouter, ROUTE_RULES
+except ImportError:
+    from entity_extractor import RuleBasedRouter, ROUTE_RULES
+
+load_dotenv()
+
+# 복합 질문을 나눌 때 최대 하위 질문 수
+DECOMPOSE_MAX_BRANCHES = int(os.getenv("DECOMPOSE_MAX_BRANCHES", "3"))
+
+# 절 구분: "위험도와 매출", "개업 수, 그리고 ...", "매출 및 객단가" 등
+CLAUSE_SPLIT_RE = re.compile(r"(?<=[가-힣A-Za-z0-9])(?:와|과|하고|이랑|랑)\s+|\s*(?:,|，|/|\s및\s|\s그리고\s|\s또\s|\s또한\s)\s*")
+LEADING_CONJUNCTION_RE = re.compile(r"^(그리고|및|또한|또)\s+")
+
+# 분해 대상 route (X는 안내 응답이라 제외)
+DECOMPOSABLE_ROUTES = ("A", "B", "C", "D")
+
+
+@dataclass
+class SubQuestion:
+    route: str
+    question: str
+
+
+# 규칙 기반 질문 분해기
+# - 절 단위로 나눈 뒤 각 절을 규칙 점수로 분류하고, 서로 다른 route가 2개 이상일 때만 분해
+# - 첫 절의 지역/업종/연도 등 슬롯 단어 중 다른 절에 없는 종류는 그 절 앞에 붙여 맥락을 유지
+#   예) "올해 강남구 한식 창업 위험도와 매출 추이" → C: "올해 강남구 한식 창업 위험도", A: "올해 강남구 한식 매출 추이"
+class QuestionDecomposer:
+    def __init__(self, rules=None, max_branches=DECOMPOSE_MAX_BRANCHES, min_clause_score=2.0):
+        self.rules = rules or RuleBasedRouter()
+        self.max_branches = max_branches
+        self.min_clause_score = min_clause_score
+
+    # 절 단위 분류는 키워드 규칙만 사용 (업종명만 있는 절에 붙는 B 가산점 등은 제외)
+    def _clause_route(self, clause):
+        scores = {}
+        for route in DECOMPOSABLE_ROUTES:
+            score = sum(weight for pattern, weight in ROUTE_RULES[route] if pattern.search(clause))
+            if score:
+                scores[route] = score
+        if not scores:
+            return None
+        route, score = max(scores.items(), key=lambda kv: kv[1])
+        return route if score >= self.min_clause_score else None
+
+    # 슬롯이 있는 단어와 그 슬롯 종류 (예: "마포구" → {"sigungu"})
+    def _context_words(self, clause):
+        words = []
+        for word in clause.split():
+            slots = self.rules.extract(word)
+            if slots:
+                words.append((word, set(slots)))
+        return words
+
+    # 분해할 수 없으면 None, 가능하면 route별 SubQuestion 리스트 반환
+    def decompose(self, question):
+        clauses = [LEADING_CONJUNCTION_RE.sub("", c).strip() for c in CLAUSE_SPLIT_RE.split(question)]
+        clauses = [c for c in clauses if c]
+        if len(clauses) < 2:
+            return None
+
+        # 절별 route 결정, route가 없는 절(예: "알려줘")은 앞 절에 붙임
+        grouped = []
+        for clause in clauses:
+            route = self._clause_route(clause)
+            if route is None and grouped:
+                grouped[-1][1].append(clause)
+            else:
+                grouped.append([route, [clause]])
+        if any(route is None for route, _ in grouped):
+            return None
+
+        routes = []
+        merged = {}
+        for route, parts in grouped:
+            if route not in merged:
+                routes.append(route)
+                merged[route] = []
+            merged[route].extend(parts)
+        if len(routes) < 2:
+            return None
+
+        # 첫 절의 슬롯 중 다른 절에 없는 종류(지역/업종/연도 등)만 앞에 붙임
+        context = self._context_words(grouped[0][1][0])
+        sub_questions = []
+        for route in routes[:self.max_branches]:
+            text = " ".join(merged[route])
+            own_slots = set(self.rules.extract(text))
+            prefix = [word for word, slots in context if word not in text and not slots & own_slots]
+            sub_questions.append(SubQuestion(route=route, question=" ".join(prefix + [text])))
+        return sub_questions
@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from collections import deque
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+    from handlers.cassette import cassette
+    from handlers.embedding_pipeline import EmbeddingPipeline
+    from handlers.resilience import is_retryable_llm_error
+    from handlers.pdf_loader import PdfLoader
+    from handlers.policy_xml import iter_policy_records
+except ImportError:
+    from tracing import tracer
+    from cassette import cassette
+    from embedding_pipeline import EmbeddingPipeline
+    from resilience import is_retryable_llm_error
+    from pdf_loader import PdfLoader
+    from policy_xml import iter_policy_records
+
+load_dotenv()
+
+MANIFEST_NAME = "manifest.json"
+# 2: PDF를 페이지 단위로 나누고 page 메타데이터 추가 (이전 버전 인덱스는 처음부터 다시 만듦)
+MANIFEST_VERSION = 2
+# 임베딩 요청 한 번에 넣을 최대 토큰 수 / 텍스트 수
+# (요청 크기 제한보다 작게 나눠야 여러 배치를 동시에 보낼 수 있음)
+EMBED_BATCH_TOKENS = int(os.getenv("RAG_EMBED_BATCH_TOKENS", "40000"))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "1000"))
+
+
+# 처음 만드는 인덱스에 넣을 청크가 하나도 없을 때 (XML/PDF 경로나 S3 권한 확인 필요)
+class EmptyIndexError(Exception):
+    pass
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# 지원사업 XML → (source_id, text, metadata) 섹션 목록 (Item 안의 dl 하나가 섹션 하나)
+# xml: bytes 또는 S3 Body 같은 스트림 (policy_xml이 한 번에 읽지 않고 Item 단위로 처리)
+def iter_xml_sections(xml):
+    for r in iter_policy_records(xml):
+        text = (
+            f"카테고리: {r.category or '없음'}\n"
+            f"소분류: {r.subcategory or '없음'}\n"
+            f"사업명: {r.title}\n"
+            f"구분: {r.section}\n"
+            f"내용:\n{r.content}"
+        )
+        # 위치 대신 사업/구분 이름으로 식별 (앞쪽 항목이 추가·삭제돼도 나머지는 그대로 유지)
+        source_id = f"xml:{r.category}/{r.subcategory or ''}/{r.url or r.title}/{r.section}"
+        yield source_id, text, {"title": r.title, "source": r.url}
+
+
+# 원본 항목(XML 섹션 / PDF 파일)과 청크의 해시를 manifest로 관리하며 FAISS 인덱스를 증분 갱신
+# - 원본 해시(PDF는 S3 ETag)가 같으면 다시 내려받거나 나누지 않고 기존 청크를 그대로 사용
+# - 청크 id = 원본 id + 청크 내용 해시 → 내용이 같은 청크는 다시 임베딩하지 않음
+# - 사라진 청크는 인덱스에서 삭제하고, 새 버전 폴더에 저장한 뒤 심볼릭 링크 교체로 반영
+class IncrementalIndexer:
+    def __init__(self, faiss_dir, embedding, bucket, key, pdf_prefix=None,
+                 chunk_size=500, chunk_overlap=50, s3=None):
+        self.faiss_dir = faiss_dir
+        self.embedding = embedding
+        self.bucket = bucket
+        self.key = key
+        self.pdf_prefix = pdf_prefix
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._s3 = s3
+        self.pipeline = EmbeddingPipeline(embedding, retryable=is_retryable_llm_error)
+        self.last_stats = {}
+        self.pdf_stats = {}
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = cassette.s3_client()
+        return self._s3
+
+    def load_manifest(self):
+        path = os.path.join(self.faiss_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+    # pieces: (text, metadata) 목록 (XML 섹션은 하나, PDF는 페이지마다 하나)
+    def _chunks(self, source_id, pieces):
+        chunks, seen = [], set()
+        for text, metadata in pieces:
+            for chunk_text in self.splitter.split_text(text):
+                chunk_id = f"{source_id}#{_sha1(chunk_text)[:16]}"
+                while chunk_id in seen:  # 한 원본 안에 같은 내용의 청크가 반복되는 경우
+                    chunk_id += "+"
+                seen.add(chunk_id)
+                chunks.append({"id": chunk_id, "text": chunk_text, "metadata": metadata})
+        return chunks
+
+    # 같은 id의 원본이 여러 번 나오면(같은 사업이 중복 등록 등) 순서대로 번호를 붙임
+    @staticmethod
+    def _unique_id(sources, source_id):
+        unique, n = source_id, 1
+        while unique in sources:
+            n += 1
+            unique = f"{source_id}~{n}"
+        return unique
+
+    # 원본을 읽는 대로 sources(source_id → {"hash", "chunk_ids"})에 기록하고, 새로 임베딩할 청크를 하나씩 반환
+    # (XML은 Item 단위 스트리밍, PDF는 내려받아 추출되는 대로 PDF 단위로 처리 → 전체 청크 목록을 만들지 않음)
+    def _iter_new_chunks(self, previous, sources, old_ids):
+        xml_body = self.s3.get_object(Bucket=self.bucket, Key=self.key)["Body"]
+        for source_id, text, metadata in iter_xml_sections(xml_body):
+            source_id = self._unique_id(sources, source_id)
+            digest = _sha1(text)
+            old = previous.get(source_id)
+            if old and old["hash"] == digest:
+                sources[source_id] = {"hash": digest, "chunk_ids": old["chunk_ids"]}
+            else:
+                yield from self._record_source(sources, source_id, digest, [(text, metadata)], old_ids)
+
+        changed = {}
+        for source_id, key, etag in self._pdf_sources():
+            old = previous.get(source_id)
+            if old and old["hash"] == etag:
+                sources[source_id] = {"hash": etag, "chunk_ids": old["chunk_ids"]}
+            else:
+                changed[key] = (source_id, etag)
+        if changed:
+            yield from self._load_pdfs(changed, previous, sources, old_ids)
+
+    def _record_source(self, sources, source_id, digest, pieces, old_ids):
+        chunks = self._chunks(source_id, pieces)
+        sources[source_id] = {"hash": digest, "chunk_ids": [c["id"] for c in chunks]}
+        for chunk in chunks:
+            if chunk["id"] not in old_ids:
+                yield chunk
+
+    # S3 목록의 PDF: (source_id, key, ETag) — ETag가 바뀐 PDF만 내려받음
+    def _pdf_sources(self):
+        if not self.pdf_prefix:
+            return
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.pdf_prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if key.endswith(".pdf"):
+                    yield f"pdf:{key}", key, (obj.get("ETag") or "").strip('"') or str(obj.get("Size"))
+
+    # 변경된 PDF를 병렬로 내려받아 추출하고, 페이지가 도착하는 대로 PDF 단위로 새 청크 반환
+    def _load_pdfs(self, changed, previous, sources, old_ids):
+        loader = PdfLoader(self.s3, self.bucket)
+        current_key, pages = None, []
+
+        with tracer.span("rag.pdf_load", kind="index", pdfs=len(changed)) as span:
+            for key, page_no, text in loader.iter_pages(changed):
+                if key != current_key:
+                    if current_key is not None:
+                        yield from self._record_source(sources, *changed[current_key], pages, old_ids)
+                    current_key, pages = key, []
+                pages.append((text, {"title": os.path.basename(key), "page": page_no,
+                                     "source": f"https://{self.bucket}.s3.amazonaws.com/{key}"}))
+            if current_key is not None:
+                yield from self._record_source(sources, *changed[current_key], pages, old_ids)
+            # 추출에 실패한 PDF는 이전 청크를 유지하고 다음 갱신 때 다시 시도
+            for key in loader.failed:
+                source_id, _ = changed[key]
+                if source_id in previous:
+                    sources[source_id] = previous[source_id]
+            span.set(**{k: round(v, 2) for k, v in loader.stats.items()}, failed=len(loader.failed))
+        self.pdf_stats = {**loader.stats, "failed": len(loader.failed)}
+
+    # 청크 → (배치, 토큰 수) 목록
+    def _embed_batches(self, chunks):
+        try:
+            from tiktoken import get_encoding
+            count_tokens = get_encoding("cl100k_base").encode
+        except Exception:  # 인코딩 파일을 받을 수 없는 환경 (오프라인 재생 등) → 바이트 수로 근사
+            count_tokens = lambda text: range(len(text.encode("utf-8")) // 3 + 1)
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = len(count_tokens(chunk["text"]))
+            if batch and (batch_tokens + tokens > EMBED_BATCH_TOKENS or len(batch) >= EMBED_BATCH_SIZE):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    # 인덱스를 최신 상태로 맞추고 vectorstore 반환 (새로 만드는데 청크가 없으면 EmptyIndexError)
+    def refresh(self):
+        started = time.perf_counter()
+        manifest = self.load_manifest()
+        vectorstore = None
+        if manifest is not None and os.path.exists(self.faiss_dir):
+            vectorstore = FAISS.load_local(self.faiss_dir, embeddings=self.embedding,
+                                           allow_dangerous_deserialization=True)
+        else:
+            # manifest 없는 예전 인덱스는 청크 id를 알 수 없으므로 처음부터 다시 만듦
+            manifest = {"sources": {}}
+        previous = manifest["sources"]
+
+        with tracer.span("rag.index_refresh", kind="index") as span:
+            self.pdf_stats = {}
+            sources = {}
+            old_ids = {cid for s in previous.values() for cid in s["chunk_ids"]}
+
+            # 원본 읽기 → 청크 → 배치 → 임베딩 → 인덱스 추가를 스트리밍으로 연결
+            # 파이프라인이 처리 중인 배치만 in_flight에 보관하므로 메모리는 전체 원본 크기와 관계없이 일정
+            in_flight = deque()
+            counts = {"embedded": 0, "batches": 0}
+
+            def batches():
+                for batch, tokens in self._embed_batches(self._iter_new_chunks(previous, sources, old_ids)):
+                    in_flight.append(batch)
+                    counts["batches"] += 1
+                    counts["embedded"] += len(batch)
+                    yield [c["text"] for c in batch], tokens
+
+            stats_before = {**self.pipeline.stats, "waited_sec": self.pipeline.limiter.waited_sec}
+            embed_started = time.perf_counter()
+            # 배치는 동시에 임베딩하고, 인덱스에는 배치 순서대로 추가
+            for vectors in self.pipeline.map(batches()):
+                batch = in_flight.popleft()
+                pairs = list(zip([c["text"] for c in batch], vectors))
+                metadatas = [c["metadata"] for c in batch]
+                ids = [c["id"] for c in batch]
+                if vectorstore is None:
+                    vectorstore = FAISS.from_embeddings(pairs, self.embedding, metadatas=metadatas, ids=ids)
+                else:
+                    vectorstore.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+            embed_sec = time.perf_counter() - embed_started
+            embed_tokens = self.pipeline.stats["tokens"] - stats_before["tokens"]
+
+            current_ids = {cid for s in sources.values() for cid in s["chunk_ids"]}
+            removed_ids = sorted(old_ids - current_ids)
+            if removed_ids and vectorstore is not None:
+                vectorstore.delete(removed_ids)
+
+            self.last_stats = {
+                "sources": len(sources),
+                "chunks": len(current_ids),
+                "embedded": counts["embedded"],
+                "removed": len(removed_ids),
+                "changed_sources": sum(1 for sid, s in sources.items()
+                                       if previous.get(sid, {}).get("hash") != s["hash"]),
+                "embed_batches": counts["batches"],
+                "embed_tokens": embed_tokens,
+                "embed_sec": round(embed_sec, 2),
+                "embed_tokens_per_sec": round(embed_tokens / embed_sec, 1) if embed_tokens and embed_sec else 0,
+                "embed_retries": self.pipeline.stats["retries"] - stats_before["retries"],
+                "rate_limit_wait_sec": round(self.pipeline.limiter.waited_sec - stats_before["waited_sec"], 2),
+                "pdf_loaded": self.pdf_stats.get("pdfs", 0),
+                "pdf_pages": self.pdf_stats.get("pages", 0),
+                "pdf_failed": self.pdf_stats.get("failed", 0),
+                "pdf_load_sec": round(self.pdf_stats.get("elapsed_sec", 0), 2),
+            }
+            span.set(**self.last_stats)
+
+            if vectorstore is None:
+                raise EmptyIndexError(f"RAG 인덱스에 넣을 문서가 없습니다 (s3://{self.bucket}/{self.key}, "
+                                      f"PDF prefix={self.pdf_prefix or '없음'})")
+            if counts["embedded"] or removed_ids or set(previous) != set(sources):
+                self._save(vectorstore, {"version": MANIFEST_VERSION, "updated_at": time.time(), "sources": sources})
+        self.last_stats["elapsed_sec"] = round(time.perf_counter() - started, 2)
+        print("[DEBUG] [RAG_INDEX] 갱신 완료:", self.last_stats)
+        return vectorstore
+
+    # 새 버전 폴더(faiss_dir.v<시각>)에 인덱스 + manifest를 저장한 뒤 faiss_dir 심볼릭 링크를 os.replace로 교체
+    # 교체는 원자적이라 읽는 쪽(FAISS.load_local)이나 중간에 죽은 경우에도 항상 이전 또는 새 인덱스가 온전히 남음
+    # 직전 버전 하나는 읽는 중인 프로세스를 위해 남겨 두고 더 오래된 버전은 삭제
+    def _save(self, vectorstore, manifest):
+        target = os.path.abspath(self.faiss_dir)
+        version_dir = f"{target}.v{time.time_ns()}"
+        vectorstore.save_local(version_dir)
+        with open(os.path.join(version_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        # 교체 전 버전 (예전 방식의 실제 폴더는 _point_to에서 .v0으로 옮겨짐)
+        previous = os.path.realpath(target) if os.path.islink(target) else \
+            f"{target}.v0" if os.path.isdir(target) else None
+        try:
+            self._point_to(target, version_dir)
+        except (OSError, NotImplementedError) as e:
+            # 심볼릭 링크를 만들 수 없는 환경(Windows 권한 등): 폴더 이름 교체, 실패하면 이전 폴더 복구
+            print("[ERROR] [RAG_INDEX] 심볼릭 링크 교체 실패, 폴더 교체로 저장:", str(e))
+            self._swap_dir(target, version_dir)
+            return
+        keep = {os.path.basename(version_dir), os.path.basename(previous or "")}
+        prefix = os.path.basename(target) + ".v"
+        for name in os.listdir(os.path.dirname(target)):
+            if name.startswith(prefix) and name not in keep:
+                shutil.rmtree(os.path.join(os.path.dirname(target), name), ignore_errors=True)
+
+    @staticmethod
+    def _point_to(target, version_dir):
+        link_tmp = f"{target}.link-tmp"
+        if os.path.lexists(link_tmp):
+            os.remove(link_tmp)
+        os.symlink(os.path.basename(version_dir), link_tmp)
+        if os.path.isdir(target) and not os.path.islink(target):
+            # 예전 방식의 실제 폴더는 버전 폴더로 옮긴 뒤 링크로 교체 (처음 한 번만)
+            os.replace(target, f"{target}.v0")
+        os.replace(link_tmp, target)
+
+    @staticmethod
+    def _swap_dir(target, version_dir):
+        old_dir = f"{target}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(target):
+            os.replace(target, old_dir)
+        try:
+            os.replace(version_dir, target)
+        except OSError:
+            if os.path.exists(old_dir):
+                os.replace(old_dir, target)
+            raise
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# 배치/cron용: python -m handlers.rag_indexer (server 폴더에서 실행)
+if __name__ == "__main__":
+    from langchain_openai import OpenAIEmbeddings
+    from handlers.embedding_cache import cached_embeddings
+
+    embedding = cassette.embeddings(factory=lambda: OpenAIEmbeddings(model="text-embedding-ada-002", max_retries=0),
+                                    name="rag")
+    indexer = IncrementalIndexer(
+        faiss_dir=os.getenv("RAG_FAISS_DIR", "faiss_index"),
+        embedding=cached_embeddings(embedding, "text-embedding-ada-002"),
+        bucket=os.environ["BUCKET_NAME"],
+        key=os.environ["BUCKET_KEY_XML"],
+        pdf_prefix=os.getenv("BUCKET_PREFIX_PDF"),
+    )
+    indexer.refresh()
@@ -0,0 +1,298 @@
+import os
+import time
+import random
+import threading
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+except ImportError:
+    from tracing import tracer
+
+load_dotenv()
+
+# 회로 차단기: 연속 실패 횟수 / 열린 뒤 다시 시도해 보기까지 시간(초)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SEC = float(os.getenv("BREAKER_RESET_SEC", "20"))
+# 재시도: 최대 시도 횟수(첫 요청 포함) / 지수 백오프 기본·최대 지연(초)
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_SEC = float(os.getenv("RETRY_BASE_DELAY_SEC", "0.2"))
+RETRY_MAX_DELAY_SEC = float(os.getenv("RETRY_MAX_DELAY_SEC", "2.0"))
+# 재시도 예산: 요청 1건당 적립되는 재시도 비율, 초당 기본 적립량, 최대 적립량
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("RETRY_BUDGET_MIN_PER_SEC", "1.0"))
+RETRY_BUDGET_MAX = float(os.getenv("RETRY_BUDGET_MAX", "20"))
+# 헤지 요청: 멱등 GET이 이 백분위 지연을 넘기면 같은 요청을 한 번 더 보냄 (0이면 사용 안 함)
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# 헤지 대상 요청(첫 요청 + 헤지)을 실행하는 스레드 수 (동시에 진행 중인 멱등 GET 수보다 넉넉하게)
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "32"))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# 재시도할 수 있는 오류 (응답 코드/네트워크 오류 등)
+class RetryableError(Exception):
+    pass
+
+
+# OpenAI 호출 중 재시도해도 되는 오류 (연결 실패, 시간 초과, 429, 5xx)
+def is_retryable_llm_error(e):
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+# 연속 실패가 쌓이면 열려서(open) 바로 실패시키고, 일정 시간 뒤 한 건만 시험 요청(half_open)
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_sec=BREAKER_RESET_SEC,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_sec:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"[DEBUG] [BREAKER] {self.name} 차단 (연속 실패 {self.failures}회)")
+                self.state = "open"
+                self.opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+# 전체 재시도 양을 요청 수에 비례하도록 제한 (장애 시 재시도 폭주 방지)
+class RetryBudget:
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_sec=RETRY_BUDGET_MIN_PER_SEC, max_tokens=RETRY_BUDGET_MAX,
+                 clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._updated = clock()
+
+    def _refill_locked(self):
+        now = self._clock()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill_locked()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill_locked()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill_locked()
+            return self._tokens
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+# endpoint별 회로 차단기 + 재시도(지터 백오프) + 재시도 예산 + 헤지 요청
+class Resilience:
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY_SEC, max_delay=RETRY_MAX_DELAY_SEC,
+                 hedge_percentile=HEDGE_PERCENTILE, hedge_min_samples=HEDGE_MIN_SAMPLES, hedge_workers=HEDGE_WORKERS,
+                 budget=None, sleep=time.sleep, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.budget = budget or RetryBudget(clock=clock)
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._latencies = defaultdict(lambda: deque(maxlen=200))
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max(2, hedge_workers), thread_name_prefix="hedge")
+
+    def breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint, clock=self._clock)
+            return self._breakers[endpoint]
+
+    def _count(self, endpoint, key, n=1):
+        with self._lock:
+            self._counters[endpoint][key] += n
+
+    def _backoff(self, attempt):
+        # full jitter: 0 ~ min(max_delay, base * 2^attempt)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def hedge_delay(self, endpoint):
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            samples = list(self._latencies[endpoint])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return _percentile(samples, self.hedge_percentile)
+
+    # fn()을 endpoint 정책에 따라 실행
+    # - retryable(e)가 True인 예외만 재시도, 재시도 예산이 없으면 바로 실패
+    # - hedge=True(멱등 요청)면 지연이 백분위를 넘을 때 같은 요청을 한 번 더 보내 먼저 성공한 결과 사용
+    def call(self, endpoint, fn, retryable=None, hedge=False, max_attempts=None):
+        retryable = retryable or (lambda e: isinstance(e, RetryableError))
+        max_attempts = max_attempts or self.max_attempts
+        breaker = self.breaker(endpoint)
+        self.budget.record_request()
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count(endpoint, "short_circuited")
+                raise CircuitOpenError(f"{endpoint} 일시 차단 중 (최근 연속 실패)")
+            self._count(endpoint, "calls")
+            started = self._clock()
+            try:
+                if hedge:
+                    result, started = self._hedged(endpoint, fn, started)
+                else:
+                    result = fn()
+            except Exception as e:
+                if not retryable(e):
+                    # 요청 자체의 문제(4xx 등)는 서비스 장애로 보지 않음
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                self._count(endpoint, "failures")
+                attempt += 1
+                # 이번 실패로 차단기가 열렸으면 기다리지 않고 바로 실패
+                if attempt >= max_attempts or breaker.state == "open":
+                    raise
+                if not self.budget.try_acquire():
+                    self._count(endpoint, "retry_budget_exhausted")
+                    raise
+                self._count(endpoint, "retries")
+                delay = self._backoff(attempt)
+                print(f"[DEBUG] [RETRY] {endpoint} {attempt}회 실패 → {delay:.2f}초 후 재시도: {e}")
+                self._sleep(delay)
+                continue
+            breaker.record_success()
+            with self._lock:
+                self._latencies[endpoint].append(self._clock() - started)
+            return result
+
+    # 첫 요청과 헤지 요청을 모두 _hedge_pool에서 실행하고 먼저 성공한 결과 사용
+    # - 헤지 지연은 첫 요청이 실제로 시작된 시점부터 계산 (풀 대기 시간은 제외)
+    # - 헤지는 재시도 예산을 차감하고, 차단기가 닫혀 있을 때만 보냄
+    # 반환: (결과, 첫 요청 시작 시각)
+    def _hedged(self, endpoint, fn, started):
+        delay = self.hedge_delay(endpoint)
+        breaker = self.breaker(endpoint)
+        if delay is None or breaker.state != "closed":
+            return fn(), started
+
+        began = {}
+        running = threading.Event()
+
+        def first_attempt():
+            began["at"] = self._clock()
+            running.set()
+            return fn()
+
+        # 추적 span 등 현재 context를 풀 스레드에서도 사용 (요청마다 따로 복사)
+        first = self._hedge_pool.submit(contextvars.copy_context().run, first_attempt)
+        running.wait()
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result(), began["at"]
+        if breaker.state != "closed" or not self.budget.try_acquire():
+            self._count(endpoint, "hedges_skipped")
+            return first.result(), began["at"]
+
+        self._count(endpoint, "hedges")
+        hedge = self._hedge_pool.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([first, hedge], return_when=FIRST_COMPLETED)
+        winner = first if first in done else hedge
+        if winner.exception() is not None:
+            # 먼저 끝난 쪽이 실패하면 나머지 결과를 기다림
+            winner = hedge if winner is first else first
+        result = winner.result()
+        if winner is hedge:
+            self._count(endpoint, "hedge_wins")
+        return result, began["at"]
+
+    def stats(self):
+        with self._lock:
+            breakers = {name: {"state": b.state, "failures": b.failures} for name, b in self._breakers.items()}
+            counters = {name: dict(c) for name, c in self._counters.items()}
+        return {"breakers": breakers, "counters": counters, "retry_budget": round(self.budget.tokens, 2)}
+
+    def metrics(self):
+        stats = self.stats()
+        states = {"closed": 0, "half_open": 1, "open": 2}
+        rows = [("chatbot_retry_budget_tokens", {}, stats["retry_budget"])]
+        for name, b in stats["breakers"].items():
+            rows.append(("chatbot_breaker_state", {"endpoint": name}, states[b["state"]]))
+        for name, counters in stats["counters"].items():
+            for key, value in counters.items():
+                rows.append((f"chatbot_resilience_{key}_total", {"endpoint": name}, value))
+        return rows
+
+
+# 프로세스 공용 (Genie / OpenAI 호출이 같은 재시도 예산을 나눠 씀)
+resilience = Resilience()
+tracer.add_metric_provider(resilience.metrics, metrics={
+    "chatbot_retry_budget_tokens": ("gauge", "Retry budget tokens left"),
+    "chatbot_breaker_state": ("gauge", "Circuit breaker state (0=closed, 1=half_open, 2=open)"),
+    "chatbot_resilience_calls_total": ("counter", "Calls through the resilience layer"),
+    "chatbot_resilience_failures_total": ("counter", "Failed call attempts"),
+    "chatbot_resilience_retries_total": ("counter", "Retried call attempts"),
+    "chatbot_resilience_short_circuited_total": ("counter", "Calls rejected by an open breaker"),
+    "chatbot_resilience_retry_budget_exhausted_total": ("counter", "Retries skipped for lack of budget"),
+    "chatbot_resilience_hedges_total": ("counter", "Hedge requests sent"),
+    "chatbot_resilience_hedges_skipped_total": ("counter", "Hedge requests skipped by breaker or budget"),
+    "chatbot_resilience_hedge_wins_total": ("counter", "Calls answered by the hedge request"),
+})
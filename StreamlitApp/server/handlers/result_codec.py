@@ -0,0 +1,52 @@
+import json
+import pandas as pd
+
+# 챗봇 결과 dict ↔ JSON (채팅 API 서버와 Streamlit 클라이언트가 함께 사용)
+# DataFrame은 컬럼/행/dtype으로 나눠 보내고, 받는 쪽에서 dtype을 복원함
+
+
+def encode_df(df):
+    payload = json.loads(df.to_json(orient="split", date_format="iso", index=False, force_ascii=False))
+    return {"columns": [str(c) for c in df.columns], "data": payload["data"], "dtypes": [str(t) for t in df.dtypes]}
+
+
+def _restore(values, dtype):
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(values, errors="coerce", utc="UTC" in dtype)
+    if dtype in ("Int64", "boolean", "float64", "int64", "bool"):
+        return values.astype(dtype)
+    return values
+
+
+def decode_df(payload):
+    # 중복 컬럼 이름이 있을 수 있어 위치로 변환
+    df = pd.DataFrame(payload["data"], columns=range(len(payload["columns"])))
+    for i, dtype in enumerate(payload.get("dtypes") or []):
+        try:
+            df[i] = _restore(df[i], dtype)
+        except (ValueError, TypeError):
+            pass
+    df.columns = payload["columns"]
+    return df
+
+
+def encode_result(result):
+    encoded = {k: v for k, v in result.items() if k not in ("history", "response_df", "sub_results")}
+    if result.get("response_df") is not None:
+        encoded["response_df"] = encode_df(result["response_df"])
+    if result.get("sub_results"):
+        encoded["sub_results"] = [encode_result(sub) for sub in result["sub_results"]]
+    return encoded
+
+
+def decode_result(payload):
+    result = dict(payload)
+    if payload.get("response_df") is not None:
+        result["response_df"] = decode_df(payload["response_df"])
+    if payload.get("sub_results"):
+        result["sub_results"] = [decode_result(sub) for sub in payload["sub_results"]]
+    return result
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=str)
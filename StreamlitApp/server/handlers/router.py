@@ -2,14 +2,32 @@
 # coding: utf-8
 
 # In[1]:
+import os
 import re
+import json
+import time
+import random
+import threading
+from collections import deque
 from langchain_core.runnables import RunnableSequence
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
+from handlers.entity_extractor import RuleBasedRouter
+from handlers.tracing import tracer, record_token_usage
+from handlers.resilience import resilience, is_retryable_llm_error
+from handlers.cassette import cassette
+from handlers.token_accounting import token_accountant
+
+# 규칙 분류가 확신한 경우에도 LLM과 비교해 볼 비율 (규칙 튜닝용)
+ROUTER_SHADOW_RATE = float(os.getenv("ROUTER_SHADOW_RATE", "0"))
+# 규칙/LLM 분류 불일치 기록 파일 (JSONL, 비어 있으면 메모리에만 보관)
+ROUTER_DISAGREEMENT_LOG = os.getenv("ROUTER_DISAGREEMENT_LOG", "")
 
 class LLMRouter:
-    def __init__(self):
-        self.llm = ChatOpenAI(model_name="gpt-4.1-mini", temperature=0)
+    def __init__(self, llm=None):
+        # 재시도는 resilience에서 처리 / 기록·재생 모드면 cassette로 감쌈
+        self.llm = cassette.chat_model(llm, lambda: ChatOpenAI(model_name="gpt-4.1-mini", temperature=0, max_retries=0),
+                                       name="router")
         self.prompt = PromptTemplate(
             input_variables=["question"],
             template="""
@@ -56,9 +74,52 @@ class LLMRouter:
         )
         self.chain = self.prompt | self.llm
 
+        self.rules = RuleBasedRouter()
+        self._lock = threading.Lock()
+        self.disagreements = deque(maxlen=200)
+        self.counters = {"rule": 0, "llm": 0, "shadow": 0, "disagreements": 0, "llm_fallback": 0}
+
     def route(self, question: str, context: str = "") -> str:
+        return self.route_with_slots(question, context)["route"]
+
+    # 규칙 기반 사전 분류 → 확신하지 못할 때만 LLM 분류
+    # 반환: {"route", "slots", "source"("rule"/"llm"), "confidence"}
+    def route_with_slots(self, question: str, context: str = "") -> dict:
+        decision = self.rules.classify(question)
+
+        if decision.confident:
+            self._count("rule")
+            if ROUTER_SHADOW_RATE and random.random() < ROUTER_SHADOW_RATE:
+                self._count("shadow")
+                try:
+                    self._compare(question, decision, self._llm_route(question, context))
+                except Exception as e:
+                    print("[DEBUG] [ROUTER] shadow LLM 분류 실패:", str(e))
+            print(f"[DEBUG] [ROUTER] 규칙 분류: {decision.route} (confidence={decision.confidence})")
+            return {"route": decision.route, "slots": decision.slots,
+                    "source": "rule", "confidence": decision.confidence}
+
+        self._count("llm")
+        try:
+            route = self._llm_route(question, context)
+        except Exception as e:
+            # LLM 장애(차단 포함) 시 규칙 점수가 가장 높은 route로 대체
+            self._count("llm_fallback")
+            route = max(decision.scores, key=decision.scores.get) if decision.scores else "X"
+            print(f"[ERROR] [ROUTER] LLM 분류 실패 → 규칙 결과 {route} 사용:", str(e))
+            return {"route": route, "slots": decision.slots,
+                    "source": "rule_fallback", "confidence": decision.confidence}
+        self._compare(question, decision, route)
+        return {"route": route, "slots": decision.slots,
+                "source": "llm", "confidence": decision.confidence}
+
+    def _llm_route(self, question: str, context: str = "") -> str:
         full_question = f"{context}\n{question}".strip()
-        result = self.chain.invoke({"question": full_question})
+        with tracer.span("llm.router", kind="llm", model="gpt-4.1-mini") as span:
+            result = resilience.call("openai.router", lambda: self.chain.invoke({"question": full_question},
+                                                                       config=token_accountant.config()),
+                                     retryable=is_retryable_llm_error)
+            record_token_usage(span, result)
         text = result.content.strip().upper()
 
         if text in {"A", "B", "C", "D"}:
@@ -66,6 +127,43 @@ class LLMRouter:
         else:
             return "X"
 
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    # 규칙이 가장 높게 본 route와 LLM 결과가 다르면 기록
+    def _compare(self, question, decision, llm_route):
+        if not decision.scores:
+            return
+        rule_route = max(decision.scores, key=decision.scores.get)
+        if rule_route == llm_route:
+            return
+
+        record = {
+            "ts": time.time(),
+            "question": question,
+            "rule_route": rule_route,
+            "llm_route": llm_route,
+            "confidence": decision.confidence,
+            "scores": decision.scores,
+            "slots": decision.slots,
+        }
+        print(f"[DEBUG] [ROUTER] 규칙/LLM 불일치: rule={rule_route}, llm={llm_route}, question={question}")
+        with self._lock:
+            self.counters["disagreements"] += 1
+            self.disagreements.append(record)
+            if ROUTER_DISAGREEMENT_LOG:
+                with open(ROUTER_DISAGREEMENT_LOG, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total = self.counters["rule"] + self.counters["llm"]
+            return {
+                **self.counters,
+                "rule_rate": self.counters["rule"] / total if total else 0.0,
+            }
+
 
 # In[ ]:
 
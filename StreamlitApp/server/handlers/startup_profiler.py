@@ -0,0 +1,48 @@
+import time
+import threading
+import importlib
+from contextlib import contextmanager
+
+
+# 프로세스 기동 시 import / 객체 생성에 걸린 시간 기록
+class StartupProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = []
+        self.started_at = time.perf_counter()
+
+    def record(self, name, seconds, kind="section"):
+        with self._lock:
+            self._records.append({
+                "name": name,
+                "kind": kind,
+                "seconds": round(seconds, 4),
+                "since_start": round(time.perf_counter() - self.started_at, 4),
+            })
+
+    @contextmanager
+    def section(self, name, kind="section"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, kind)
+
+    # 모듈을 import하면서 소요 시간 기록 (이미 import된 모듈은 0에 가깝게 기록됨)
+    def timed_import(self, module_name):
+        with self.section(module_name, kind="import"):
+            return importlib.import_module(module_name)
+
+    # 소요 시간이 큰 순서로 정렬한 기록
+    def report(self):
+        with self._lock:
+            return sorted(self._records, key=lambda r: r["seconds"], reverse=True)
+
+    def format_report(self):
+        lines = ["[STARTUP] 기동 시간 리포트"]
+        for r in self.report():
+            lines.append(f"  {r['seconds']:8.3f}s  {r['kind']:<8} {r['name']}")
+        return "\n".join(lines)
+
+
+startup_profiler = StartupProfiler()
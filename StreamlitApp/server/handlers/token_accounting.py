@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict, OrderedDict
+from dotenv import load_dotenv
+
+try:
+    from handlers.tracing import tracer
+except ImportError:
+    from tracing import tracer
+
+load_dotenv()
+
+# 세션당 토큰 예산 (입력+출력, 기본 0 = 제한 없음), 넘으면 MultiQuery 확장 등 비싼 단계를 건너뜀
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+# 집계 스냅샷을 주기적으로 남길 JSONL 경로 / 주기(초) (경로가 비어 있으면 내보내지 않음)
+TOKEN_USAGE_EXPORT_PATH = os.getenv("TOKEN_USAGE_EXPORT_PATH", "")
+TOKEN_USAGE_EXPORT_SEC = float(os.getenv("TOKEN_USAGE_EXPORT_SEC", "60"))
+# 메모리에 보관할 최대 세션 수 (오래 사용하지 않은 세션부터 제거)
+TOKEN_USAGE_MAX_SESSIONS = int(os.getenv("TOKEN_USAGE_MAX_SESSIONS", "10000"))
+
+# 모델별 100만 토큰당 가격 (USD, 입력/출력)
+MODEL_PRICES_PER_1M = {
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+DEFAULT_MODEL = "gpt-4.1-mini"
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    # "gpt-4.1-mini-2025-04-14"처럼 날짜가 붙은 이름도 앞부분으로 매칭
+    name = next((m for m in sorted(MODEL_PRICES_PER_1M, key=len, reverse=True) if (model or "").startswith(m)),
+                DEFAULT_MODEL)
+    input_price, output_price = MODEL_PRICES_PER_1M[name]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def _usage_from_result(response):
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += usage.get("input_tokens") or 0
+            completion += usage.get("output_tokens") or 0
+    if not prompt and not completion:
+        # 스트리밍이 아닌 OpenAI 응답은 llm_output에도 사용량이 있음
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    return prompt, completion
+
+
+# LLM 호출이 끝날 때마다 토큰 사용량을 TokenAccountant에 기록하는 콜백
+# 단계/노드/route/세션은 호출 시점의 추적 span에서 가져옴 (llm.router, rag.retrieve, llm.rag_answer ...)
+# langchain_core는 처음 config()를 부를 때 import (이 모듈을 import하는 graph_runner 시작 시간에 포함되지 않도록)
+def _make_callback(accountant):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TokenUsageCallback(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            prompt, completion = _usage_from_result(response)
+            span = tracer.current_span()
+            attrs = span.attrs if span else {}
+            model = (response.llm_output or {}).get("model_name") or attrs.get("model")
+            accountant.record(
+                stage=span.name if span else "unknown",
+                node=attrs.get("node"),
+                route=attrs.get("route"),
+                session_id=attrs.get("session_id"),
+                model=model,
+                prompt_tokens=prompt,
+                completion_tokens=completion,
+            )
+
+    return TokenUsageCallback()
+
+
+# 호출별 토큰 사용량을 단계·노드·route별, 세션별로 집계
+class TokenAccountant:
+    def __init__(self, session_budget=SESSION_TOKEN_BUDGET, max_sessions=TOKEN_USAGE_MAX_SESSIONS,
+                 export_path=TOKEN_USAGE_EXPORT_PATH, export_sec=TOKEN_USAGE_EXPORT_SEC):
+        self.session_budget = session_budget
+        self.max_sessions = max_sessions
+        self.export_path = export_path
+        self.export_sec = export_sec
+        self._lock = threading.Lock()
+        self._by_stage = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+        self._sessions = OrderedDict()
+        self._downgrades = defaultdict(int)
+        self._callback = None
+        self._exporter = None
+
+    # LangChain invoke/stream의 config로 넘길 값 (예: chain.invoke(x, config=token_accountant.config()))
+    def config(self):
+        if self._callback is None:
+            with self._lock:
+                if self._callback is None:
+                    self._callback = _make_callback(self)
+        return {"callbacks": [self._callback]}
+
+    def record(self, stage, node, route, session_id, model, prompt_tokens, completion_tokens):
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            entry = self._by_stage[(stage, node or "", route or "")]
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += cost
+            if session_id:
+                session = self._sessions.pop(session_id, None) or {"calls": 0, "tokens": 0, "cost_usd": 0.0}
+                session["calls"] += 1
+                session["tokens"] += prompt_tokens + completion_tokens
+                session["cost_usd"] += cost
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        self._ensure_exporter()
+
+    def session_usage(self, session_id):
+        with self._lock:
+            return dict(self._sessions.get(session_id) or {"calls": 0, "tokens": 0, "cost_usd": 0.0})
+
+    # 세션 예산을 다 썼으면 True (호출 측에서 저렴한 경로로 전환)
+    def over_budget(self, session_id):
+        if not self.session_budget or not session_id:
+            return False
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return bool(session) and session["tokens"] >= self.session_budget
+
+    def record_downgrade(self, what):
+        with self._lock:
+            self._downgrades[what] += 1
+
+    def stats(self):
+        with self._lock:
+            stages = [{"stage": stage, "node": node or None, "route": route or None, **values,
+                       "cost_usd": round(values["cost_usd"], 6)}
+                      for (stage, node, route), values in sorted(self._by_stage.items())]
+            return {
+                "stages": stages,
+                "sessions": len(self._sessions),
+                "total_tokens": sum(s["prompt_tokens"] + s["completion_tokens"] for s in stages),
+                "total_cost_usd": round(sum(s["cost_usd"] for s in stages), 6),
+                "downgrades": dict(self._downgrades),
+            }
+
+    def metrics(self):
+        stats = self.stats()
+        rows = []
+        for s in stats["stages"]:
+            labels = {"stage": s["stage"], "node": s["node"] or "", "route": s["route"] or ""}
+            rows += [
+                ("chatbot_llm_calls_total", labels, s["calls"]),
+                ("chatbot_llm_tokens_total", {**labels, "type": "prompt"}, s["prompt_tokens"]),
+                ("chatbot_llm_tokens_total", {**labels, "type": "completion"}, s["completion_tokens"]),
+                ("chatbot_llm_cost_usd_total", labels, s["cost_usd"]),
+            ]
+        for what, count in stats["downgrades"].items():
+            rows.append(("chatbot_llm_budget_downgrades_total", {"what": what}, count))
+        return rows
+
+    # 첫 기록 시점에 주기적 내보내기 스레드 시작 (경로가 설정된 경우만)
+    def _ensure_exporter(self):
+        if not self.export_path or self._exporter is not None:
+            return
+        with self._lock:
+            if self._exporter is not None:
+                return
+            self._exporter = threading.Thread(target=self._export_loop, name="token-usage-export", daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.export_sec)
+            try:
+                self.export(self.export_path)
+            except Exception as e:
+                print("[ERROR] [TOKENS] 사용량 내보내기 실패:", str(e))
+
+    def export(self, path):
+        line = json.dumps({"ts": time.time(), **self.stats()}, ensure_ascii=False)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# 프로세스 공용
+token_accountant = TokenAccountant()
+tracer.add_metric_provider(token_accountant.metrics, metrics={
+    "chatbot_llm_calls_total": ("counter", "LLM calls"),
+    "chatbot_llm_tokens_total": ("counter", "LLM tokens by type"),
+    "chatbot_llm_cost_usd_total": ("counter", "Estimated LLM cost in USD"),
+    "chatbot_llm_budget_downgrades_total": ("counter", "Token budget downgrades"),
+})
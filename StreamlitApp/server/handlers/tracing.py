@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+import functools
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# span JSONL 출력 경로 / Prometheus 텍스트 출력 경로 (비어 있으면 파일로 내보내지 않음)
+CHATBOT_TRACE_JSONL = os.getenv("CHATBOT_TRACE_JSONL", "")
+CHATBOT_METRICS_PROM = os.getenv("CHATBOT_METRICS_PROM", "")
+
+_current_span = contextvars.ContextVar("chatbot_current_span", default=None)
+
+# 상위 span에서 하위 span으로 물려주는 속성 (토큰 사용량 등을 노드/route/세션별로 집계하기 위함)
+INHERITED_ATTRS = ("route", "node", "session_id")
+
+
+class Span:
+    def __init__(self, name, kind, parent=None, attrs=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        # route 등 상위 span의 공통 속성은 하위 span으로 상속
+        self.attrs = {k: parent.attrs[k] for k in INHERITED_ATTRS if parent.attrs.get(k)} if parent else {}
+        self.attrs.update(attrs or {})
+        self.outcome = "ok"
+        self.started = time.perf_counter()
+        self.start_ts = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+        return self
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start_ts,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "outcome": self.outcome,
+            "attrs": self.attrs,
+        }
+
+
+# Prometheus 텍스트 포맷의 label 값 escape (\, ", 줄바꿈)
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+# 최근 N개 span 소요 시간으로 kind/name/route별 p50·p95·p99 집계
+class LatencyAggregator:
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(lambda: {"count": 0, "errors": 0})
+
+    def add(self, span):
+        keys = [(span.kind, span.name, None)]
+        if span.attrs.get("route"):
+            keys.append((span.kind, span.name, span.attrs["route"]))
+        with self._lock:
+            for key in keys:
+                self._durations[key].append(span.duration)
+                self._counts[key]["count"] += 1
+                if span.outcome != "ok":
+                    self._counts[key]["errors"] += 1
+
+    def summary(self, kind=None):
+        with self._lock:
+            items = [(k, sorted(v), dict(self._counts[k])) for k, v in self._durations.items()
+                     if kind is None or k[0] == kind]
+        report = []
+        for (span_kind, name, route), values, counts in items:
+            report.append({
+                "kind": span_kind,
+                "name": name,
+                "route": route,
+                **counts,
+                "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+            })
+        return sorted(report, key=lambda r: (r["kind"], r["name"], r["route"] or ""))
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+
+
+class Tracer:
+    def __init__(self, jsonl_path=CHATBOT_TRACE_JSONL, prom_path=CHATBOT_METRICS_PROM):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.aggregator = LatencyAggregator()
+        self._write_lock = threading.Lock()
+        # 외부 모듈(회로 차단기 등)이 Prometheus 출력에 추가할 게이지/카운터 제공자
+        self._metric_providers = []
+        # metric 이름 -> (type, help): 제공자가 등록할 때 선언
+        self._metric_meta = {}
+
+    @contextmanager
+    def span(self, name, kind="internal", **attrs):
+        parent = _current_span.get()
+        span = Span(name, kind, parent=parent, attrs=attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.outcome = "error"
+            span.set(error=f"{type(e).__name__}: {e}"[:300])
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.started
+            _current_span.reset(token)
+            self._finish(span)
+
+    def current_span(self):
+        return _current_span.get()
+
+    def _finish(self, span):
+        self.aggregator.add(span)
+        if self.jsonl_path:
+            line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+            with self._write_lock:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        # 한 턴이 끝날 때마다 Prometheus 텍스트 파일 갱신
+        if self.prom_path and span.parent_id is None:
+            self.export_prometheus(self.prom_path)
+
+    # metrics: {metric 이름: (type, help)} - HELP/TYPE 줄 출력에 사용
+    def add_metric_provider(self, provider, metrics=None):
+        self._metric_providers.append(provider)
+        self._metric_meta.update(metrics or {})
+
+    # 선언되지 않은 metric은 이름 관례(_total이면 counter)로 type 추정
+    def _meta_for(self, metric):
+        if metric in self._metric_meta:
+            return self._metric_meta[metric]
+        return ("counter" if metric.endswith("_total") else "gauge"), metric.replace("_", " ")
+
+    # Prometheus 텍스트 포맷 (summary + 추가 제공자의 gauge/counter)
+    # 같은 이름의 sample은 한 묶음으로 모아 HELP/TYPE을 한 번만 출력
+    def prometheus_text(self):
+        latency = [
+            "# HELP chatbot_span_latency_ms Span latency quantiles in milliseconds",
+            "# TYPE chatbot_span_latency_ms summary",
+        ]
+        errors = [
+            "# HELP chatbot_span_errors_total Spans that ended with an error or failed answer",
+            "# TYPE chatbot_span_errors_total counter",
+        ]
+        for r in self.aggregator.summary():
+            labels = {"kind": r["kind"], "name": r["name"], "route": r["route"] or ""}
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                latency.append(f"chatbot_span_latency_ms{_label_text({**labels, 'quantile': q})} {r[key]}")
+            latency.append(f"chatbot_span_latency_ms_count{_label_text(labels)} {r['count']}")
+            errors.append(f"chatbot_span_errors_total{_label_text(labels)} {r['errors']}")
+
+        families = {}
+        for provider in self._metric_providers:
+            for metric, labels, value in provider():
+                families.setdefault(metric, []).append(f"{metric}{_label_text(labels)} {value}")
+        lines = latency + errors
+        for metric, samples in families.items():
+            kind, help_text = self._meta_for(metric)
+            help_text = help_text.replace("\\", "\\\\").replace("\n", "\\n")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", *samples]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path):
+        tmp_path = f"{path}.tmp"
+        with self._write_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+
+
+tracer = Tracer()
+
+
+# LLM 응답(AIMessage)의 토큰 사용량을 span 속성으로 기록
+def record_token_usage(span, message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        span.set(
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens"),
+            total_tokens=usage.get("total_tokens"),
+        )
+
+
+# LangGraph 노드 함수를 span으로 감싸는 데코레이터
+def traced_node(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(state, *args, **kwargs):
+            with tracer.span(name, kind="node", route=state.get("route"), node=name) as span:
+                result = func(state, *args, **kwargs)
+                if isinstance(result, dict):
+                    span.set(route=result.get("route"))
+                    response = result.get("response")
+                    if isinstance(response, str) and response.startswith("❗"):
+                        span.outcome = "failed_answer"
+                return result
+        return wrapper
+    return decorator